@@ -1,20 +1,57 @@
 import email
 import requests
+import httpx
 import os
-from dotenv import load_dotenv
+from API_check.http_session import PooledAsyncClient, get_async_client, get_session
+from API_check.reputation_cache import MISS, ReputationCache
 
 
 class EmailCheck:
 
-    def __init__(self):
-        load_dotenv()
+    def __init__(
+        self,
+        session: requests.Session = None,
+        async_client: PooledAsyncClient = None,
+        cache: ReputationCache = None,
+    ):
         self.api_key = os.getenv("EMAIL_API_KEY")
+        self.session = session or get_session()
+        self.async_client = async_client or get_async_client()
+        self.cache = cache
+
+    def _request_url(self, email):
+        return f"https://emailvalidation.abstractapi.com/v1/?api_key={self.api_key}&email={email}"
 
     def check_email(self, email=None):
         # STUB FOR TESTING
         # return 0.88
         # if not email:
         #     return 0.88
-        url = f"https://emailvalidation.abstractapi.com/v1/?api_key={self.api_key}&email={email}"
-        response = requests.get(url)
-        return float(response.json()["quality_score"])
+        if self.cache is not None:
+            cached = self.cache.get("email", email)
+            if cached is not MISS:
+                return cached
+        url = self._request_url(email)
+        response = self.session.get(url)
+        score = float(response.json()["quality_score"])
+        if self.cache is not None:
+            self.cache.set("email", email, score)
+        return score
+
+    async def check_email_async(self, email=None):
+        """
+        Same as check_email, but runs on an event loop with the shared async client.
+        Returns None (and caches the failure briefly) if the lookup fails.
+        """
+        if self.cache is not None:
+            cached = self.cache.get("email", email)
+            if cached is not MISS:
+                return cached
+        try:
+            response = await self.async_client.get(self._request_url(email))
+            score = float(response.json()["quality_score"])
+        except (httpx.HTTPError, KeyError, TypeError, ValueError):
+            score = None
+        if self.cache is not None:
+            self.cache.set("email", email, score)
+        return score
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default, cast=float):
+    # Read when a client is built, not at import, so .env loaded at startup applies
+    return cast(os.getenv(name, default))
+
+
+# Statuses worth retrying: rate limiting and transient provider failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def backoff_delay(attempt, backoff=None):
+    """Exponential backoff with full jitter so retries from many workers spread out."""
+    if backoff is None:
+        backoff = _setting("HTTP_RETRY_BACKOFF", "0.3")
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+class JitteredRetry(Retry):
+    def get_backoff_time(self):
+        consecutive_errors = len(self.history)
+        if consecutive_errors <= 1:
+            return 0
+        return backoff_delay(consecutive_errors - 1, self.backoff_factor)
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with keep-alive pooling, bounded retries and default timeouts.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=None,
+        read_timeout=None,
+        max_retries=None,
+        max_connections_per_host=None,
+    ):
+        super().__init__()
+        connect_timeout = connect_timeout or _setting("HTTP_CONNECT_TIMEOUT", "3")
+        read_timeout = read_timeout or _setting("HTTP_READ_TIMEOUT", "10")
+        if max_retries is None:
+            max_retries = _setting("HTTP_MAX_RETRIES", "2", int)
+        max_connections_per_host = max_connections_per_host or _setting(
+            "HTTP_MAX_CONNECTIONS_PER_HOST", "10", int
+        )
+        self.timeout = (connect_timeout, read_timeout)
+        retry = JitteredRetry(
+            total=max_retries,
+            backoff_factor=_setting("HTTP_RETRY_BACKOFF", "0.3"),
+            status_forcelist=RETRY_STATUSES,
+            # Reputation lookups are read-only, so retrying POST is safe too
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_maxsize=max_connections_per_host,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class PooledAsyncClient:
+    """
+    Thin wrapper around httpx.AsyncClient adding a per-host connection cap and
+    bounded jittered retries. Exposes the same get/post/request calls.
+
+    Like any httpx.AsyncClient it must only be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=None,
+        read_timeout=None,
+        max_retries=None,
+        max_connections_per_host=None,
+    ):
+        connect_timeout = connect_timeout or _setting("HTTP_CONNECT_TIMEOUT", "3")
+        read_timeout = read_timeout or _setting("HTTP_READ_TIMEOUT", "10")
+        if max_retries is None:
+            max_retries = _setting("HTTP_MAX_RETRIES", "2", int)
+        max_connections_per_host = max_connections_per_host or _setting(
+            "HTTP_MAX_CONNECTIONS_PER_HOST", "10", int
+        )
+        self.max_retries = max_retries
+        self.max_connections_per_host = max_connections_per_host
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=max_connections_per_host * 4,
+            ),
+        )
+        self._host_slots = {}
+
+    def _slots(self, url):
+        host = urlsplit(str(url)).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_slots[host]
+
+    async def request(self, method, url, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                async with self._slots(url):
+                    response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"{method} {urlsplit(str(url)).netloc} returned {response.status_code}, retrying")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"{method} {urlsplit(str(url)).netloc} failed ({e!r}), retrying")
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_session = None
+_async_client = None
+_owner_pid = None
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Pooled sockets must not be shared with forked worker processes
+    global _session, _async_client, _owner_pid
+    if _owner_pid != os.getpid():
+        _session = None
+        _async_client = None
+        _owner_pid = os.getpid()
+
+
+def get_session() -> PooledSession:
+    """The process-wide pooled session used by the synchronous checkers."""
+    global _session
+    with _lock:
+        _reset_after_fork()
+        if _session is None:
+            _session = PooledSession()
+        return _session
+
+
+def get_async_client() -> PooledAsyncClient:
+    """The process-wide pooled client used by the async checkers."""
+    global _async_client
+    with _lock:
+        _reset_after_fork()
+        if _async_client is None:
+            _async_client = PooledAsyncClient()
+        return _async_client
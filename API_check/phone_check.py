@@ -1,15 +1,59 @@
 import requests
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
-import random
+from API_check.http_session import PooledAsyncClient, get_async_client, get_session
+from API_check.reputation_cache import MISS, ReputationCache
+
+logger = logging.getLogger(__name__)
 
 
 class PhoneCheck:
-    def __init__(self):
-        load_dotenv()
+    def __init__(
+        self,
+        session: requests.Session = None,
+        async_client: PooledAsyncClient = None,
+        provider_timeout=5.0,
+        cache: ReputationCache = None,
+    ):
         self.api_key_numverify = os.getenv("NUMVERIFY_PHONE_API_KEY")
         self.api_key_abstract = os.getenv("ABSTRACT_PHONE_API_KEY")
         self.api_key_trestle = os.getenv("TRESTLE_PHONE_API_KEY")
+        self.session = session or get_session()
+        self.async_client = async_client or get_async_client()
+        self.provider_timeout = provider_timeout
+        self.cache = cache
+
+    def _providers(self, phone_number):
+        """
+        (name, url, params, headers, validity key) for each phone provider.
+        """
+        return [
+            # Numverify API
+            (
+                "numverify",
+                f"https://apilayer.net/api/validate?access_key={self.api_key_numverify}",
+                {"number": phone_number},
+                None,
+                "valid",
+            ),
+            # Trestle API
+            (
+                "trestle",
+                "https://api.trestleiq.com/3.2/phone",
+                {"phone": phone_number},
+                {"x-api-key": self.api_key_trestle or ""},
+                "is_valid",
+            ),
+            # Abstract API
+            (
+                "abstract",
+                f"https://phonevalidation.abstractapi.com/v1/?api_key={self.api_key_abstract}&phone={phone_number}",
+                None,
+                None,
+                "valid",
+            ),
+        ]
 
     def check_phone(self, phone_number=None):
         # STUB FOR TESTING
@@ -17,35 +61,85 @@ class PhoneCheck:
 
         # if not phone_number:
         #     return random.choice([100, 66, 33, 0])
-        # Numverify API
-        numverify_url = (
-            f"https://apilayer.net/api/validate?access_key={self.api_key_numverify}"
-        )
-        query_numverify = {"number": phone_number}
+        if self.cache is not None:
+            cached = self.cache.get("phone", phone_number)
+            if cached is not MISS:
+                return _cached_answers(cached, 3)[0]
+
+        # Calculate the score
+        score = 0
+        for name, url, params, headers, key in self._providers(phone_number):
+            response = self.session.get(url, params=params, headers=headers)
+            if response.json()[key]:
+                score += 1
+        score = score / 3
+        if self.cache is not None:
+            self.cache.set("phone", phone_number, score)
+        return score
 
-        # Trestle API
-        trestle_url = "https://api.trestleiq.com/3.2/phone"
-        query_trestle = {"phone": phone_number}
-        headers_trestle = {"x-api-key": self.api_key_trestle}
+    async def check_phone_async(self, phone_number=None):
+        """
+        Query all three providers at once, each with its own deadline.
 
-        # Abstract API
-        abstract_url = f"https://phonevalidation.abstractapi.com/v1/?api_key={self.api_key_abstract}&phone={phone_number}"
+        Providers that fail or miss the deadline are left out of the average.
+        Returns None if none of them answered.
+        """
+        score, _, _ = await self.check_phone_answers_async(phone_number)
+        return score
 
-        response_numverify = requests.get(numverify_url, params=query_numverify)
-        response_trestle = requests.get(
-            trestle_url, params=query_trestle, headers=headers_trestle
+    async def check_phone_answers_async(self, phone_number=None):
+        """
+        (score, how many providers answered, how many were asked), so a score
+        from only some providers can be told apart from a unanimous one.
+        """
+        asked = len(self._providers(phone_number))
+        if self.cache is not None:
+            cached = self.cache.get("phone", phone_number)
+            if cached is not MISS:
+                return _cached_answers(cached, asked) + (asked,)
+        score, answered = await self._score_async(phone_number)
+        if self.cache is not None:
+            if answered == asked:
+                self.cache.set("phone", phone_number, score)
+            else:
+                # A score from only some providers is kept as briefly as a failure,
+                # so the full answer replaces it soon
+                value = None if score is None else {"score": score, "answered": answered}
+                self.cache.set("phone", phone_number, value, ttl=self.cache.negative_ttl)
+        return score, answered, asked
+
+    async def _score_async(self, phone_number):
+        """(average validity of the providers that answered, how many answered)"""
+        async def ask(name, url, params, headers, key):
+            response = await asyncio.wait_for(
+                self.async_client.get(url, params=params, headers=headers),
+                timeout=self.provider_timeout,
+            )
+            return bool(response.json()[key])
+
+        providers = self._providers(phone_number)
+        results = await asyncio.gather(
+            *[ask(*provider) for provider in providers], return_exceptions=True
         )
-        response_abstract = requests.request("GET", abstract_url)
 
-        # Calculate the score
-        score = 0
-        if response_numverify.json()["valid"]:
-            score += 1
-        if response_trestle.json()["is_valid"]:
-            score += 1
-        if response_abstract.json()["valid"]:
-            score += 1
-        return score / 3
+        answers = []
+        for provider, result in zip(providers, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Phone provider {provider[0]} failed: {result!r}")
+            else:
+                answers.append(result)
+        if not answers:
+            return None, 0
+        return sum(answers) / len(answers), len(answers)
+
+
+def _cached_answers(cached, asked):
+    """(score, answered) from a cache entry: partial answers keep their count."""
+    if cached is None:
+        return None, 0
+    if isinstance(cached, dict):
+        return cached["score"], cached["answered"]
+    return cached, asked
 
 
 # Example usage:
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+# Sentinel returned by ReputationCache.get when nothing usable is cached
+MISS = object()
+
+DEFAULT_TTLS = {
+    "url": 6 * 3600,  # threat lists change often
+    "phone": 7 * 24 * 3600,
+    "email": 7 * 24 * 3600,
+}
+# Failed lookups are remembered briefly so a broken provider is not hammered
+DEFAULT_NEGATIVE_TTL = 5 * 60
+
+
+def normalize_key(source, value):
+    """
+    Normalize a lookup key so trivially different spellings share a cache entry.
+    """
+    value = str(value).strip()
+    if source == "phone":
+        return re.sub(r"\D", "", value)
+    if source == "email":
+        return value.lower()
+    if source == "url":
+        parts = urlsplit(value)
+        # Scheme and host are case-insensitive, the fragment never reaches the server
+        return urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, "")
+        )
+    return value
+
+
+class ReputationCache:
+    """
+    SQLite-backed TTL/LRU cache for reputation lookups, shared by all checkers.
+
+    Entries expire after a per-source TTL. Failed lookups are stored as negative
+    entries with a shorter TTL. When the cache grows past max_entries the least
+    recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        max_entries=10000,
+        ttls=None,
+        negative_ttl=DEFAULT_NEGATIVE_TTL,
+    ):
+        self.path = path or os.getenv(
+            "REPUTATION_CACHE_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "reputation_cache.sqlite3"),
+        )
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.negative_ttl = negative_ttl
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reputation (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                negative INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS reputation_last_used ON reputation (last_used)"
+        )
+        self._conn.commit()
+
+        self.hits = {}
+        self.misses = {}
+        self.negative_hits = {}
+
+    def get(self, source, key):
+        """Cached value for (source, key), None for a negative entry, or MISS."""
+        key = normalize_key(source, key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, negative, expires_at FROM reputation WHERE source = ? AND key = ?",
+                (source, key),
+            ).fetchone()
+            if row is None or row[2] <= now:
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return MISS
+            self._conn.execute(
+                "UPDATE reputation SET last_used = ? WHERE source = ? AND key = ?",
+                (now, source, key),
+            )
+            self._conn.commit()
+            if row[1]:
+                self.negative_hits[source] = self.negative_hits.get(source, 0) + 1
+                return None
+            self.hits[source] = self.hits.get(source, 0) + 1
+            return json.loads(row[0])
+
+    def set(self, source, key, value, ttl=None):
+        """
+        Store a result. A value of None records a failed (negative) lookup. ttl
+        overrides the per-source TTL, e.g. for a result from a partial answer.
+        """
+        key = normalize_key(source, key)
+        now = time.time()
+        negative = value is None
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttls.get(source, DEFAULT_NEGATIVE_TTL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reputation VALUES (?, ?, ?, ?, ?, ?)",
+                (source, key, None if negative else json.dumps(value), int(negative), now + ttl, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM reputation").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self._conn.execute("DELETE FROM reputation WHERE expires_at <= ?", (time.time(),))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM reputation").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM reputation WHERE rowid IN (
+                    SELECT rowid FROM reputation ORDER BY last_used LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM reputation")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM reputation").fetchone()[0]
+            return {
+                "size": size,
+                "hits": dict(self.hits),
+                "negative_hits": dict(self.negative_hits),
+                "misses": dict(self.misses),
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
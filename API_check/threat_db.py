@@ -0,0 +1,255 @@
+"""
+Offline URL threat list: SHA-256 hash prefixes of canonicalized URL expressions.
+
+The prefixes live in a sorted file of 32-bit integers that is memory-mapped and
+binary searched, so most URL checks never leave the process. Only a prefix hit
+needs a full-hash confirmation, either from full hashes shipped in the feed or
+by escalating the URL to the live Safe Browsing API (see UrlCheck).
+
+Feed file format (one entry per line, '#' starts a comment):
+
+    version 42
+    +1a2b3c4d                 add a 4-byte hash prefix (8 hex chars)
+    +<64 hex chars>           add a full SHA-256 hash (its prefix is added too)
+    -1a2b3c4d                 remove a prefix (and any full hashes under it)
+
+A feed is only applied if its version is newer than the stored one, so the same
+diff can be re-applied safely.
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import posixpath
+import re
+import sys
+import threading
+from array import array
+from urllib.parse import quote, unquote, urlsplit
+
+SAFE = "safe"
+UNSAFE = "unsafe"
+UNKNOWN = "unknown"  # prefix hit without a local full hash, needs confirmation
+
+
+def _unescape(value):
+    # Repeatedly percent-unescape until the value stops changing
+    previous = None
+    while previous != value:
+        previous, value = value, unquote(value)
+    return value
+
+
+def _escape(value):
+    return "".join(
+        c if 0x20 < ord(c) < 0x7F and c not in "#%" else quote(c, safe="")
+        for c in value
+    )
+
+
+def canonicalize(url):
+    """
+    Canonicalize a URL following the Safe Browsing rules closely enough for
+    prefix matching: lower-case host, no fragment, resolved path, re-escaped.
+    """
+    url = re.sub(r"[\t\r\n]", "", url.strip())
+    if "://" not in url:
+        url = "http://" + url
+    parts = urlsplit(_unescape(url))
+
+    host = parts.hostname or ""
+    host = re.sub(r"\.+", ".", host.strip(".")).lower()
+
+    path = parts.path or "/"
+    trailing_slash = path.endswith("/")
+    path = posixpath.normpath(path)
+    if path.startswith("//"):
+        path = "/" + path.lstrip("/")
+    if trailing_slash and path != "/":
+        path += "/"
+
+    canonical = f"{parts.scheme.lower()}://{host}{path}"
+    if parts.query or url.split("#")[0].endswith("?"):
+        canonical += "?" + parts.query
+    return _escape(canonical)
+
+
+def url_expressions(url):
+    """
+    The host-suffix/path-prefix expressions whose hashes are looked up for a URL,
+    e.g. "a.b.example.com/1/2.html?x" -> "a.b.example.com/1/2.html?x",
+    "a.b.example.com/1/2.html", "a.b.example.com/", "b.example.com/1/", ...
+    """
+    canonical = canonicalize(url)
+    rest = canonical.split("://", 1)[1]
+    host, _, path = rest.partition("/")
+    path = "/" + path
+
+    hosts = [host]
+    if not re.fullmatch(r"[\d.]+", host):
+        labels = host.split(".")
+        # Up to four suffixes built from the last five components, never the bare TLD
+        for i in range(max(len(labels) - 5, 1), len(labels) - 1):
+            suffix = ".".join(labels[i:])
+            if suffix not in hosts:
+                hosts.append(suffix)
+        hosts = hosts[:5]
+
+    bare_path = path.split("?", 1)[0]
+    paths = [path]
+    if bare_path != path:
+        paths.append(bare_path)
+    prefix = "/"
+    components = [c for c in bare_path.split("/")[1:-1] if c]
+    for component in [None] + components[:3]:
+        if component is not None:
+            prefix += component + "/"
+        if prefix not in paths:
+            paths.append(prefix)
+    paths = paths[:6]
+
+    return [h + p for h in hosts for p in paths]
+
+
+def full_hash(expression):
+    return hashlib.sha256(expression.encode("utf-8")).digest()
+
+
+def hash_prefix(digest):
+    return int.from_bytes(digest[:4], "big")
+
+
+class ThreatListDB:
+    """
+    Sorted, memory-mapped array of 4-byte hash prefixes plus an optional set of
+    full hashes for local confirmation. Safe to query from several threads while
+    an update is applied: readers keep the old mapping until they finish.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = path + ".json"
+        self._lock = threading.Lock()
+        self.version = 0
+        self.full_hashes = set()
+        self._prefixes = array("I")
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            self.version = meta.get("version", 0)
+            self.full_hashes = {bytes.fromhex(h) for h in meta.get("full_hashes", [])}
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The old mapping is left to the GC so in-flight lookups stay valid
+            self._mmap = mapped
+            self._prefixes = memoryview(mapped).cast("I")
+        else:
+            self._prefixes = array("I")
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def _contains_prefix(self, prefixes, prefix):
+        i = bisect.bisect_left(prefixes, prefix)
+        return i < len(prefixes) and prefixes[i] == prefix
+
+    def check(self, url):
+        """SAFE if no expression of the URL hits a prefix, UNSAFE if a hit is
+        confirmed by a local full hash, otherwise UNKNOWN."""
+        prefixes = self._prefixes
+        full_hashes = self.full_hashes
+        status = SAFE
+        for expression in url_expressions(url):
+            digest = full_hash(expression)
+            if not self._contains_prefix(prefixes, hash_prefix(digest)):
+                continue
+            if digest in full_hashes:
+                return UNSAFE
+            status = UNKNOWN
+        return status
+
+    def apply_update(self, feed_path):
+        """
+        Merge a feed diff into the stored list. Returns True if it was applied,
+        False if the feed is not newer than the current version.
+        """
+        version, additions, removals, added_hashes = self._parse_feed(feed_path)
+        with self._lock:
+            if version <= self.version:
+                return False
+
+            current = set(self._prefixes)
+            current |= additions
+            current -= removals
+            merged = array("I", sorted(current))
+
+            full_hashes = (self.full_hashes | added_hashes)
+            full_hashes = {h for h in full_hashes if hash_prefix(h) not in removals}
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                merged.tofile(f)
+            os.replace(tmp_path, self.path)
+            with open(self.meta_path + ".tmp", "w") as f:
+                json.dump(
+                    {"version": version, "full_hashes": sorted(h.hex() for h in full_hashes)},
+                    f,
+                )
+            os.replace(self.meta_path + ".tmp", self.meta_path)
+            self._load()
+            return True
+
+    @staticmethod
+    def _parse_feed(feed_path):
+        version = 0
+        additions, removals, added_hashes = set(), set(), set()
+        with open(feed_path, "r") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if line.startswith("version"):
+                    version = int(line.split()[1])
+                    continue
+                op, value = line[0], bytes.fromhex(line[1:].strip())
+                if len(value) not in (4, 32) or op not in "+-":
+                    raise ValueError(f"Bad threat feed line: {line}")
+                if op == "+":
+                    additions.add(hash_prefix(value))
+                    if len(value) == 32:
+                        added_hashes.add(value)
+                else:
+                    removals.add(hash_prefix(value))
+        return version, additions, removals, added_hashes
+
+
+def feed_lines_for_urls(urls):
+    """Full-hash '+' feed lines for URLs, handy for building a local test feed."""
+    return [f"+{full_hash(url_expressions(url)[0]).hex()}" for url in urls]
+
+
+if __name__ == "__main__":
+    # python threat_db.py update <db> <feed>   apply a feed diff
+    # python threat_db.py check <db> <url>...  check URLs offline
+    # python threat_db.py feed <url>...        print feed lines for URLs
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "update":
+        db = ThreatListDB(sys.argv[2])
+        applied = db.apply_update(sys.argv[3])
+        print(f"{'Applied' if applied else 'Skipped'} feed, version {db.version}, {len(db)} prefixes")
+    elif command == "check":
+        db = ThreatListDB(sys.argv[2])
+        for url in sys.argv[3:]:
+            print(f"{url}: {db.check(url)}")
+    elif command == "feed":
+        print("version 1")
+        print("\n".join(feed_lines_for_urls(sys.argv[2:])))
+    else:
+        print(__doc__)
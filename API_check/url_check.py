@@ -1,19 +1,60 @@
+import asyncio
 import requests
+import httpx
 import os
-from dotenv import load_dotenv
+from API_check.http_session import PooledAsyncClient, get_async_client, get_session
+from API_check.reputation_cache import MISS, ReputationCache, normalize_key
+from API_check.threat_db import SAFE, UNSAFE, ThreatListDB
 
 class UrlCheck:
-    def __init__(self):
-        load_dotenv()
+    api_url = "https://safebrowsing.googleapis.com/v4/threatMatches:find"
+    # Safe Browsing accepts at most 500 threatEntries per threatMatches:find call
+    max_entries_per_request = 500
+
+    def __init__(
+        self,
+        session: requests.Session = None,
+        async_client: PooledAsyncClient = None,
+        cache: ReputationCache = None,
+        threat_db: ThreatListDB = None,
+    ):
         self.api_key = os.getenv('SAFE_BROWSING_API_KEY')
-        
-    def check_url(self, url_to_check):
+        self.session = session or get_session()
+        self.async_client = async_client or get_async_client()
+        self.cache = cache
+        self.threat_db = threat_db
+
+    def _local(self, url_to_check):
         """
-        Check the legitimacy of a URL using Google Safe Browsing API.
+        Verdict from the offline threat list, or MISS if the URL hit a hash prefix
+        that still needs a full-hash confirmation from the live API.
         """
-        api_url = "https://safebrowsing.googleapis.com/v4/threatMatches:find"
-        
-        payload = {
+        if self.threat_db is None:
+            return MISS
+        status = self.threat_db.check(url_to_check)
+        if status == SAFE:
+            return {"is_safe": True, "details": "Not in local threat list."}
+        if status == UNSAFE:
+            return {"is_safe": False, "details": "Matched local threat list."}
+        return MISS
+
+    def _cached(self, url_to_check):
+        if self.cache is None:
+            return MISS
+        verdict = self.cache.get("url", url_to_check)
+        if verdict is None:
+            # Negative entry written by an older version: look the URL up again
+            return MISS
+        return verdict
+
+    def _store(self, url_to_check, verdict):
+        # Failed lookups are not cached: a remembered error would keep the URL
+        # unverified, and callers must not mistake it for a threat match
+        if self.cache is not None and "error" not in verdict:
+            self.cache.set("url", url_to_check, verdict)
+
+    def _payload(self, urls):
+        return {
             "threatInfo": {
                 "threatTypes": [
                     "MALWARE",
@@ -23,24 +64,112 @@ class UrlCheck:
                 ],
                 "platformTypes": ["ANY_PLATFORM"],
                 "threatEntryTypes": ["URL"],
-                "threatEntries": [{"url": url_to_check}],
+                "threatEntries": [{"url": url} for url in urls],
             },
         }
 
-        params = {"key": self.api_key}
+    @staticmethod
+    def _verdicts(urls, result):
+        """Split one threatMatches:find response into a verdict per submitted URL."""
+        matches = {}
+        for match in result.get("matches", []):
+            matches.setdefault(match["threat"]["url"], []).append(match)
+        verdicts = {}
+        for url in urls:
+            if url in matches:
+                verdicts[url] = {"is_safe": False, "details": matches[url]}
+            else:
+                verdicts[url] = {"is_safe": True, "details": "No threats found."}
+        return verdicts
 
-        try:
-            response = requests.post(api_url, params=params, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
-            if "matches" in result:
-                return {"is_safe": False, "details": result["matches"]}
+    def _plan(self, urls):
+        """
+        Resolve what the cache and the offline threat list already know and group
+        the rest into request batches.
+
+        Returns (verdicts by normalized URL, list of batches of normalized URLs).
+        """
+        known = {}
+        pending = []
+        seen = set()
+        for url in urls:
+            key = normalize_key("url", url)
+            if key in seen:
+                continue
+            seen.add(key)
+            verdict = self._cached(key)
+            if verdict is MISS:
+                verdict = self._local(key)
+            if verdict is MISS:
+                pending.append(key)
             else:
-                return {"is_safe": True, "details": "No threats found."}
-        except requests.exceptions.RequestException as e:
-            return {"is_safe": False, "error": str(e)}
+                known[key] = verdict
+        size = self.max_entries_per_request
+        return known, [pending[i : i + size] for i in range(0, len(pending), size)]
+
+    def _finish(self, urls, known, batch_verdicts):
+        for batch, verdicts in batch_verdicts:
+            for key in batch:
+                self._store(key, verdicts[key])
+            known.update(verdicts)
+        return {url: known[normalize_key("url", url)] for url in urls}
+
+    def check_urls(self, urls):
+        """
+        Check many URLs with as few Safe Browsing calls as possible.
+
+        Duplicates and cached URLs are skipped, the rest are packed into
+        threatMatches:find requests of up to 500 entries. Returns {url: verdict}.
+        """
+        known, batches = self._plan(urls)
+        params = {"key": self.api_key}
+
+        batch_verdicts = []
+        for batch in batches:
+            try:
+                response = self.session.post(self.api_url, params=params, json=self._payload(batch))
+                response.raise_for_status()
+
+                verdicts = self._verdicts(batch, response.json())
+            except requests.exceptions.RequestException as e:
+                verdicts = {url: {"is_safe": False, "error": str(e)} for url in batch}
+            batch_verdicts.append((batch, verdicts))
+        return self._finish(urls, known, batch_verdicts)
+
+    async def check_urls_async(self, urls):
+        """
+        Async version of check_urls using the shared async client. Batches
+        beyond the first 500 URLs are sent concurrently.
+        """
+        known, batches = self._plan(urls)
+        params = {"key": self.api_key}
+
+        async def lookup(batch):
+            try:
+                response = await self.async_client.post(self.api_url, params=params, json=self._payload(batch))
+                response.raise_for_status()
+
+                verdicts = self._verdicts(batch, response.json())
+            except httpx.HTTPError as e:
+                verdicts = {url: {"is_safe": False, "error": str(e)} for url in batch}
+            return batch, verdicts
+
+        batch_verdicts = await asyncio.gather(*[lookup(batch) for batch in batches])
+        return self._finish(urls, known, batch_verdicts)
+
+    def check_url(self, url_to_check):
+        """
+        Check the legitimacy of a URL using Google Safe Browsing API.
+        """
+        return self.check_urls([url_to_check])[url_to_check]
+
+    async def check_url_async(self, url_to_check):
+        """
+        Async version of check_url using the shared async client.
+        """
+        return (await self.check_urls_async([url_to_check]))[url_to_check]
 
 # Example usage:
 # url_checker = UrlCheck()
 # result = url_checker.check_url("http://example.com")
+# results = url_checker.check_urls(["http://example.com", "https://uspscjdp.top/i"])
@@ -0,0 +1,121 @@
+"""
+Shared, cached view of config.json for the server and the chat client.
+
+The file is parsed once into an AppConfig. A background watcher re-parses it
+only when its mtime changes and notifies subscribers, so callers on hot paths
+(analysis requests, message rendering) never touch the disk.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel, field_validator
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+logger = logging.getLogger(__name__)
+
+
+class AppConfig(BaseModel):
+    scammer_phone: Optional[str] = None
+    scammer_email: Optional[str] = None
+    scammer_timestamp: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def empty_is_none(cls, value):
+        return value or None
+
+    @property
+    def scammer_id(self) -> str:
+        # Prefer phone over email if both exist
+        return self.scammer_phone or self.scammer_email or "scammer"
+
+
+class ConfigService:
+    def __init__(self, path: str = None, poll_interval: float = 1.0):
+        self.path = path or os.getenv("APP_CONFIG_PATH", DEFAULT_CONFIG_PATH)
+        self.poll_interval = poll_interval
+        self._config = AppConfig()
+        self._mtime = None
+        self._subscribers: List[Callable[[AppConfig], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.reload()
+
+    def get(self) -> AppConfig:
+        """The current config. Never reads the file."""
+        return self._config
+
+    def subscribe(self, callback: Callable[[AppConfig], None]):
+        """Call callback(new_config) from the watcher thread after every reload."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def reload(self) -> bool:
+        """Re-parse the file if its mtime changed. Returns True if it was reloaded."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            # Only log once per disappearance, the watcher polls every second
+            if self._mtime != -1:
+                logger.error(f"Error loading scammer info: {e}")
+                self._mtime = -1
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, "r") as f:
+                config = AppConfig(**json.load(f))
+        except Exception as e:
+            # Most likely caught mid-write; the finished write bumps the mtime again
+            logger.error(f"Error loading scammer info: {e}")
+            self._mtime = mtime
+            return False
+
+        with self._lock:
+            self._config = config
+            self._mtime = mtime
+            subscribers = list(self._subscribers)
+        logger.info(f"Loaded config from {self.path}")
+        for callback in subscribers:
+            try:
+                callback(config)
+            except Exception as e:
+                logger.error(f"Config subscriber failed: {e}")
+        return True
+
+    def start(self):
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_config_service() -> ConfigService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService()
+            _service.start()
+        return _service
+
+
+def get_config() -> AppConfig:
+    return get_config_service().get()
@@ -1,6 +1,6 @@
 # client.py
 import httpx
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from dataclasses import dataclass
 from datetime import datetime
 import asyncio
@@ -17,17 +17,25 @@ class SentimentResponse:
     sentiment: str
     alert_needed: bool
     explanation: str
+    confidence: Optional[float] = None
 
 class ChatMonitorClient:
-    def __init__(self, server_url: str = "http://localhost:8000"):
+    def __init__(self, server_url: str = "http://localhost:8000", use_jobs: bool = True):
         self.server_url = server_url
         self.client = httpx.AsyncClient(timeout=30.0)
+        # Analyses often take longer than the 30s request timeout, so by default
+        # they are submitted as jobs and their results long-polled
+        self.use_jobs = use_jobs
         self.message_cache = []
         logging.info(f"ChatMonitorClient initialized with server: {server_url}")
 
-    async def analyze_chats(self, username: str, chats: List[Chat]) -> Optional[SentimentResponse]:
+    async def analyze_chats(self, username: str, chats: List[Chat],
+                            on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+                            ) -> Optional[SentimentResponse]:
         """
-        Send chats for analysis and get sentiment response
+        Send chats for analysis and get sentiment response. With on_progress,
+        the analysis is streamed and on_progress(stage, data) is called as each
+        server stage finishes
         """
         try:
             payload = {
@@ -36,6 +44,17 @@ class ChatMonitorClient:
             }
 
             logging.debug(f"Sending analysis request for {username} with {len(chats)} messages")
+            if on_progress is not None:
+                result = await self.analyze_chats_stream(payload, on_progress)
+                if result is None:
+                    self.message_cache.append(payload)
+                return result
+            if self.use_jobs:
+                result = await self.analyze_chats_job(payload)
+                if result is None:
+                    self.message_cache.append(payload)
+                return result
+
             response = await self.client.post(
                 f"{self.server_url}/analyze_chats",
                 json=payload
@@ -84,9 +103,127 @@ Explanation: {results.explanation}
         except Exception as e:
             logging.error(f"Error closing client: {e}")
 
+    async def submit_job(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Queue an analysis on the server and return its job id right away
+        """
+        response = await self.client.post(f"{self.server_url}/jobs", json=payload)
+        if response.status_code != 202:
+            logging.error(f"Server error submitting job: {response.status_code}")
+            return None
+        return response.json()["id"]
+
+    async def get_job(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        Current job state; with wait, the server holds the request until the job
+        finishes or wait seconds pass
+        """
+        response = await self.client.get(f"{self.server_url}/jobs/{job_id}", params={"wait": wait})
+        if response.status_code != 200:
+            logging.error(f"Server error fetching job {job_id}: {response.status_code}")
+            return None
+        return response.json()
+
+    async def analyze_chats_job(self, payload: Dict[str, Any], poll_wait: float = 20.0,
+                                timeout: float = 600.0) -> Optional[SentimentResponse]:
+        """
+        Submit a job and long-poll it until it finishes (or timeout seconds pass)
+        """
+        try:
+            job_id = await self.submit_job(payload)
+            if job_id is None:
+                return None
+            deadline = asyncio.get_running_loop().time() + timeout
+            while asyncio.get_running_loop().time() < deadline:
+                job = await self.get_job(job_id, wait=poll_wait)
+                if job is None:
+                    return None
+                if job["status"] == "done":
+                    return SentimentResponse(**job["result"])
+                if job["status"] == "failed":
+                    logging.error(f"Analysis job {job_id} failed: {job['error']}")
+                    return None
+            logging.error(f"Analysis job {job_id} did not finish in {timeout}s")
+            return None
+        except httpx.RequestError as e:
+            logging.error(f"Request error: {e}")
+            return None
+
+    async def analyze_chats_stream(self, payload: Dict[str, Any],
+                                   on_progress: Callable[[str, Dict[str, Any]], None],
+                                   timeout: float = 600.0) -> Optional[SentimentResponse]:
+        """
+        Stream an analysis over Server-Sent Events: on_progress(stage, data) gets
+        each stage (the "enrichment" event carries a provisional risk level)
+        and the final SentimentResponse is returned
+        """
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.server_url}/analyze_chats/stream",
+                json=payload,
+                # Model stages can be minutes apart, longer than the usual read timeout
+                timeout=httpx.Timeout(30.0, read=timeout),
+            ) as response:
+                if response.status_code != 200:
+                    logging.error(f"Server error: {response.status_code}")
+                    return None
+                stage = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        stage = line[len("event:"):].strip()
+                    elif line.startswith("data:") and stage:
+                        data = json.loads(line[len("data:"):])
+                        if stage == "final":
+                            return SentimentResponse(**data)
+                        if stage == "error":
+                            logging.error(f"Streamed analysis failed: {data['detail']}")
+                            return None
+                        on_progress(stage, data)
+            logging.error("Analysis stream ended without a final verdict")
+            return None
+        except httpx.RequestError as e:
+            logging.error(f"Request error: {e}")
+            return None
+
+    async def open_session(self, username: str,
+                           on_event: Callable[[str, Dict[str, Any]], None],
+                           window: int = 1, timeout: Optional[float] = None):
+        """
+        Open a persistent WebSocket session for one conversation: push messages
+        with session.send_message and receive "progress", "verdict" and "alert"
+        frames through on_event, without a request per analyzed window.
+        Raises if no connection comes up (within timeout seconds, if given)
+        """
+        # Imported here so the plain HTTP client works without websockets installed
+        from live_session import LiveSession
+
+        session = LiveSession(self.server_url, username, on_event, window=window)
+        await session.start(timeout)
+        return session
+
+    async def analyze_chats_batch(self, payloads: List[Dict[str, Any]]) -> Optional[List[SentimentResponse]]:
+        """
+        Send several conversations ({"username", "chats"} payloads) in one request,
+        results come back in the same order
+        """
+        try:
+            response = await self.client.post(
+                f"{self.server_url}/analyze_chats/batch",
+                json={"requests": payloads}
+            )
+            if response.status_code == 200:
+                return [SentimentResponse(**result) for result in response.json()["results"]]
+            logging.error(f"Server error: {response.status_code}")
+            return None
+        except httpx.RequestError as e:
+            logging.error(f"Request error: {e}")
+            return None
+
     async def retry_cached_messages(self):
         """
-        Retry sending cached messages
+        Retry sending cached messages, each as a server job: all are queued at
+        once and long-polled, so no single request has to outlast the timeout
         """
         if not self.message_cache:
             return
@@ -95,14 +232,14 @@ Explanation: {results.explanation}
         retry_cache = self.message_cache.copy()
         self.message_cache.clear()
 
-        for payload in retry_cache:
-            try:
-                response = await self.client.post(
-                    f"{self.server_url}/analyze_chats",
-                    json=payload
-                )
-                if response.status_code != 200:
-                    self.message_cache.append(payload)
-            except Exception as e:
-                self.message_cache.append(payload)
-                logging.error(f"Error retrying cached message: {e}")
\ No newline at end of file
+        # A few jobs in flight at a time, so long polls never wait on the connection pool
+        in_flight = asyncio.Semaphore(8)
+
+        async def retry(payload):
+            async with in_flight:
+                return await self.analyze_chats_job(payload)
+
+        results = await asyncio.gather(*(retry(payload) for payload in retry_cache))
+        for payload, result in zip(retry_cache, results):
+            if result is None:
+                self.message_cache.append(payload)
\ No newline at end of file
@@ -0,0 +1,148 @@
+# live_session.py
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+
+class LiveSession:
+    """
+    One WebSocket session per conversation with the server's /live endpoint.
+    Messages are pushed with send_message as they are sent; on_event(kind, frame)
+    is called for every "progress", "verdict" and "alert" frame the server pushes.
+    Frames carry sequence numbers and are acked, so after a dropped connection
+    the session reconnects, resumes, and nothing is lost or delivered twice.
+    """
+
+    def __init__(self, server_url: str, username: str,
+                 on_event: Callable[[str, Dict[str, Any]], None],
+                 window: int = 1, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        self.url = server_url.replace("http://", "ws://").replace("https://", "wss://") + "/live"
+        self.username = username
+        self.on_event = on_event
+        self.window = window
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.session_id: Optional[str] = None
+        # Last seq sent by us, and the last server seq delivered to on_event
+        self.sent = 0
+        self.received = 0
+        self.outbox = deque()
+        self.websocket = None
+        self.connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self, timeout: Optional[float] = None):
+        """
+        Connect in the background; returns once the first connection is up.
+        Raises if the background task ends first, or TimeoutError if no
+        connection came up within timeout seconds
+        """
+        self._task = asyncio.create_task(self._run())
+        connected = asyncio.ensure_future(self.connected.wait())
+        try:
+            await asyncio.wait({self._task, connected}, timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            connected.cancel()
+        if self.connected.is_set():
+            return
+        if self._task.done():
+            # Re-raises whatever ended the task
+            self._task.result()
+            raise ConnectionError(f"Live session to {self.url} ended before connecting")
+        self._closing = True
+        self._task.cancel()
+        raise asyncio.TimeoutError(f"No live session connection to {self.url} within {timeout}s")
+
+    async def send_message(self, sender: str, message: str):
+        """Push one chat message; it is resent after a reconnect until acked."""
+        self.sent += 1
+        frame = {"type": "message", "seq": self.sent, "sender": sender, "message": message}
+        self.outbox.append(frame)
+        await self._send(frame)
+
+    async def close(self):
+        """End the session on the server and stop reconnecting."""
+        self._closing = True
+        if self.websocket is not None:
+            try:
+                await self.websocket.send(json.dumps({"type": "bye"}))
+                await self.websocket.close()
+            except ConnectionClosed:
+                pass
+        if self._task is not None:
+            self._task.cancel()
+        logging.info(f"Live session {self.session_id} closed")
+
+    async def _send(self, frame: Dict[str, Any]):
+        if self.websocket is None:
+            return
+        try:
+            await self.websocket.send(json.dumps(frame))
+        except ConnectionClosed:
+            # The receive loop reconnects; the frame stays in the outbox
+            pass
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while not self._closing:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    await self._handshake(websocket)
+                    delay = self.reconnect_delay
+                    async for raw in websocket:
+                        await self._handle(json.loads(raw))
+            except Exception as e:
+                # Dropped connections, refused handshakes, malformed frames:
+                # all of them end this connection, none of them the session
+                logging.warning(f"Live session connection lost: {e!r}")
+            finally:
+                self.websocket = None
+                self.connected.clear()
+            if not self._closing:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _handshake(self, websocket):
+        await websocket.send(json.dumps({
+            "type": "hello",
+            "username": self.username,
+            "session": self.session_id,
+            "ack": self.received,
+            "window": self.window,
+        }))
+        welcome = json.loads(await websocket.recv())
+        if self.session_id and welcome["session"] != self.session_id:
+            # The server forgot us (restart or expiry): a fresh seq space
+            logging.warning(f"Live session {self.session_id} expired, started {welcome['session']}")
+            self.received = 0
+        self.session_id = welcome["session"]
+        self.websocket = websocket
+        self._acked(welcome["ack"])
+        for frame in list(self.outbox):
+            await self._send(frame)
+        self.connected.set()
+        logging.info(f"Live session {self.session_id} connected")
+
+    def _acked(self, seq: int):
+        while self.outbox and self.outbox[0]["seq"] <= seq:
+            self.outbox.popleft()
+
+    async def _handle(self, frame: Dict[str, Any]):
+        if frame["type"] == "ack":
+            self._acked(frame["seq"])
+            return
+        # Resent after a reconnect but already delivered: only our ack was lost
+        if frame["seq"] > self.received:
+            self.received = frame["seq"]
+            try:
+                self.on_event(frame["type"], frame)
+            except Exception as e:
+                logging.error(f"Live session event handler failed: {e}")
+        await self._send({"type": "ack", "seq": self.received})
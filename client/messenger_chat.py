@@ -9,7 +9,7 @@ from client import ChatMonitorClient, Chat, SentimentResponse
 from datetime import datetime
 import uuid
 import nest_asyncio
-from parent_monitor import ParentMonitorWindow, MonitoringAlert, MonitorStyle
+from parent_monitor import ParentMonitorWindow, MonitoringAlert, MonitorStyle, ProvisionalRisk
 import signal
 import sys
 from typing import List, Optional
@@ -19,6 +19,9 @@ import json
 import time
 import os
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app_config import get_config
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -85,6 +88,29 @@ class AsyncTkThread:
             logging.error(f"Async operation error: {e}")
             return None
 
+    def submit(self, coro, on_result):
+        """
+        Start a coroutine without waiting for it. on_result(result) is called on
+        the async thread once it finishes (None if it failed); there is no time
+        cap, so long jobs and streams still deliver their result
+        """
+        if not self.running:
+            return None
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def done(future):
+            if future.cancelled():
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Async operation error: {e}")
+                result = None
+            on_result(result)
+
+        future.add_done_callback(done)
+        return future
+
     def stop(self):
         self.running = False
         self.loop.call_soon_threadsafe(self.loop.stop)
@@ -336,26 +362,10 @@ class ChatWindow:
         # Add spacing before message
         self.chat_display.insert(tk.END, "\n")
 
-        def load_scammer_timestamp():
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(script_dir, "..", "config.json")
-            try:
-                with open(config_path, "r") as f:
-                    config = json.load(f)
-                    if config.get("scammer_timestamp"):
-                        logging.info(f"timestamp: {config.get('scammer_timestamp')}")
-                        return config.get("scammer_timestamp")
-                    else:
-                        logging.info("No timestamp in config.json")
-                        return None
-            except Exception as e:
-                logging.error(f"Error loading scammer info: {e}")
-                return None
-
         # Get current timestamp
         # timestamp = datetime.now().strftime("%H:%M")
-        timestamp = load_scammer_timestamp()
-        logging.info(f"timestamp: {timestamp}")
+        # Cached config, no file read per rendered message
+        timestamp = get_config().scammer_timestamp
 
         # Create and insert message bubble with sender and timestamp
         bubble = self.create_message_bubble(sender, message, timestamp, is_self)
@@ -774,19 +784,6 @@ Provide the guidelines as a numbered list of steps. Do not include any internal
             traceback.print_exc()
 
 
-def load_scammer_info():
-    try:
-        with open("config.json", "r") as f:
-            config = json.load(f)
-            # Prefer phone over email if both exist
-            return (
-                config.get("scammer_phone") or config.get("scammer_email") or "scammer"
-            )
-    except Exception as e:
-        logging.error(f"Error loading scammer info: {e}")
-        return "scammer"
-
-
 class MessengerChat:
     """Main chat application controller"""
 
@@ -800,7 +797,7 @@ class MessengerChat:
         self.running = True
 
         # Load scammer identifier from config
-        self.scammer_id = load_scammer_info()
+        self.scammer_id = get_config().scammer_id
 
         print("Creating windows...")
         # Create windows with scammer identifier
@@ -832,6 +829,11 @@ class MessengerChat:
         self.last_analyzed_index = -1  # Track last analyzed message
         self.messages_since_analysis = 0  # Counter for messages since last analysis
 
+        # One live WebSocket session for the conversation; without it (server
+        # unreachable, websockets not installed) each window is a streamed request
+        self.live_senders = {}  # message seq -> sender, for the frames about it
+        self.live_session = self.open_live_session()
+
         # Setup signal handlers
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -840,6 +842,42 @@ class MessengerChat:
             f"MessengerChat initialized with sliding window size: {self.window_size}"
         )
 
+    def open_live_session(self):
+        """Open the conversation's live session, None if it cannot be opened"""
+        session = self.async_handler.run(
+            self.client.open_session(
+                "victim_demo", self.handle_live_event, window=self.window_size, timeout=10
+            )
+        )
+        if session is None:
+            logging.warning("Live session unavailable, analyzing over HTTP")
+        return session
+
+    def handle_live_event(self, kind: str, frame: dict):
+        """Frames from the live session, called on the async thread"""
+        sender = self.live_senders.get(frame.get("through"), self.scammer_id)
+        if kind == "progress":
+            # Fast checks reach the parent long before the model verdict
+            risk = ProvisionalRisk.from_event(sender, frame["stage"], frame["data"])
+            if risk is not None:
+                self.alert_queue.put(risk)
+        elif kind == "verdict":
+            results = SentimentResponse(
+                sentiment=frame["sentiment"],
+                alert_needed=frame["alert_needed"],
+                explanation=frame["explanation"],
+                confidence=frame.get("confidence"),
+            )
+            self.message_queue.put((sender, results))
+            self.last_analyzed_index = len(self.current_chat) - 1
+            self.messages_since_analysis = 0
+        # "alert" repeats a verdict with alert_needed set, already queued above
+
+    async def send_live(self, sender: str, message: str):
+        # The seq send_message is about to assign, before anything else can
+        self.live_senders[self.live_session.sent + 1] = sender
+        await self.live_session.send_message(sender, message)
+
     def get_analysis_window(self) -> List[Chat]:
         """Get the current sliding window of messages"""
         if len(self.current_chat) <= self.window_size:
@@ -915,32 +953,49 @@ class MessengerChat:
             f"Messages: total={len(self.current_chat)}, since_analysis={self.messages_since_analysis}"
         )
 
+        if self.live_session is not None:
+            # The server analyzes the latest window itself and pushes the verdict
+            asyncio.run_coroutine_threadsafe(
+                self.send_live(sender, message), self.async_handler.loop
+            )
+            return
+
         # Analyze if needed
         if self.should_analyze():
+            self.analyze_window(sender)
+
+    def analyze_window(self, sender: str):
+        """
+        Start analyzing the current window without blocking. The result is queued
+        for the Tk loop (check_analysis) whenever it arrives, however long the
+        server job or stream takes
+        """
+        analysis_window = self.get_analysis_window()
+        logging.info(f"Analyzing window of {len(analysis_window)} messages")
+
+        def on_progress(stage, data):
+            # Fast checks reach the parent long before the model verdict
+            risk = ProvisionalRisk.from_event(sender, stage, data)
+            if risk is not None:
+                self.alert_queue.put(risk)
+
+        def on_result(results):
+            if results:
+                self.message_queue.put((sender, results))
+                self.last_analyzed_index = len(self.current_chat) - 1
+                self.messages_since_analysis = 0
+                logging.info(
+                    f"Analysis complete. Next analysis after {self.window_size} more messages"
+                )
 
-            def analyze_wrapper():
-                try:
-                    analysis_window = self.get_analysis_window()
-                    logging.info(f"Analyzing window of {len(analysis_window)} messages")
-
-                    results = self.async_handler.run(
-                        self.client.analyze_chats(
-                            username=f"{sender}_demo", chats=analysis_window
-                        )
-                    )
-
-                    if results:
-                        self.message_queue.put((sender, results))
-                        self.last_analyzed_index = len(self.current_chat) - 1
-                        self.messages_since_analysis = 0
-                        logging.info(
-                            f"Analysis complete. Next analysis after {self.window_size} more messages"
-                        )
-
-                except Exception as e:
-                    logging.error(f"Analysis error: {e}")
-
-            threading.Thread(target=analyze_wrapper, daemon=True).start()
+        self.async_handler.submit(
+            self.client.analyze_chats(
+                username=f"{sender}_demo",
+                chats=analysis_window,
+                on_progress=on_progress,
+            ),
+            on_result,
+        )
 
     def reset_chat(self):
         """Reset chat and analysis state"""
@@ -949,6 +1004,12 @@ class MessengerChat:
             self.last_analyzed_index = -1
             self.messages_since_analysis = 0
 
+            # A fresh server-side conversation for the live session
+            if self.live_session is not None:
+                self.async_handler.run(self.live_session.close())
+                self.live_senders = {}
+                self.live_session = self.open_live_session()
+
             # Clear chat windows
             self.scammer_window.clear_chat()
             self.victim_window.clear_chat()
@@ -1028,6 +1089,9 @@ class MessengerChat:
         self.running = False
         logging.info("Stopping application")
 
+        if self.live_session is not None:
+            self.async_handler.run(self.live_session.close())
+
         if self.async_handler:
             self.async_handler.stop()
 
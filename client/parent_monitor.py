@@ -6,8 +6,12 @@ from dataclasses import dataclass
 import queue
 import json
 import os
+import sys
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app_config import get_config, get_config_service
+
 
 class MonitorStyle:
     # Colors
@@ -61,15 +65,27 @@ class MonitoringAlert:
         }
 
 
-def load_scammer_info():
-    try:
-        with open("config.json", "r") as f:
-            config = json.load(f)
-            # Prefer phone over email if both exist
-            return config.get("scammer_phone") or config.get("scammer_email") or "scammer"
-    except Exception as e:
-        logging.error(f"Error loading scammer info: {e}")
-        return "scammer"
+@dataclass
+class ProvisionalRisk:
+    """Early risk level from a streamed analysis stage, replaced by the final alert."""
+    child_name: str
+    level: str  # HIGH / MEDIUM / LOW
+    reason: str
+
+    # Unvalidated model verdicts map onto the same levels
+    SENTIMENT_LEVELS = {"SCAM": "HIGH", "SUSPICIOUS": "MEDIUM", "SAFE": "LOW"}
+
+    @classmethod
+    def from_event(cls, child_name: str, stage: str, data: dict) -> Optional["ProvisionalRisk"]:
+        if stage == "enrichment":
+            return cls(child_name, data["risk"]["level"], data["risk"]["reason"])
+        if stage == "first_guardian" and data["sentiment"] in cls.SENTIMENT_LEVELS:
+            return cls(
+                child_name,
+                cls.SENTIMENT_LEVELS[data["sentiment"]],
+                f"model says {data['sentiment']}, still validating",
+            )
+        return None
 
 
 class ParentMonitorWindow:
@@ -89,8 +105,9 @@ class ParentMonitorWindow:
         self.reset_callback = reset_callback
         self.is_processing = False
         
-        # Load scammer identifier
-        self.scammer_id = load_scammer_info()
+        # Load scammer identifier and follow later edits of config.json
+        self.scammer_id = get_config().scammer_id
+        get_config_service().subscribe(self.on_config_reload)
 
         # Create logs directory
         self.logs_dir = "monitoring_logs"
@@ -107,6 +124,9 @@ class ParentMonitorWindow:
         self.window.bind("<Control-r>", lambda e: self.confirm_reset())
         self.window.bind("<Control-m>", lambda e: self.toggle_monitoring())
 
+    def on_config_reload(self, config):
+        self.scammer_id = config.scammer_id
+
     def setup_gui(self):
         # Main container
         main_frame = ttk.Frame(self.window, padding="15")
@@ -334,10 +354,21 @@ class ParentMonitorWindow:
         """Update the processing status indicator"""
         self.is_processing = is_processing
         if is_processing:
-            self.processing_label.configure(text="Processing messages...")
+            self.processing_label.configure(text="Processing messages...", foreground="orange")
         else:
             self.processing_label.configure(text="")
 
+    def show_provisional_risk(self, risk: ProvisionalRisk):
+        """Show the early risk level until the final alert clears it"""
+        color = {
+            "HIGH": MonitorStyle.ALERT_BG,
+            "MEDIUM": MonitorStyle.WARNING_BG,
+        }.get(risk.level, MonitorStyle.SAFE_BG)
+        self.processing_label.configure(
+            text=f"Provisional risk for {risk.child_name}: {risk.level} ({risk.reason})",
+            foreground=color,
+        )
+
     def add_alert(self, alert: MonitoringAlert):
         self.update_processing_status(False)  # Clear processing status when alert arrives
         self.alerts.append(alert)
@@ -430,7 +461,9 @@ class ParentMonitorWindow:
             if self.monitoring_active:
                 try:
                     alert = self.alert_queue.get_nowait()
-                    if alert:
+                    if isinstance(alert, ProvisionalRisk):
+                        self.show_provisional_risk(alert)
+                    elif alert:
                         self.add_alert(alert)
                 except queue.Empty:
                     # if not self.is_processing:  # Commented out processing status check
@@ -0,0 +1,74 @@
+"""
+Server-side micro-batching of single analysis requests.
+
+Requests arriving within MICROBATCH_WINDOW_MS of each other are submitted
+together, so identical windows (e.g. a broadcast scam reaching many users at
+once) are analyzed once and links shared between windows are looked up once.
+Every distinct window is still its own worker pool
+job, admitted on its own, and each request resolves as soon as its own job is
+done.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, List
+
+
+def batch_settings():
+    return {
+        # 0 disables micro-batching of single requests
+        "window": float(os.getenv("MICROBATCH_WINDOW_MS", "20")) / 1000,
+        "max_size": int(os.getenv("MICROBATCH_MAX_SIZE", "16")),
+        "max_items": int(os.getenv("BATCH_MAX_ITEMS", "10")),
+    }
+
+
+class MicroBatcher:
+    def __init__(self, submit_batch: Callable[[List], Awaitable[List[Awaitable]]], window: float, max_size: int):
+        # await submit_batch(items) starts the work and returns one awaitable per item
+        self.submit_batch = submit_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, item):
+        """Queue one item; resolves with its own result as soon as it is done."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            results = await self.submit_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            asyncio.ensure_future(self._resolve(future, result))
+
+    @staticmethod
+    async def _resolve(future, result: Awaitable):
+        try:
+            value = await result
+        except Exception as e:
+            # e.g. PoolSaturatedError: only this request gets the 503
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(value)
@@ -0,0 +1,213 @@
+"""
+Near-duplicate scam campaign detection with MinHash/LSH.
+
+Scam texts are templated with small variations (link slugs, amounts, names),
+which an exact verdict cache misses. Every analyzed window is MinHashed over
+character shingles of its normalized text and indexed with LSH banding, so a
+new window finds earlier look-alikes in roughly constant time. Close matches
+reuse the earlier verdict; weaker ones are passed to the model as evidence.
+Windows that match each other are grouped into campaigns, which can be listed.
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_for_shingles(text: str) -> str:
+    """Fold the parts that vary between recipients of the same template."""
+    text = text.lower()
+    text = re.sub(r"https?://\S+", " url ", text)
+    text = re.sub(r"\d+", "0", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def shingles(text: str, k: int = 5) -> set:
+    text = normalize_for_shingles(text)
+    if len(text) <= k:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i : i + k].encode("utf-8")) for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        # Deterministic permutations so signatures are comparable across restarts
+        state = seed
+        self.permutations = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = state % _MERSENNE_PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            self.permutations.append((a, state % _MERSENNE_PRIME))
+
+    def signature(self, shingle_set) -> Tuple[int, ...]:
+        return tuple(
+            min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingle_set)
+            for a, b in self.permutations
+        )
+
+
+def similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+@dataclass
+class Entry:
+    id: int
+    signature: Tuple[int, ...]
+    campaign: int
+    verdict: dict
+    preview: str
+    seen_at: float = field(default_factory=time.time)
+
+
+class CampaignIndex:
+    """
+    Incremental LSH index of analyzed windows. bands x rows = num_perm; with the
+    defaults (16 x 4) pairs above ~0.5 similarity are very likely to collide.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, max_entries: int = 20000):
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Entry]" = OrderedDict()
+        self._buckets: List[Dict[tuple, List[int]]] = [{} for _ in range(bands)]
+        self._next_id = 0
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows]
+
+    def signature(self, text: str):
+        return self.hasher.signature(shingles(text))
+
+    def nearest(self, signature) -> Tuple[Optional[Entry], float]:
+        """Most similar indexed window among the LSH candidates."""
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self._buckets[band].get(key, ()))
+            best, best_score = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                score = similarity(signature, entry.signature)
+                if score > best_score:
+                    best, best_score = entry, score
+            return best, best_score
+
+    def add(self, text: str, verdict: dict, signature=None, join_threshold: float = 0.5) -> Entry:
+        """Index an analyzed window, joining the campaign of its nearest match."""
+        signature = signature or self.signature(text)
+        nearest, score = self.nearest(signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            campaign = nearest.campaign if nearest is not None and score >= join_threshold else entry_id
+            entry = Entry(entry_id, signature, campaign, verdict, text[:200])
+            self._entries[entry_id] = entry
+            for band, key in self._band_keys(signature):
+                self._buckets[band].setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+            return entry
+
+    def _evict(self):
+        old_id, old = self._entries.popitem(last=False)
+        for band, key in self._band_keys(old.signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.remove(old_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def campaigns(self, min_size: int = 2) -> List[dict]:
+        """Campaigns with at least min_size windows, largest first."""
+        with self._lock:
+            groups: Dict[int, List[Entry]] = {}
+            for entry in self._entries.values():
+                groups.setdefault(entry.campaign, []).append(entry)
+        summaries = [self._summary(cid, entries) for cid, entries in groups.items() if len(entries) >= min_size]
+        return sorted(summaries, key=lambda summary: summary["size"], reverse=True)
+
+    def campaign(self, campaign_id: int) -> Optional[dict]:
+        with self._lock:
+            entries = [e for e in self._entries.values() if e.campaign == campaign_id]
+        if not entries:
+            return None
+        summary = self._summary(campaign_id, entries)
+        summary["messages"] = [
+            {"preview": e.preview, "sentiment": e.verdict.get("sentiment"), "seen_at": e.seen_at}
+            for e in entries
+        ]
+        return summary
+
+    @staticmethod
+    def _summary(campaign_id, entries):
+        sentiments = {}
+        for entry in entries:
+            sentiment = entry.verdict.get("sentiment")
+            sentiments[sentiment] = sentiments.get(sentiment, 0) + 1
+        return {
+            "id": campaign_id,
+            "size": len(entries),
+            "sentiments": sentiments,
+            "representative": entries[0].preview,
+            "first_seen": entries[0].seen_at,
+            "last_seen": entries[-1].seen_at,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def campaign_settings():
+    return {
+        "enabled": os.getenv("CAMPAIGN_DETECTION", "1") == "1",
+        # Reuse the earlier verdict outright at or above this similarity
+        "reuse": float(os.getenv("CAMPAIGN_REUSE_SIMILARITY", "0.8")),
+        # Mention the earlier verdict to the model at or above this similarity
+        "evidence": float(os.getenv("CAMPAIGN_EVIDENCE_SIMILARITY", "0.5")),
+    }
+
+
+_index = None
+_index_pid = None
+
+
+def get_campaign_index() -> CampaignIndex:
+    global _index, _index_pid
+    if _index is None or _index_pid != os.getpid():
+        _index_pid = os.getpid()
+        _index = CampaignIndex(max_entries=int(os.getenv("CAMPAIGN_MAX_ENTRIES", "20000")))
+    return _index
+
+
+if __name__ == "__main__":
+    index = CampaignIndex()
+    template = (
+        "U.S. Post: You have a USPS parcel being cleared, due to the detection of an invalid zip code "
+        "address, the parcel can not be cleared. Please confirm in the link within {hours} hours. {url} "
+        "(Please reply with a Y, then exit the text message and open it again to activate the link)"
+    )
+    scam = {"sentiment": "SCAM", "alert_needed": True, "explanation": "USPS smishing"}
+    index.add(template.format(hours=24, url="https://uspscjdp.top/i"), scam)
+    index.add("Are we still on for lunch tomorrow at noon?", {"sentiment": "SAFE"})
+    variant = template.format(hours=12, url="https://usps-redeliver.xyz/k8Zq")
+    started = time.perf_counter()
+    match, score = index.nearest(index.signature(variant))
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Variant matched {match.verdict['sentiment'] if match else None} at similarity {score:.2f} in {elapsed:.2f}ms")
+    index.add(variant, scam)
+    print(index.campaigns())
@@ -0,0 +1,143 @@
+"""
+Two-tier model cascade: a small, fast model classifies first and only
+SUSPICIOUS or low-confidence verdicts escalate to the large model. A fast SAFE
+is never final on its own: it escalates when it contradicts a deterministic
+reputation signal, and otherwise still has to pass the large model's validator.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+import event_loop
+from deadline import DEFAULT_SHARES
+from guardian import GuardianResponse, first_guardian_async, second_guardian_async
+from models import SentimentResponse
+from pipeline_stats import pipeline_stats
+
+logger = logging.getLogger(__name__)
+
+
+def cascade_settings():
+    return {
+        # Empty GUARDIAN_FAST_MODEL disables the cascade
+        "fast_model": os.getenv("GUARDIAN_FAST_MODEL", "llama3.2:latest"),
+        "model": os.getenv("GUARDIAN_MODEL", "deepseek-r1:8b"),
+        "escalate_below": float(os.getenv("CASCADE_ESCALATE_CONFIDENCE", "0.75")),
+    }
+
+
+def guardian_model() -> str:
+    """The large model used by the detector retries, voting and the validator."""
+    return cascade_settings()["model"]
+
+
+def budget_shares() -> dict:
+    """Stage shares with the fast tier slotted in before the large detector."""
+    if not cascade_settings()["fast_model"]:
+        return dict(DEFAULT_SHARES)
+    shares = {"enrichment": DEFAULT_SHARES["enrichment"], "triage": 0.1}
+    shares.update((stage, share) for stage, share in DEFAULT_SHARES.items() if stage != "enrichment")
+    return shares
+
+
+async def timed_guardian(model: str, prompt: str, options: dict = None) -> GuardianResponse:
+    """first_guardian_async, with its latency recorded per model tier."""
+    started = time.perf_counter()
+    try:
+        return await first_guardian_async(model=model, prompt=prompt, options=options)
+    finally:
+        pipeline_stats.observe(f"guardian:{model}", time.perf_counter() - started)
+
+
+def escalation_reason(result: Optional[dict], threshold: float, enrichment=None) -> Optional[str]:
+    """Why a fast-tier verdict cannot be trusted on its own, or None to accept it."""
+    if result is None:
+        return "no usable verdict"
+    if result.get("sentiment") not in ("SAFE", "SCAM"):
+        return f"sentiment {result.get('sentiment')}"
+    if result.get("confidence", 0) < threshold:
+        return f"confidence {result.get('confidence', 0):.2f}"
+    if result["sentiment"] == "SAFE" and enrichment is not None:
+        if enrichment.urls_safe is False:
+            return "SAFE contradicts a Safe Browsing hit"
+        if enrichment.phone_invalid:
+            return "SAFE contradicts a phone number no provider considers valid"
+    return None
+
+
+def validator_rejection(result: dict, budget, make_validator_prompt, emit) -> Optional[str]:
+    """Run the large model's validator on a fast-tier verdict; None if it holds up."""
+    # Bounded by the large detector's share, the call it may save, so an
+    # escalation still has time for the detector and validator
+    stage_timeout = budget.stage_timeout("first_guardian")
+    try:
+        valid = event_loop.run(
+            second_guardian_async(
+                model=guardian_model(), prompt=make_validator_prompt(result["explanation"])
+            ),
+            timeout=stage_timeout,
+        )
+    except FutureTimeoutError:
+        return f"validator timed out after {stage_timeout:.1f} seconds"
+    except Exception as e:
+        return f"validator failed: {e!r}"
+    pipeline_stats.incr("validator_runs")
+    emit("validator", {"round": 1, "tier": "fast", "valid": bool(valid)})
+    return None if valid else "validator rejected the verdict"
+
+
+def fast_tier_verdict(
+    prompt: str, budget, enrichment, make_validator_prompt, emit=lambda stage, data: None
+) -> Optional[SentimentResponse]:
+    """
+    Classify with the fast model. Returns its verdict if confident, consistent
+    with the reputation signals and (for SAFE) confirmed by the validator, or
+    None to escalate to the large model. emit(stage, data) reports progress.
+    """
+    settings = cascade_settings()
+    stage_timeout = budget.stage_timeout("triage")
+    result = None
+    try:
+        result = event_loop.run(
+            timed_guardian(settings["fast_model"], prompt), timeout=stage_timeout
+        ).model_dump()
+    except FutureTimeoutError:
+        logger.info(f"Fast tier timed out after {stage_timeout:.1f} seconds")
+    except Exception as e:
+        logger.error(f"Fast tier failed: {e!r}")
+    if result is not None:
+        emit(
+            "first_guardian",
+            {"round": 1, "tier": "fast", "sentiment": result["sentiment"], "confidence": result["confidence"]},
+        )
+
+    reason = escalation_reason(result, settings["escalate_below"], enrichment)
+    if reason is None and result["sentiment"] == "SAFE":
+        # A missed scam costs far more than a validator call
+        reason = validator_rejection(result, budget, make_validator_prompt, emit)
+    if reason is None:
+        pipeline_stats.incr("cascade_accepted")
+        logger.info(f"Fast tier verdict accepted: {result['sentiment']} ({result['confidence']:.2f})")
+        return SentimentResponse(**result)
+    pipeline_stats.incr("cascade_escalated")
+    logger.info(f"Escalating to {settings['model']}: {reason}")
+    return None
+
+
+def cascade_report(snapshot: dict) -> dict:
+    """Escalation rate and per-tier latency from a pipeline_stats snapshot."""
+    counters = snapshot["counters"]
+    accepted = counters.get("cascade_accepted", 0)
+    escalated = counters.get("cascade_escalated", 0)
+    total = accepted + escalated
+    return {
+        "escalation_rate": round(escalated / total, 4) if total else None,
+        "tiers": {
+            name[len("guardian:") :]: latency
+            for name, latency in snapshot["latency_seconds"].items()
+            if name.startswith("guardian:")
+        },
+    }
@@ -0,0 +1,48 @@
+"""
+Request-level latency budget split across the analysis stages.
+
+Replaces the SIGALRM based timeout, which only worked on the main thread. Each
+stage asks the budget how long it may run and enforces that itself with a
+future/asyncio timeout, so this works from executor threads and worker processes.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+# Stages in pipeline order with their relative share of the budget
+DEFAULT_SHARES = {
+    "enrichment": 0.1,
+    "first_guardian": 0.5,
+    "validator": 0.4,
+}
+
+
+class DeadlineBudget:
+    def __init__(self, total: float, shares: Optional[Dict[str, float]] = None):
+        self.total = total
+        self.shares = dict(shares or DEFAULT_SHARES)
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_env(cls, shares: Optional[Dict[str, float]] = None):
+        return cls(total=float(os.getenv("ANALYSIS_BUDGET", "120")), shares=shares)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(self.total - self.elapsed(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stage_timeout(self, stage: str) -> float:
+        """
+        Time the stage may use: its share of what is left, weighed against the
+        stages still to come. Time a fast stage does not use rolls forward.
+        """
+        stages = list(self.shares)
+        later = stages[stages.index(stage) :]
+        weight = self.shares[stage] / sum(self.shares[s] for s in later)
+        return self.remaining() * weight
@@ -0,0 +1,182 @@
+"""
+Reputation enrichment stage: URL, phone and email lookups issued concurrently.
+
+Every lookup runs on the shared event loop (event_loop.py) with its own deadline,
+so the stage takes as long as the slowest single lookup rather than their sum.
+A lookup that fails or misses its deadline is reported as None.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import event_loop
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from API_check.email_check import EmailCheck
+from API_check.url_check import UrlCheck
+from API_check.phone_check import PhoneCheck
+from API_check.reputation_cache import ReputationCache
+from API_check.threat_db import ThreatListDB
+
+logger = logging.getLogger(__name__)
+
+
+def lookup_timeout() -> float:
+    return float(os.getenv("ENRICHMENT_LOOKUP_TIMEOUT", "5"))
+
+
+@dataclass
+class Enrichment:
+    url_verdicts: Optional[Dict[str, dict]] = None
+    phone_score: Optional[float] = None
+    # Providers that answered the phone lookup, and how many were asked
+    phone_answered: Optional[int] = None
+    phone_asked: Optional[int] = None
+    email_score: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def urls_safe(self) -> Optional[bool]:
+        """
+        False if a lookup flagged a URL, True if every URL was checked clean, None
+        if unknown (no URLs, or a lookup failed). A failed lookup is never a hit.
+        """
+        if not self.url_verdicts:
+            return None
+        if any(
+            not verdict["is_safe"] and "error" not in verdict
+            for verdict in self.url_verdicts.values()
+        ):
+            return False
+        if self.url_lookup_failed:
+            return None
+        return True
+
+    @property
+    def phone_invalid(self) -> bool:
+        """
+        True only if every phone provider answered and none considers the number
+        valid. A 0 from the providers that happened to answer is not that.
+        """
+        return (
+            self.phone_score == 0
+            and self.phone_answered is not None
+            and self.phone_answered == self.phone_asked
+        )
+
+    @property
+    def url_lookup_failed(self) -> bool:
+        """True if the URL lookup timed out or any URL could not be checked."""
+        if self.url_verdicts is None:
+            return "url" in self.timings
+        return any("error" in verdict for verdict in self.url_verdicts.values())
+
+
+_checkers = None
+_cache = None
+_cache_pid = None
+
+
+def get_cache() -> ReputationCache:
+    global _cache, _cache_pid, _checkers
+    # SQLite connections must not be shared with forked pool workers
+    if _cache is None or _cache_pid != os.getpid():
+        _cache_pid = os.getpid()
+        _checkers = None
+        _cache = ReputationCache(
+            max_entries=int(os.getenv("REPUTATION_CACHE_MAX_ENTRIES", "10000"))
+        )
+    return _cache
+
+
+def load_threat_db() -> Optional[ThreatListDB]:
+    """
+    Open the offline threat list if THREAT_DB_PATH is set, applying the feed in
+    THREAT_DB_FEED first when it is newer than the stored version.
+    """
+    path = os.getenv("THREAT_DB_PATH")
+    if not path:
+        return None
+    db = ThreatListDB(path)
+    feed = os.getenv("THREAT_DB_FEED")
+    if feed and os.path.exists(feed):
+        if db.apply_update(feed):
+            logger.info(f"Applied threat feed {feed}, version {db.version}")
+    logger.info(f"Loaded threat list with {len(db)} prefixes (version {db.version})")
+    return db
+
+
+def get_checkers():
+    """
+    Checker instances sharing the process-wide pooled async client. They are only
+    ever awaited on the shared loop, so its connections never cross event loops.
+    """
+    global _checkers
+    cache = get_cache()
+    if _checkers is None:
+        _checkers = {
+            "url": UrlCheck(cache=cache, threat_db=load_threat_db()),
+            "phone": PhoneCheck(provider_timeout=lookup_timeout(), cache=cache),
+            "email": EmailCheck(cache=cache),
+        }
+    return _checkers
+
+
+async def _timed(name: str, coro, timeout: float, timings: dict):
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} lookup missed its {timeout}s deadline")
+        return None
+    except Exception as e:
+        logger.error(f"{name} lookup failed: {e}")
+        return None
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+async def enrich_async(
+    urls: List[str],
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    timeout: float = None,
+) -> Enrichment:
+    # 0 is a real deadline (the analysis budget is spent), not "use the default"
+    if timeout is None:
+        timeout = lookup_timeout()
+    checkers = get_checkers()
+    result = Enrichment()
+    lookups = {}
+    if urls:
+        lookups["url"] = checkers["url"].check_urls_async(urls)
+    if phone:
+        lookups["phone"] = checkers["phone"].check_phone_answers_async(phone_number=phone)
+    if email:
+        lookups["email"] = checkers["email"].check_email_async(email=email)
+
+    values = await asyncio.gather(
+        *[_timed(name, coro, timeout, result.timings) for name, coro in lookups.items()]
+    )
+    values = dict(zip(lookups, values))
+    result.url_verdicts = values.get("url")
+    if values.get("phone") is not None:
+        result.phone_score, result.phone_answered, result.phone_asked = values["phone"]
+    result.email_score = values.get("email")
+    logger.info(f"Enrichment timings: {result.timings}")
+    return result
+
+
+def enrich(
+    urls: List[str],
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    timeout: float = None,
+) -> Enrichment:
+    """Blocking entry point for analysis worker threads."""
+    return event_loop.run(enrich_async(urls, phone, email, timeout))
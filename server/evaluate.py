@@ -0,0 +1,120 @@
+"""
+Run the analysis pipeline over a labeled set and report accuracy and latency,
+so pipeline changes can be checked for accuracy regressions.
+
+The labeled set is JSONL, one conversation window per line:
+    {"messages": ["U.S. Post: your parcel ...", "..."], "label": "SCAM"}
+
+Usage:
+    python evaluate.py labeled.jsonl
+    python evaluate.py labeled.jsonl --no-validator-skip   # baseline for comparison
+    python evaluate.py labeled.jsonl --no-cascade          # large model only
+    python evaluate.py labeled.jsonl --no-rules            # no rule-based fast path
+
+The verdict cache and campaign reuse are off unless asked for: either would
+answer a repeated or near-duplicate example from an earlier verdict instead
+of the pipeline under test.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from models import Chat
+
+
+def load_examples(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the scam detection pipeline")
+    parser.add_argument("labeled_set")
+    parser.add_argument("--max-rounds", type=int, default=None)
+    parser.add_argument(
+        "--no-validator-skip",
+        action="store_true",
+        help="always run the validator (baseline)",
+    )
+    parser.add_argument(
+        "--no-cascade",
+        action="store_true",
+        help="skip the fast model tier (baseline)",
+    )
+    parser.add_argument(
+        "--no-rules",
+        action="store_true",
+        help="disable the rule-based pre-classifier (baseline)",
+    )
+    parser.add_argument(
+        "--verdict-cache",
+        action="store_true",
+        help="answer repeated windows from the verdict cache",
+    )
+    parser.add_argument(
+        "--campaigns",
+        action="store_true",
+        help="reuse verdicts of near-duplicate campaign messages",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.no_validator_skip:
+        os.environ["VALIDATOR_SKIP_CONFIDENCE"] = "1.1"
+    if args.no_cascade:
+        os.environ["GUARDIAN_FAST_MODEL"] = ""
+    if args.no_rules:
+        os.environ["PRECLASSIFIER"] = "off"
+    if not args.verdict_cache:
+        os.environ["VERDICT_CACHE"] = "0"
+    if not args.campaigns:
+        os.environ["CAMPAIGN_DETECTION"] = "0"
+
+    # Imported after .env is loaded, like the server does in its lifespan hook
+    from sentiment_analyzer import analyze_sentiment
+    from pipeline_stats import pipeline_stats
+    from cascade import cascade_report
+
+    examples = load_examples(args.labeled_set)
+    confusion = Counter()
+    correct = 0
+    alert_correct = 0
+    for example in examples:
+        chats = [
+            Chat(sender=example.get("sender", "scammer"), message=message)
+            for message in example["messages"]
+        ]
+        started = time.perf_counter()
+        result = analyze_sentiment(chats, args.max_rounds)
+        elapsed = time.perf_counter() - started
+
+        label = example["label"]
+        confusion[(label, result.sentiment)] += 1
+        correct += result.sentiment == label
+        alert_correct += result.alert_needed == (label != "SAFE")
+        print(f"{label:>10} -> {result.sentiment:<10} {elapsed:6.1f}s")
+
+    total = len(examples)
+    stats = pipeline_stats.snapshot()
+    print()
+    print(f"Examples:        {total}")
+    print(f"Accuracy:        {correct / total:.1%}")
+    print(f"Alert accuracy:  {alert_correct / total:.1%}")
+    print(f"Latency:         {stats['latency_seconds'].get('analysis')}")
+    print(f"Counters:        {stats['counters']}")
+    cascade = cascade_report(stats)
+    print(f"Escalation rate: {cascade['escalation_rate']}")
+    for model, latency in cascade["tiers"].items():
+        print(f"  {model}: {latency}")
+    print("Confusion (label -> predicted):")
+    for (label, predicted), count in sorted(confusion.items()):
+        print(f"  {label:>10} -> {predicted:<10} {count}")
+
+
+if __name__ == "__main__":
+    main()
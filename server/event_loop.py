@@ -0,0 +1,44 @@
+"""
+One background asyncio loop shared by every analysis worker thread.
+
+Analysis runs on executor threads (see worker_pool.py), which have no event loop
+of their own. Async I/O such as reputation lookups is submitted to this loop so
+all workers share the same connection pools instead of each spinning up a loop.
+"""
+
+import asyncio
+import os
+import threading
+
+_loop = None
+_loop_pid = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid
+    with _lock:
+        # A forked worker inherits the variable but not the thread running it.
+        if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="shared-event-loop", daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def run(coro, timeout: float = None):
+    """Run a coroutine on the shared loop from a worker thread and wait for it."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout=timeout)
+    except Exception:
+        future.cancel()
+        raise
+
+
+def submit(coro) -> asyncio.Future:
+    """Run a coroutine on the shared loop and return an awaitable for another loop (e.g. the server's)."""
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
@@ -1,52 +1,537 @@
 """
 This file utilize Ollama as the second layer of our scam detection.
+
+GuardianEngine owns the model backend (Ollama by default, in-process llama.cpp,
+or a mock for load tests) and returns typed results: the detector's
+GuardianResponse and the validator's bool. Format schemas are computed once
+and the backend clients are kept for the life of the process.
 """
 
-import requests
-from ollama import chat
-from ollama import ChatResponse
-from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from pydantic import BaseModel, Field, ValidationError
+
+from pipeline_stats import pipeline_stats
 
 
 class GuardianResponse(BaseModel):
     sentiment: str
     alert_needed: bool
     explanation: str
+    # The model's own confidence in the verdict, used to decide whether the
+    # validator needs to run at all
+    confidence: float = Field(..., ge=0.0, le=1.0)
 
 
 class Guardian2Response(BaseModel):
     valid: bool
 
 
+class JsonObjectScanner:
+    """
+    Incrementally finds the first complete top-level JSON object in streamed text.
+
+    Text inside a <think>...</think> block is ignored, so braces in the model's
+    reasoning cannot be mistaken for the verdict, even when a chunk boundary
+    splits the tag.
+    """
+
+    THINK = "<think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str):
+        """Add text; return the JSON object string once one closes, else None."""
+        self.buffer += text
+        while self.pos < len(self.buffer):
+            if self.start is None:
+                think = self.buffer.find(self.THINK, self.pos)
+                brace = self.buffer.find("{", self.pos)
+                if think != -1 and (brace == -1 or think < brace):
+                    end = self.buffer.find("</think>", think)
+                    if end == -1:
+                        # Reasoning still streaming; keep the "<think>" for next time
+                        self.pos = think
+                        return None
+                    self.pos = end + len("</think>")
+                    continue
+                if brace == -1:
+                    # Keep a tail that may be the start of a "<think>" split
+                    # across chunks, so it is found once the rest arrives
+                    self.pos = max(self.pos, len(self.buffer) - len(self.THINK) + 1)
+                    return None
+                self.start, self.pos, self.depth = brace, brace + 1, 1
+                continue
+
+            char = self.buffer[self.pos]
+            self.pos += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return self.buffer[self.start : self.pos]
+        return None
+
+    def reset_after_object(self):
+        """Discard a closed object that failed validation and keep scanning."""
+        self.start = None
+
+
+def _first_valid(scanner: JsonObjectScanner, text: str, response_model):
+    """Feed streamed text; return the first closed object that validates, else None."""
+    candidate = scanner.feed(text)
+    while candidate is not None:
+        try:
+            return response_model.model_validate(json.loads(candidate))
+        except (json.JSONDecodeError, ValidationError):
+            scanner.reset_after_object()
+            candidate = scanner.feed("")
+    return None
+
+
+def stream_settings():
+    return {
+        "enabled": os.getenv("GUARDIAN_STREAMING", "1") == "1",
+        # Hard cap on generated tokens (reasoning included), so a runaway
+        # <think> block cannot hold a worker; 0 removes the cap
+        "num_predict": int(os.getenv("GUARDIAN_NUM_PREDICT", "2048")) or None,
+    }
+
+
+# Format schemas never change, so they are built once instead of per call
+SCHEMAS = {
+    GuardianResponse: GuardianResponse.model_json_schema(),
+    Guardian2Response: Guardian2Response.model_json_schema(),
+}
+
+
+# Fixed instructions sent as the system message. Everything that varies per
+# request (signals, messages, retry notes) goes in the user message after them,
+# so every call starts with the same tokens and the backend can reuse the KV
+# cache for this prefix. Bump PROMPT_VERSION in sentiment_analyzer.py on changes.
+INSTRUCTIONS = {
+    GuardianResponse: """You are a scam detecting assistant. You are given signals about a text conversation (whether it happened in business hours, the average valid phone or email score of the sender from the preset fields pipeline, link checks and other pre-checks) followed by the messages. Determine to what extent this text conversation is a safe message and provide the entire thought process behind this conclusion.
+Please analyze the user's messages in a concise manner, following the format below.
+Classify each conversation as "SCAM", "SUSPICIOUS", or "SAFE" based on its content.
+Return valid JSON with keys: "sentiment" (SCAM, SUSPICIOUS, or SAFE), "alert_needed" (true/false), "explanation", and "confidence" (0.0 to 1.0, how certain you are of the sentiment).
+Note that for sentiment key, the only three options are "SCAM", "SUSPICIOUS", or "SAFE". Analyze these chat messages briefly and respond *only* with JSON.""",
+    Guardian2Response: """You are a scam detecting result validator. You are given the conclusion of a scam detector, followed by signals about the message (timestamp, the average valid phone or email score from the preset fields pipeline, link checks).
+Please analyze the previous detector's reasonings and determine its validity.
+Classify the reasoning for the conversation as "VALID" or "INVALID".
+Return valid JSON with keys: "valid" (True or False).
+Note that for valid key, the only options are True or False.""",
+}
+
+
+def _messages(prompt: str, response_model):
+    return [
+        {"role": "system", "content": INSTRUCTIONS[response_model]},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def keep_alive() -> str:
+    """How long Ollama keeps the model (and its prompt cache) loaded after a call."""
+    return os.getenv("GUARDIAN_KEEP_ALIVE", "30m")
+
+
+def _record_timings(started: float, first_token: Optional[float], final=None):
+    """Time to first token always; Ollama's own prompt-eval time when reported."""
+    if first_token is not None:
+        pipeline_stats.observe("time_to_first_token", first_token - started)
+    duration = getattr(final, "prompt_eval_duration", None)
+    if duration:
+        pipeline_stats.observe("prompt_eval", duration / 1e9)
+
+
+class GuardianBackend:
+    """Runs a JSON-constrained chat completion and returns the validated model."""
+
+    name = "base"
+
+    async def chat_json(self, model: str, prompt: str, response_model, options: dict = None):
+        raise NotImplementedError
+
+    def chat_json_sync(self, model: str, prompt: str, response_model, options: dict = None):
+        raise NotImplementedError
+
+    async def embed(self, model: str, texts):
+        raise NotImplementedError
+
+
+class OllamaBackend(GuardianBackend):
+    name = "ollama"
+
+    def __init__(self, host: Optional[str] = None):
+        from ollama import AsyncClient, Client
+
+        self.host = host
+        # Both keep their HTTP connection pool open between calls
+        self.client = Client(host=host)
+        # Only awaited on the shared event loop (event_loop.py)
+        self.async_client = AsyncClient(host=host)
+
+    @staticmethod
+    def _options(options):
+        options = dict(options or {})
+        num_predict = stream_settings()["num_predict"]
+        if num_predict:
+            options.setdefault("num_predict", num_predict)
+        return options or None
+
+    async def chat_json(self, model: str, prompt: str, response_model, options: dict = None):
+        """
+        In streaming mode the generation is cancelled as soon as a complete,
+        schema-valid object has arrived, instead of waiting for the model to stop.
+        """
+        request = dict(
+            model=model,
+            messages=_messages(prompt, response_model),
+            format=SCHEMAS[response_model],
+            options=self._options(options),
+            keep_alive=keep_alive(),
+        )
+        started = time.perf_counter()
+        if not stream_settings()["enabled"]:
+            response = await self.async_client.chat(**request, stream=False)
+            _record_timings(started, None, response)
+            return response_model.model_validate_json(response.message.content)
+
+        stream = await self.async_client.chat(**request, stream=True)
+        scanner = JsonObjectScanner()
+        first_token = None
+        try:
+            async for part in stream:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    _record_timings(started, first_token)
+                if part.done:
+                    _record_timings(started, None, part)
+                result = _first_valid(scanner, part.message.content or "", response_model)
+                if result is not None:
+                    if not part.done:
+                        pipeline_stats.incr("guardian_stream_early_stops")
+                    return result
+        finally:
+            # Closing the stream drops the HTTP response, which stops generation
+            await stream.aclose()
+        # The stream ended (e.g. num_predict reached) without a complete object
+        return response_model.model_validate_json(scanner.buffer)
+
+    def chat_json_sync(self, model: str, prompt: str, response_model, options: dict = None):
+        started = time.perf_counter()
+        response = self.client.chat(
+            model=model,
+            messages=_messages(prompt, response_model),
+            format=SCHEMAS[response_model],
+            options=self._options(options),
+            keep_alive=keep_alive(),
+            stream=False,
+        )
+        _record_timings(started, None, response)
+        return response_model.model_validate_json(response.message.content)
+
+    async def embed(self, model: str, texts):
+        response = await self.async_client.embed(model=model, input=list(texts))
+        return response.embeddings
+
+
+def llama_settings():
+    """
+    llama.cpp tuning. By default every core the process may run on is used, split
+    between the workers when each one is a separate process with its own model.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cores = os.cpu_count() or 1
+    if os.getenv("ANALYSIS_POOL_KIND", "thread") == "process":
+        cores = max(1, cores // int(os.getenv("ANALYSIS_WORKERS", "4")))
+    return {
+        "n_threads": int(os.getenv("LLAMA_N_THREADS", "0")) or cores,
+        "n_batch": int(os.getenv("LLAMA_N_BATCH", "512")),
+        "n_ctx": int(os.getenv("LLAMA_N_CTX", "4096")),
+        "n_gpu_layers": int(os.getenv("LLAMA_N_GPU_LAYERS", "0")),
+        # KV states kept for reuse by prompts that share a prefix
+        "prefix_cache_bytes": int(os.getenv("LLAMA_PREFIX_CACHE_BYTES", str(1 << 30))),
+        # e.g. "0-7" or "0,2,4,6": pin inference to these CPUs (Linux only)
+        "cpu_affinity": os.getenv("LLAMA_CPU_AFFINITY", ""),
+    }
+
+
+def _parse_cpus(spec: str):
+    cpus = set()
+    for part in spec.split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            cpus.update(range(int(low), int(high) + 1))
+        elif part.strip():
+            cpus.add(int(part))
+    return cpus
+
+
+class LlamaCppBackend(GuardianBackend):
+    """
+    Runs a GGUF model in-process with llama-cpp-python (LLAMA_MODEL_PATH), with
+    no HTTP hop to Ollama. The model argument of each call is ignored: one
+    process serves one model.
+
+    The weights are mmapped, so forked pool workers share the same page cache
+    pages instead of each reading the file into private memory. A llama context
+    is not thread-safe, so generations in one process are serialized.
+    """
+
+    name = "llama_cpp"
+
+    def __init__(self, model_path: Optional[str] = None):
+        # Imported here: llama_cpp is slow to import and only needed by this backend
+        from llama_cpp import Llama, LlamaRAMCache
+
+        self.model_path = model_path or os.getenv("LLAMA_MODEL_PATH")
+        if not self.model_path:
+            raise ValueError("LLAMA_MODEL_PATH environment variable is not set")
+        settings = llama_settings()
+        if settings["cpu_affinity"] and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, _parse_cpus(settings["cpu_affinity"]))
+        self._llama_class = Llama
+        self.llm = Llama(
+            model_path=self.model_path,
+            use_mmap=True,
+            n_threads=settings["n_threads"],
+            n_threads_batch=settings["n_threads"],
+            n_batch=settings["n_batch"],
+            n_ctx=settings["n_ctx"],
+            n_gpu_layers=settings["n_gpu_layers"],
+            verbose=False,
+        )
+        if settings["prefix_cache_bytes"]:
+            # Restores the KV state of the longest cached prompt prefix, so the
+            # shared instructions are only evaluated once
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=settings["prefix_cache_bytes"]))
+        self._embedder = None
+        self._lock = threading.Lock()
+
+    def _generate(self, prompt, response_model, options, cancelled: threading.Event):
+        options = options or {}
+        with self._lock:
+            started = time.perf_counter()
+            chunks = self.llm.create_chat_completion(
+                messages=_messages(prompt, response_model),
+                response_format={"type": "json_object", "schema": SCHEMAS[response_model]},
+                temperature=options.get("temperature", 0.0),
+                seed=options.get("seed"),
+                max_tokens=options.get("num_predict") or stream_settings()["num_predict"],
+                stream=True,
+            )
+            scanner = JsonObjectScanner()
+            try:
+                for index, chunk in enumerate(chunks):
+                    if index == 0:
+                        # Dominated by prompt evaluation; near zero on a prefix cache hit
+                        _record_timings(started, time.perf_counter())
+                    if cancelled.is_set():
+                        # The caller timed out; free the context for the next request
+                        return None
+                    result = _first_valid(
+                        scanner, chunk["choices"][0]["delta"].get("content") or "", response_model
+                    )
+                    if result is not None:
+                        return result
+            finally:
+                chunks.close()
+        return response_model.model_validate_json(scanner.buffer)
+
+    def chat_json_sync(self, model: str, prompt: str, response_model, options: dict = None):
+        return self._generate(prompt, response_model, options, threading.Event())
+
+    async def chat_json(self, model: str, prompt: str, response_model, options: dict = None):
+        # Generation blocks, so it runs off the event loop; a cancelled task
+        # stops it at the next token
+        cancelled = threading.Event()
+        try:
+            return await asyncio.to_thread(self._generate, prompt, response_model, options, cancelled)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def _embed_sync(self, texts):
+        with self._lock:
+            if self._embedder is None:
+                # Embedding needs its own context; the weights are shared via mmap
+                self._embedder = self._llama_class(
+                    model_path=os.getenv("LLAMA_EMBED_MODEL_PATH", self.model_path),
+                    embedding=True,
+                    use_mmap=True,
+                    n_threads=llama_settings()["n_threads"],
+                    verbose=False,
+                )
+            return [self._embedder.embed(text) for text in texts]
+
+    async def embed(self, model: str, texts):
+        return await asyncio.to_thread(self._embed_sync, list(texts))
+
+
+class MockBackend(GuardianBackend):
+    """
+    Canned answers without any model, for load tests and pipeline development.
+    detect may be a verdict dict or a callable taking the prompt.
+    """
+
+    name = "mock"
+
+    DEFAULT_VERDICT = {
+        "sentiment": "SUSPICIOUS",
+        "alert_needed": True,
+        "explanation": "Mock backend verdict",
+        "confidence": 0.5,
+    }
+
+    def __init__(
+        self,
+        detect: Union[dict, Callable[[str], dict], None] = None,
+        valid: bool = True,
+        dimensions: int = 16,
+    ):
+        self.detect = detect or self.DEFAULT_VERDICT
+        self.valid = valid
+        self.dimensions = dimensions
+
+    def chat_json_sync(self, model: str, prompt: str, response_model, options: dict = None):
+        if response_model is Guardian2Response:
+            return Guardian2Response(valid=self.valid)
+        verdict = self.detect(prompt) if callable(self.detect) else self.detect
+        return GuardianResponse.model_validate(verdict)
+
+    async def chat_json(self, model: str, prompt: str, response_model, options: dict = None):
+        return self.chat_json_sync(model, prompt, response_model, options)
+
+    async def embed(self, model: str, texts):
+        # Deterministic pseudo-embeddings: equal texts get equal vectors
+        vectors = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            vectors.append([digest[i % len(digest)] / 255.0 - 0.5 for i in range(self.dimensions)])
+        return vectors
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "llama_cpp": LlamaCppBackend,
+    "mock": MockBackend,
+}
+
+
+class GuardianEngine:
+    def __init__(self, backend: GuardianBackend):
+        self.backend = backend
+
+    async def detect(self, model: str, prompt: str, options: dict = None) -> GuardianResponse:
+        """
+        First guardian verdict. Cancelling the task stops generation. options
+        are passed to the backend (e.g. temperature/seed for vote candidates).
+        """
+        return await self.backend.chat_json(model, prompt, GuardianResponse, options)
+
+    async def validate(self, model: str, prompt: str) -> bool:
+        """Second guardian: whether the detector's reasoning holds up."""
+        output = await self.backend.chat_json(model, prompt, Guardian2Response)
+        return output.valid
+
+    def detect_sync(self, model: str, prompt: str, options: dict = None) -> GuardianResponse:
+        return self.backend.chat_json_sync(model, prompt, GuardianResponse, options)
+
+    def validate_sync(self, model: str, prompt: str) -> bool:
+        return self.backend.chat_json_sync(model, prompt, Guardian2Response).valid
+
+    async def embed(self, model: str, texts):
+        return await self.backend.embed(model, texts)
+
+
+_engine = None
+_engine_key = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> GuardianEngine:
+    """
+    Process-wide engine for GUARDIAN_BACKEND (ollama, llama_cpp or mock). With
+    OLLAMA_HOSTS set, ollama calls are spread over that pool of hosts. Rebuilt
+    in forked workers, whose inherited HTTP connections cannot be reused.
+    Built once even when several threads ask for it at the same time (a
+    llama_cpp engine loads the whole model).
+    """
+    global _engine, _engine_key
+    key = (os.getenv("GUARDIAN_BACKEND", "ollama"), os.getpid())
+    if _engine is not None and _engine_key == key:
+        return _engine
+    with _engine_lock:
+        if _engine is None or _engine_key != key:
+            if key[0] not in BACKENDS:
+                raise ValueError(f"Unknown GUARDIAN_BACKEND {key[0]!r}, expected one of {sorted(BACKENDS)}")
+            if key[0] == "ollama" and os.getenv("OLLAMA_HOSTS"):
+                # Several inference hosts: least-loaded routing with health checks
+                import ollama_pool
+
+                _engine = GuardianEngine(ollama_pool.from_env())
+            else:
+                _engine = GuardianEngine(BACKENDS[key[0]]())
+            _engine_key = key
+        return _engine
+
+
+def set_engine(engine: GuardianEngine):
+    """Use a specific engine (e.g. a MockBackend one) for this process."""
+    global _engine, _engine_key
+    with _engine_lock:
+        _engine = engine
+        _engine_key = (os.getenv("GUARDIAN_BACKEND", "ollama"), os.getpid())
+
+
+def first_guardian(model: str, prompt: str = None) -> GuardianResponse:
+    return get_engine().detect_sync(model, prompt)
+
+
 def second_guardian(
     model: str, prompt: str = None, first_output: str = None, status: str = None
-):
-    full_prompt = prompt
-    response: ChatResponse = chat(
-        model=model,
-        messages=[{"role": "user", "content": full_prompt, "temperature": 0.0}],
-        format=Guardian2Response.model_json_schema(),
-        stream=False,
-    )
-    output = Guardian2Response.model_validate_json(response.message.content)
-    output = output.model_dump()
-    return output["valid"]
-
-
-def first_guardian(
-    model: str,
-    prompt: str = None,
-):
-    full_prompt = prompt
-    response: ChatResponse = chat(
-        model=model,
-        messages=[{"role": "user", "content": full_prompt, "temperature": 0.0}],
-        format=GuardianResponse.model_json_schema(),
-        stream=False,
-    )
-    output = GuardianResponse.model_validate_json(response.message.content)
-    output = output.model_dump_json()
-    return output
+) -> bool:
+    return get_engine().validate_sync(model, prompt)
+
+
+async def first_guardian_async(model: str, prompt: str = None, options: dict = None) -> GuardianResponse:
+    return await get_engine().detect(model, prompt, options)
+
+
+async def second_guardian_async(
+    model: str, prompt: str = None, first_output: str = None, status: str = None
+) -> bool:
+    return await get_engine().validate(model, prompt)
+
+
+async def embed_async(model: str, texts):
+    """Embedding vectors for texts, e.g. from a local Ollama embedding model."""
+    return await get_engine().embed(model, texts)
 
 
 # model = "deepseek-r1:1.5b"
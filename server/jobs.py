@@ -0,0 +1,268 @@
+"""
+Asynchronous analysis jobs.
+
+POST /jobs stores the request in a SQLite job table and returns its id at once;
+a small set of dispatcher tasks feed queued jobs to the analysis pool. Results
+are fetched with GET /jobs/{id} (optionally long-polling with ?wait=) or pushed
+to a callback URL on one of the JOB_CALLBACK_HOSTS. Jobs that were queued or running when the server stopped are
+picked up again on the next start.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from models import Chat
+from worker_pool import PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_settings():
+    return {
+        "path": os.getenv(
+            "JOB_DB_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3"),
+        ),
+        "workers": int(os.getenv("JOB_WORKERS", "4")),
+        # Finished jobs older than this are deleted at startup
+        "retention": float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600,
+        # Hosts results may be POSTed to; empty (the default) disables callbacks
+        "callback_hosts": {
+            host.strip().lower() for host in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+        },
+    }
+
+
+def callback_allowed(url: str) -> bool:
+    """
+    Whether a callback URL may be called: http(s) to an allowlisted host only,
+    so a job cannot make the server POST to arbitrary internal addresses.
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and (parts.hostname or "") in job_settings()["callback_hosts"]
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                callback_url TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def create(self, request: dict, callback_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, callback_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(request), callback_url, now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, None if result is None else json.dumps(result), error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, request, callback_url, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "request": json.loads(row[2]),
+            "callback_url": row[3],
+            "result": None if row[4] is None else json.loads(row[4]),
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def unfinished(self) -> List[str]:
+        """Jobs to resume after a restart, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, older_than: float):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than),
+            )
+            self._conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs stored jobs through run_batch (a list of chat windows -> list of
+    results) with a fixed number of dispatcher tasks on the server's loop.
+    """
+
+    def __init__(self, store: JobStore, run_batch: Callable[[List], Awaitable[List]], workers: int = 4):
+        self.store = store
+        self.run_batch = run_batch
+        self.workers = workers
+        self._queue: asyncio.Queue = None
+        self._tasks = []
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._http: httpx.AsyncClient = None
+
+    async def start(self, retention: float = None):
+        self._queue = asyncio.Queue()
+        self._http = httpx.AsyncClient(timeout=10.0)
+        if retention:
+            self.store.purge(retention)
+        resumed = self.store.unfinished()
+        for job_id in resumed:
+            self._queue.put_nowait(job_id)
+        if resumed:
+            logger.info(f"Resuming {len(resumed)} unfinished analysis jobs")
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # Running jobs stay "running" in the table and are resumed on restart
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    def submit(self, request: dict, callback_url: Optional[str] = None) -> str:
+        job_id = self.store.create(request, callback_url)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """The job once finished, or as it is when timeout runs out."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in (DONE, FAILED) or timeout <= 0:
+            return job
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(job_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+        return self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # e.g. an unreadable stored request: fail this job, keep the worker
+                logger.error(f"Analysis job {job_id} failed: {e!r}")
+                try:
+                    self._finish(job_id, FAILED, error=str(e))
+                except Exception as e:
+                    logger.error(f"Could not mark job {job_id} failed: {e!r}")
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] in (DONE, FAILED):
+            return
+        self.store.update(job_id, RUNNING)
+        chats = [Chat(**chat) for chat in job["request"]["chats"]]
+        while True:
+            try:
+                result = (await self.run_batch([chats]))[0]
+            except PoolSaturatedError as e:
+                # Direct requests have filled the pool; the job just waits
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                logger.error(f"Analysis job {job_id} failed: {e!r}")
+                self._finish(job_id, FAILED, error=str(e))
+            else:
+                self._finish(job_id, DONE, result=result.model_dump())
+            break
+        if job["callback_url"]:
+            await self._callback(job_id, job["callback_url"])
+
+    def _finish(self, job_id: str, status, result=None, error=None):
+        self.store.update(job_id, status, result=result, error=error)
+        for future in self._waiters.pop(job_id, []):
+            if not future.done():
+                future.set_result(None)
+
+    async def _callback(self, job_id: str, url: str):
+        # Checked again here: a job stored before the allowlist changed is not called back
+        if not callback_allowed(url):
+            logger.warning(f"Callback for job {job_id} to {url} skipped: host not in JOB_CALLBACK_HOSTS")
+            return
+        job = self.store.get(job_id)
+        try:
+            await self._http.post(url, json=public_view(job))
+        except Exception as e:
+            # Best effort: the job is already finished, a failed callback does not change that
+            logger.error(f"Callback for job {job_id} to {url} failed: {e!r}")
+
+    def stats(self) -> Dict[str, int]:
+        counts = self.store.counts()
+        counts["waiting_in_memory"] = self._queue.qsize() if self._queue else 0
+        return counts
+
+
+def public_view(job: dict) -> dict:
+    return {key: job[key] for key in ("id", "status", "result", "error", "created_at", "updated_at")}
@@ -0,0 +1,246 @@
+"""
+Nearest-neighbour scam classifier over a local vector index.
+
+Each message window is embedded with a local Ollama embedding model and compared
+with labeled SCAM/SUSPICIOUS/SAFE examples. Small indexes are searched by brute
+force; large ones are built as an IVF index (k-means partitions stored
+contiguously, only the closest partitions are scanned). Vectors are loaded with
+np.load(mmap_mode="r"), so pool workers share the OS page cache instead of
+each holding a copy.
+
+Files for an index at PATH: PATH.npy (float32 unit vectors), PATH.json (labels,
+texts, embedding model, IVF offsets) and PATH.centroids.npy for IVF indexes.
+
+Usage:
+    python knn.py build labeled.jsonl examples_index
+    python knn.py query examples_index "Your parcel is on hold, reply Y"
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How much each neighbour's label counts towards the kNN scam score
+LABEL_SCORES = {"SCAM": 1.0, "SUSPICIOUS": 0.5, "SAFE": 0.0}
+
+# Indexes with at least this many examples are partitioned (IVF)
+IVF_MIN_SIZE = 20000
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(vectors, n_clusters: int, iterations: int = 15, seed: int = 0):
+    """Spherical k-means; returns unit centroids and each vector's cluster."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = vectors[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+@dataclass
+class KnnResult:
+    # Similarity-weighted share of scam-labeled neighbours (0.0 - 1.0)
+    score: float
+    neighbours: List[dict] = field(default_factory=list)
+
+    def few_shot(self, limit: int = 3) -> str:
+        """Closest labeled examples, for the detector prompt."""
+        if not self.neighbours:
+            return ""
+        examples = "; ".join(
+            f'{n["label"]} (similarity {n["similarity"]:.2f}): "{n["text"][:160]}"'
+            for n in self.neighbours[:limit]
+        )
+        return f", and the most similar labeled examples: {examples}"
+
+
+class VectorIndex:
+    def __init__(self, vectors, labels, texts, model, centroids=None, offsets=None):
+        self.vectors = vectors
+        self.labels = labels
+        self.texts = texts
+        self.model = model
+        self.centroids = centroids
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, vectors, labels, texts, model, ivf: Optional[bool] = None):
+        vectors = _normalize(vectors)
+        if ivf is None:
+            ivf = len(vectors) >= IVF_MIN_SIZE
+        if not ivf:
+            return cls(vectors, list(labels), list(texts), model)
+        n_clusters = max(1, int(np.sqrt(len(vectors))))
+        centroids, assignment = kmeans(vectors, n_clusters)
+        # Store each partition contiguously so a probe is one slice of the mmap
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_clusters)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+        return cls(
+            vectors[order],
+            [labels[i] for i in order],
+            [texts[i] for i in order],
+            model,
+            centroids,
+            offsets,
+        )
+
+    def save(self, path: str):
+        np.save(f"{path}.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        if self.centroids is not None:
+            np.save(f"{path}.centroids.npy", self.centroids.astype(np.float32))
+        with open(f"{path}.json", "w") as f:
+            json.dump(
+                {"model": self.model, "labels": self.labels, "texts": self.texts, "offsets": self.offsets},
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str):
+        with open(f"{path}.json", "r") as f:
+            meta = json.load(f)
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        centroids = None
+        if meta.get("offsets") is not None:
+            centroids = np.load(f"{path}.centroids.npy")
+        return cls(vectors, meta["labels"], meta["texts"], meta["model"], centroids, meta.get("offsets"))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def search(self, query, k: int = 8, nprobe: int = 4) -> KnnResult:
+        query = _normalize(query)
+        if self.centroids is None:
+            ids = np.arange(len(self.labels))
+            similarities = self.vectors @ query
+        else:
+            probes = np.argsort(self.centroids @ query)[::-1][:nprobe]
+            ids = np.concatenate(
+                [np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes]
+            )
+            similarities = np.concatenate(
+                [self.vectors[self.offsets[c] : self.offsets[c + 1]] @ query for c in probes]
+            )
+        if not len(ids):
+            return KnnResult(score=0.5)
+        k = min(k, len(ids))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+
+        neighbours = [
+            {
+                "label": self.labels[ids[i]],
+                "similarity": float(similarities[i]),
+                "text": self.texts[ids[i]],
+            }
+            for i in top
+        ]
+        weights = np.maximum([n["similarity"] for n in neighbours], 0.0)
+        if weights.sum() == 0:
+            return KnnResult(score=0.5, neighbours=neighbours)
+        scores = [LABEL_SCORES.get(n["label"], 0.5) for n in neighbours]
+        return KnnResult(score=float(np.dot(weights, scores) / weights.sum()), neighbours=neighbours)
+
+
+def knn_settings():
+    return {
+        "path": os.getenv("KNN_INDEX_PATH"),
+        "k": int(os.getenv("KNN_K", "8")),
+        "nprobe": int(os.getenv("KNN_NPROBE", "4")),
+        # Decide directly when the neighbours agree this strongly...
+        "scam_score": float(os.getenv("KNN_SCAM_SCORE", "0.9")),
+        "safe_score": float(os.getenv("KNN_SAFE_SCORE", "0.1")),
+        # ...and the nearest example is at least this close
+        "min_similarity": float(os.getenv("KNN_MIN_SIMILARITY", "0.85")),
+    }
+
+
+_index = None
+
+
+def get_index() -> Optional[VectorIndex]:
+    """The index at KNN_INDEX_PATH, or None when the retrieval stage is off."""
+    global _index
+    path = knn_settings()["path"]
+    if not path:
+        return None
+    # Read-only mmap, safe to share with forked workers
+    if _index is None or _index[0] != path:
+        _index = (path, VectorIndex.load(path))
+        logger.info(f"Loaded kNN index {path} with {len(_index[1])} examples")
+    return _index[1]
+
+
+def knn_verdict(result: KnnResult) -> Optional[dict]:
+    """A direct verdict when the neighbours are close and agree, else None."""
+    settings = knn_settings()
+    if not result.neighbours or result.neighbours[0]["similarity"] < settings["min_similarity"]:
+        return None
+    closest = result.neighbours[0]
+    if result.score >= settings["scam_score"]:
+        sentiment = "SCAM"
+    elif result.score <= settings["safe_score"]:
+        sentiment = "SAFE"
+    else:
+        return None
+    return {
+        "sentiment": sentiment,
+        "alert_needed": sentiment == "SCAM",
+        "explanation": (
+            f"Closely matches labeled {closest['label']} examples (kNN score {result.score:.2f}, "
+            f"nearest similarity {closest['similarity']:.2f}): \"{closest['text'][:160]}\""
+        ),
+        "confidence": round(abs(result.score - 0.5) * 2, 2),
+    }
+
+
+def _embed_sync(model, texts, batch_size=64):
+    from ollama import Client
+
+    client = Client()
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(client.embed(model=model, input=texts[start : start + batch_size]).embeddings)
+    return vectors
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    model = os.getenv("KNN_EMBED_MODEL", "nomic-embed-text")
+    if command == "build" and len(sys.argv) == 4:
+        with open(sys.argv[2], "r") as f:
+            examples = [json.loads(line) for line in f if line.strip()]
+        texts = ["\n".join(example["messages"]) for example in examples]
+        index = VectorIndex.build(
+            _embed_sync(model, texts), [example["label"] for example in examples], texts, model
+        )
+        index.save(sys.argv[3])
+        kind = "IVF" if index.centroids is not None else "flat"
+        print(f"Built {kind} index of {len(index)} examples at {sys.argv[3]}")
+    elif command == "query" and len(sys.argv) == 4:
+        index = VectorIndex.load(sys.argv[2])
+        started = time.perf_counter()
+        result = index.search(_embed_sync(index.model, [sys.argv[3]])[0])
+        print(f"kNN score {result.score:.2f} ({(time.perf_counter() - started) * 1000:.1f}ms)")
+        for neighbour in result.neighbours:
+            print(f"  {neighbour['similarity']:.3f} {neighbour['label']:<10} {neighbour['text'][:80]}")
+    else:
+        print(__doc__)
@@ -0,0 +1,212 @@
+"""
+Live WebSocket sessions (/live).
+
+One session per conversation: the client pushes chat messages as they are sent
+and the server pushes stage progress, verdicts and alerts back as soon as they
+are ready. Data frames in both directions carry a per-direction sequence
+number and are acknowledged cumulatively; unacknowledged frames are kept and
+resent when the client reconnects with its session id.
+
+Client -> server:
+    {"type": "hello", "username": ..., "session": null | id, "ack": n, "window": w}
+    {"type": "message", "seq": n, "sender": ..., "message": ...}
+    {"type": "ack", "seq": n}
+    {"type": "bye"}
+Server -> client:
+    {"type": "welcome", "session": id, "ack": n}
+    {"type": "progress" | "verdict" | "alert", "seq": n, ...}
+    {"type": "ack", "seq": n}
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from models import Chat
+from worker_pool import PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+def live_settings():
+    return {
+        # Seconds a disconnected session (and its unacked frames) is kept for a resume
+        "ttl": float(os.getenv("LIVE_SESSION_TTL", "300")),
+        # Unacknowledged server frames kept per session, oldest dropped first
+        "outbox": int(os.getenv("LIVE_OUTBOX_MAX", "256")),
+        # Messages of the conversation kept for analysis windows
+        "history": int(os.getenv("LIVE_MAX_MESSAGES", "200")),
+    }
+
+
+class LiveSession:
+    def __init__(self, username: str, window: int, outbox_max: int, history_max: int):
+        self.id = uuid.uuid4().hex
+        self.username = username
+        self.window = max(1, window)
+        self.messages = deque(maxlen=history_max)
+        # Highest client seq received, and the last server seq sent
+        self.received = 0
+        self.sent = 0
+        self.outbox = deque(maxlen=outbox_max)
+        self.socket = None
+        self.disconnected_at = None
+        self.pending = False
+        self.task: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: dict):
+        socket = self.socket
+        if socket is None:
+            return
+        async with self._send_lock:
+            try:
+                await socket.send_json(frame)
+            except Exception as e:
+                # The receive loop notices the disconnect; the frame stays in the outbox
+                logger.debug(f"Live session {self.id} send failed: {e!r}")
+
+    async def push(self, kind: str, data: dict):
+        """Queue a data frame for the client and send it if connected."""
+        self.sent += 1
+        frame = dict(data, type=kind, seq=self.sent)
+        self.outbox.append(frame)
+        await self.send(frame)
+
+    def acked(self, seq: int):
+        while self.outbox and self.outbox[0]["seq"] <= seq:
+            self.outbox.popleft()
+
+    async def resend(self, ack: int):
+        self.acked(ack)
+        if self.outbox and self.outbox[0]["seq"] > ack + 1:
+            logger.warning(
+                f"Live session {self.id}: frames {ack + 1}-{self.outbox[0]['seq'] - 1} were dropped before the resume"
+            )
+        for frame in list(self.outbox):
+            await self.send(frame)
+
+
+class LiveSessions:
+    """
+    Session registry and analysis driver. analyze(chats, on_event) runs one
+    window through the pipeline, calling on_event(stage, data) from the
+    analysis thread as stages finish.
+    """
+
+    def __init__(self, analyze: Callable[[List[Chat], Callable], Awaitable], settings: dict = None):
+        self.analyze = analyze
+        self.settings = settings or live_settings()
+        self.sessions: Dict[str, LiveSession] = {}
+
+    def open(self, hello: dict) -> LiveSession:
+        """Resume the session named in hello, or start a new one."""
+        self.purge()
+        session = self.sessions.get(hello.get("session") or "")
+        if session is None:
+            session = LiveSession(
+                hello.get("username", ""),
+                int(hello.get("window", 1)),
+                self.settings["outbox"],
+                self.settings["history"],
+            )
+            self.sessions[session.id] = session
+        return session
+
+    def close(self, session: LiveSession):
+        if session.task is not None:
+            session.task.cancel()
+        self.sessions.pop(session.id, None)
+
+    def purge(self):
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            if session.disconnected_at is not None and now - session.disconnected_at > self.settings["ttl"]:
+                logger.info(f"Live session {session.id} expired")
+                self.close(session)
+
+    async def serve(self, websocket):
+        """Run one connection of a session until the client goes away."""
+        await websocket.accept()
+        hello = await websocket.receive_json()
+        if hello.get("type") != "hello":
+            await websocket.close(code=1002)
+            return
+        session = self.open(hello)
+        session.socket = websocket
+        session.disconnected_at = None
+        await session.send({"type": "welcome", "session": session.id, "ack": session.received})
+        await session.resend(int(hello.get("ack", 0)))
+        try:
+            while True:
+                frame = await websocket.receive_json()
+                kind = frame.get("type")
+                if kind == "message":
+                    await self.receive_message(session, frame)
+                elif kind == "ack":
+                    session.acked(int(frame["seq"]))
+                elif kind == "bye":
+                    self.close(session)
+                    await websocket.close()
+                    return
+        except Exception as e:
+            # WebSocketDisconnect or a broken frame: keep the session for a resume
+            logger.info(f"Live session {session.id} disconnected: {e!r}")
+        finally:
+            if session.socket is websocket:
+                session.socket = None
+                session.disconnected_at = time.monotonic()
+
+    async def receive_message(self, session: LiveSession, frame: dict):
+        seq = int(frame["seq"])
+        # Resent after a reconnect but already received: only the ack was lost
+        if seq > session.received:
+            session.received = seq
+            session.messages.append(Chat(sender=frame["sender"], message=frame["message"]))
+            session.pending = True
+            if session.task is None or session.task.done():
+                session.task = asyncio.ensure_future(self._analysis_loop(session))
+        await session.send({"type": "ack", "seq": session.received})
+
+    async def _analysis_loop(self, session: LiveSession):
+        """Analyze the latest window until no new message arrived meanwhile."""
+        loop = asyncio.get_running_loop()
+        while session.pending:
+            session.pending = False
+            through = session.received
+            chats = list(session.messages)[-session.window:]
+            progress = []
+
+            def on_event(stage, data, through=through, progress=progress):
+                # Called from the analysis thread
+                progress.append(asyncio.run_coroutine_threadsafe(
+                    session.push("progress", {"stage": stage, "through": through, "data": data}), loop
+                ))
+
+            try:
+                result = await self.analyze(chats, on_event)
+            except PoolSaturatedError as e:
+                session.pending = True
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                logger.error(f"Live analysis failed for session {session.id}: {e!r}")
+                continue
+            finally:
+                # Progress pushes are scheduled from the analysis thread; let every
+                # one of them take its seq before the verdict takes the next
+                await asyncio.gather(*map(asyncio.wrap_future, progress), return_exceptions=True)
+            verdict = dict(result.model_dump(), through=through)
+            await session.push("verdict", verdict)
+            if result.alert_needed:
+                await session.push("alert", verdict)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "connected": sum(1 for session in self.sessions.values() if session.socket is not None),
+        }
@@ -1,15 +1,279 @@
-from fastapi import FastAPI
-from sentiment_analyzer import analyze_sentiment
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+from sentiment_analyzer import analyze_sentiment, group_windows, prewarm_batch, rounds_for_load, verdict_version
 from models import *
+from worker_pool import AnalysisPool, PoolSaturatedError
+from batching import MicroBatcher, batch_settings
+from enrichment import get_cache
+from pipeline_stats import pipeline_stats
+from cascade import cascade_report
+from verdict_cache import get_verdict_cache
+from campaigns import get_campaign_index
+from guardian import get_engine
+from jobs import JobQueue, JobStore, callback_allowed, job_settings, public_view
+from live import LiveSessions
+
+logger = logging.getLogger(__name__)
+
+# analyze_sentiment is fully blocking (Ollama + reputation APIs), so it runs on
+# a bounded pool instead of the event loop. Created in lifespan, after .env.
+analysis_pool: AnalysisPool = None
+micro_batcher: MicroBatcher = None
+job_queue: JobQueue = None
+live_sessions: LiveSessions = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global analysis_pool, micro_batcher, job_queue, live_sessions
+    # Secrets and tuning knobs are read once per process, before any worker or
+    # API checker is created (forked pool workers inherit the environment).
+    load_dotenv()
+    # The guardian engine (a llama_cpp one loads the whole model) is built before
+    # serving, on a thread of its own rather than the event loop or the shared
+    # lookup loop; process pool workers build theirs as they start.
+    await asyncio.to_thread(get_engine)
+    analysis_pool = AnalysisPool.from_env(initializer=get_engine)
+    settings = batch_settings()
+    if settings["window"] > 0:
+        micro_batcher = MicroBatcher(submit_prewarmed, settings["window"], settings["max_size"])
+    jobs = job_settings()
+    job_queue = JobQueue(JobStore(jobs["path"]), run_batch, jobs["workers"])
+    await job_queue.start(jobs["retention"])
+    live_sessions = LiveSessions(run_streamed)
+    logger.info(f"Server ready in {time.perf_counter() - _import_started:.2f}s")
+    yield
+    await job_queue.stop()
+    analysis_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def submit_windows(windows, all_or_nothing: bool = False):
+    """
+    Start one pool job per distinct chat window and return an awaitable per
+    window (same order; identical windows share a job). Every job counts against
+    the pool's admission limit: with all_or_nothing the whole list is rejected
+    with PoolSaturatedError unless it fits, otherwise only the windows that do
+    not fit fail, each on its own awaitable.
+    """
+    groups = group_windows(windows)
+    # Fewer detector/validator retries when the queue is backing up
+    max_rounds = rounds_for_load(analysis_pool.load())
+    argsets = [(windows[positions[0]], max_rounds) for positions in groups]
+    if all_or_nothing:
+        jobs = analysis_pool.submit_all(analyze_sentiment, argsets)
+    else:
+        jobs = [submit_or_fail(args) for args in argsets]
+    results = [None] * len(windows)
+    for positions, job in zip(groups, jobs):
+        for position in positions:
+            results[position] = job
+    return results
+
 
-app = FastAPI()
+def submit_or_fail(args):
+    try:
+        return analysis_pool.submit(analyze_sentiment, *args)
+    except PoolSaturatedError as e:
+        failed = asyncio.get_running_loop().create_future()
+        failed.set_exception(e)
+        return failed
+
+
+async def submit_prewarmed(windows, all_or_nothing: bool = False):
+    """
+    submit_windows after one shared reputation pass over every window, so
+    windows with the same link make one lookup between them.
+    """
+    # No shared lookup pass for a batch that is about to be turned away
+    if len(windows) > 1 and analysis_pool.has_room(len(windows)):
+        await prewarm_batch(windows)
+    return submit_windows(windows, all_or_nothing)
+
+
+async def run_batch(windows):
+    """Analyze chat windows, admitted as a whole, and return results in the same order."""
+    return list(await asyncio.gather(*await submit_prewarmed(windows, all_or_nothing=True)))
+
+
+def streamed_args(chats, on_event):
+    """analyze_sentiment arguments with a progress callback where the pool allows it."""
+    args = (chats, rounds_for_load(analysis_pool.load()))
+    # A process pool cannot call back into this process, so it only gets the result
+    if analysis_pool.kind == "thread":
+        args += (on_event,)
+    return args
+
+
+async def run_streamed(chats, on_event):
+    return await analysis_pool.run(analyze_sentiment, *streamed_args(chats, on_event))
+
+
+def queue_full(error: PoolSaturatedError):
+    return HTTPException(
+        status_code=503,
+        detail="Analysis queue is full, please retry later",
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
 
 @app.post("/analyze_chats", response_model=SentimentResponse)
 async def analyze_chats(request: ChatAnalysisRequest):
-    sentiment_response = analyze_sentiment(request.chats)
+    try:
+        if micro_batcher is not None:
+            # Packed with other requests arriving within the batching window
+            return await micro_batcher.submit(request.chats)
+        return (await run_batch([request.chats]))[0]
+    except PoolSaturatedError as e:
+        raise queue_full(e)
+
+
+def sse(stage: str, data) -> str:
+    return f"event: {stage}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/analyze_chats/stream")
+async def analyze_chats_stream(request: ChatAnalysisRequest):
+    """
+    Server-Sent Events: one event per pipeline stage as it finishes (rules,
+    enrichment with a provisional risk level, first_guardian, validator), then
+    "final" with the SentimentResponse.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(stage, data):
+        # Called from the pool thread running the pipeline
+        loop.call_soon_threadsafe(events.put_nowait, (stage, data))
+
+    analysis = asyncio.ensure_future(run_streamed(request.chats, on_event))
+    # Let the pool admit or reject the job so a full queue is still a plain 503
+    await asyncio.sleep(0)
+    if analysis.done() and isinstance(analysis.exception(), PoolSaturatedError):
+        raise queue_full(analysis.exception())
+
+    async def stream():
+        next_event = asyncio.ensure_future(events.get())
+        try:
+            while True:
+                await asyncio.wait({next_event, analysis}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event.done():
+                    yield sse(*next_event.result())
+                    next_event = asyncio.ensure_future(events.get())
+                    continue
+                # Stage events queued just before the pipeline returned
+                while not events.empty():
+                    yield sse(*events.get_nowait())
+                try:
+                    yield sse("final", analysis.result().model_dump())
+                except Exception as e:
+                    logger.error(f"Streamed analysis failed: {e!r}")
+                    yield sse("error", {"detail": str(e)})
+                return
+        finally:
+            next_event.cancel()
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.websocket("/live")
+async def live(websocket: WebSocket):
+    """Per-conversation session: messages in, progress, verdicts and alerts out (see live.py)."""
+    await live_sessions.serve(websocket)
+
+
+@app.post("/analyze_chats/batch", response_model=BatchAnalysisResponse)
+async def analyze_chats_batch(request: BatchAnalysisRequest):
+    # Every conversation takes an admission slot, so a batch larger than the
+    # pool could never be admitted
+    max_items = min(batch_settings()["max_items"], analysis_pool.capacity)
+    if len(request.requests) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} conversations per batch")
+    if not request.requests:
+        return BatchAnalysisResponse(results=[])
+    try:
+        results = await run_batch([item.chats for item in request.requests])
+    except PoolSaturatedError as e:
+        raise queue_full(e)
+    return BatchAnalysisResponse(results=results)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """Queue an analysis and return its id without waiting for the result."""
+    if request.callback_url and not callback_allowed(request.callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host is not allowed (JOB_CALLBACK_HOSTS)")
+    job_id = job_queue.submit(
+        {"username": request.username, "chats": [chat.model_dump() for chat in request.chats]},
+        request.callback_url,
+    )
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, wait: float = 0):
+    """Job state; with wait > 0, hold the request up to that many seconds for the result."""
+    job = await job_queue.wait(job_id, min(wait, 60))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return public_view(job)
+
+
+@app.get("/stats")
+async def stats():
+    snapshot = pipeline_stats.snapshot()
+    return {
+        "pool": analysis_pool.stats(),
+        "reputation_cache": get_cache().stats(),
+        "pipeline": snapshot,
+        "cascade": cascade_report(snapshot),
+        "verdict_cache": get_verdict_cache(verdict_version()).stats(),
+        "guardian_endpoints": guardian_endpoints(),
+        "jobs": job_queue.stats(),
+        "live_sessions": live_sessions.stats(),
+    }
+
+
+def guardian_endpoints():
+    """Per-host load and health when guardian calls go to an Ollama pool."""
+    backend = get_engine().backend
+    return backend.stats() if hasattr(backend, "stats") else None
+
+
+@app.delete("/verdict_cache")
+async def invalidate_verdict_cache():
+    """Drop cached verdicts, e.g. after relabeling or a rules change."""
+    get_verdict_cache(verdict_version()).invalidate()
+    return {"invalidated": True}
+
+
+@app.get("/campaigns")
+async def list_campaigns(min_size: int = 2):
+    """Near-duplicate message clusters seen by this server, largest first."""
+    return get_campaign_index().campaigns(min_size)
+
+
+@app.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: int):
+    campaign = get_campaign_index().campaign(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Unknown campaign")
+    return campaign
 
-    return sentiment_response
 
 if __name__ == "__main__":
     import uvicorn
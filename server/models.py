@@ -34,3 +34,27 @@ class SentimentResponse(BaseModel):
     sentiment: str
     alert_needed: bool
     explanation: str
+    confidence: Optional[float] = None
+
+
+class BatchAnalysisRequest(BaseModel):
+    requests: List[ChatAnalysisRequest]
+
+
+class BatchAnalysisResponse(BaseModel):
+    # Same order as BatchAnalysisRequest.requests
+    results: List[SentimentResponse]
+
+
+class JobRequest(ChatAnalysisRequest):
+    # Optional URL the finished job is POSTed to
+    callback_url: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    result: Optional[SentimentResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
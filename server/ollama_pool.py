@@ -0,0 +1,285 @@
+"""
+Pool of Ollama inference hosts behind one guardian backend.
+
+OLLAMA_HOSTS lists the endpoints (comma separated). Each call goes to the
+healthy endpoint with the lowest expected wait: (in-flight + 1) x its rolling
+latency. An endpoint that fails EJECT_AFTER times in a row is ejected; the
+health checker re-admits it once it answers again. Connection-level failures
+are retried on the next endpoint, since the request never reached a model.
+
+Usage (local stand-in servers, no models needed):
+    python ollama_pool.py standin --port 11501 --delay 0.2
+    python ollama_pool.py demo       # three stand-ins, one of them down
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import httpx
+from ollama import ResponseError
+
+import event_loop
+from guardian import GuardianBackend, OllamaBackend
+
+logger = logging.getLogger(__name__)
+
+# Rolling latency starts here so new endpoints get traffic straight away
+INITIAL_LATENCY = 1.0
+LATENCY_SMOOTHING = 0.2
+
+
+def pool_settings():
+    return {
+        "hosts": [h.strip() for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()],
+        "eject_after": int(os.getenv("OLLAMA_EJECT_AFTER", "3")),
+        "health_interval": float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10")),
+    }
+
+
+def _endpoint_failure(error: BaseException) -> bool:
+    """Errors that say the host is unwell, as opposed to a bad model answer."""
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return True
+    return isinstance(error, ResponseError) and error.status_code >= 500
+
+
+class Endpoint:
+    def __init__(self, host: str):
+        self.host = host
+        self.backend = OllamaBackend(host)
+        self.in_flight = 0
+        self.latency = INITIAL_LATENCY
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+
+    def expected_wait(self) -> float:
+        return (self.in_flight + 1) * self.latency
+
+    def stats(self) -> dict:
+        return {
+            "host": self.host,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class OllamaPoolBackend(GuardianBackend):
+    name = "ollama_pool"
+
+    def __init__(self, hosts: List[str], eject_after: int = 3, health_interval: float = 10.0):
+        if not hosts:
+            raise ValueError("OllamaPoolBackend needs at least one host")
+        self.endpoints = [Endpoint(host) for host in hosts]
+        self.eject_after = eject_after
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._health_task = None
+        if health_interval > 0:
+            self._health_task = asyncio.run_coroutine_threadsafe(
+                self._health_loop(), event_loop.get_loop()
+            )
+
+    def _acquire(self, tried) -> Endpoint:
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e not in tried]
+            if not candidates:
+                # Everything is ejected: try the rest anyway rather than fail outright
+                candidates = [e for e in self.endpoints if e not in tried]
+            if not candidates:
+                raise ConnectionError("No Ollama endpoint could take the request")
+            best = min(e.expected_wait() for e in candidates)
+            endpoint = random.choice([e for e in candidates if e.expected_wait() == best])
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, started: float, error: BaseException = None):
+        with self._lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                elapsed = time.perf_counter() - started
+                endpoint.latency += LATENCY_SMOOTHING * (elapsed - endpoint.latency)
+                endpoint.consecutive_failures = 0
+            elif _endpoint_failure(error):
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.healthy and endpoint.consecutive_failures >= self.eject_after:
+                    endpoint.healthy = False
+                    logger.warning(f"Ejected Ollama endpoint {endpoint.host}: {error!r}")
+
+    async def _call(self, method: str, *args):
+        tried = []
+        while True:
+            endpoint = self._acquire(tried)
+            tried.append(endpoint)
+            started = time.perf_counter()
+            try:
+                result = await getattr(endpoint.backend, method)(*args)
+            except asyncio.CancelledError:
+                # Our own deadline, not the endpoint's fault
+                with self._lock:
+                    endpoint.in_flight -= 1
+                raise
+            except Exception as e:
+                self._release(endpoint, started, e)
+                if isinstance(e, (ConnectionError, httpx.ConnectError)) and len(tried) < len(self.endpoints):
+                    continue
+                raise
+            self._release(endpoint, started)
+            return result
+
+    async def chat_json(self, model: str, prompt: str, response_model, options: dict = None):
+        return await self._call("chat_json", model, prompt, response_model, options)
+
+    def chat_json_sync(self, model: str, prompt: str, response_model, options: dict = None):
+        return event_loop.run(self.chat_json(model, prompt, response_model, options))
+
+    async def embed(self, model: str, texts):
+        return await self._call("embed", model, texts)
+
+    async def check_health(self):
+        """Probe every endpoint; ejected ones that answer are re-admitted."""
+
+        async def probe(endpoint):
+            try:
+                await asyncio.wait_for(endpoint.backend.async_client.list(), timeout=5)
+            except Exception as e:
+                return endpoint, e
+            return endpoint, None
+
+        for endpoint, error in await asyncio.gather(*[probe(e) for e in self.endpoints]):
+            with self._lock:
+                if error is None and not endpoint.healthy:
+                    endpoint.healthy = True
+                    endpoint.consecutive_failures = 0
+                    logger.info(f"Re-admitted Ollama endpoint {endpoint.host}")
+                elif error is not None and endpoint.healthy:
+                    endpoint.healthy = False
+                    logger.warning(f"Ejected Ollama endpoint {endpoint.host}: {error!r}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Ollama health check failed: {e!r}")
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def from_env() -> OllamaPoolBackend:
+    settings = pool_settings()
+    return OllamaPoolBackend(
+        settings["hosts"],
+        eject_after=settings["eject_after"],
+        health_interval=settings["health_interval"],
+    )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /api/chat, /api/embed and /api/tags like Ollama, with canned output."""
+
+    delay = 0.0
+    verdict = {"sentiment": "SAFE", "alert_needed": False, "explanation": "stand-in", "confidence": 0.9}
+
+    def _send(self, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._send({"models": []})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.delay)
+        if self.path == "/api/embed":
+            self._send({"model": request["model"], "embeddings": [[0.0] * 8 for _ in request["input"]]})
+            return
+        schema_keys = request.get("format", {}).get("properties", {})
+        content = {"valid": True} if "valid" in schema_keys else dict(self.verdict, explanation=f"stand-in on {self.server.server_port}")
+        message = {"model": request["model"], "message": {"role": "assistant", "content": json.dumps(content)}, "done": True}
+        if not request.get("stream"):
+            self._send(message)
+            return
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_standin(port: int, delay: float = 0.0) -> ThreadingHTTPServer:
+    handler = type("Handler", (StandInHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def demo():
+    from guardian import GuardianEngine
+
+    start_standin(11501, delay=0.05)
+    start_standin(11502, delay=0.2)
+    # 11503 is never started: it gets ejected and traffic moves to the others
+    pool = OllamaPoolBackend(
+        ["http://127.0.0.1:11501", "http://127.0.0.1:11502", "http://127.0.0.1:11503"],
+        eject_after=1,
+        health_interval=0,
+    )
+    engine = GuardianEngine(pool)
+
+    async def waves():
+        # Several waves so the rolling latencies have something to go on
+        results = []
+        for wave in range(5):
+            results += await asyncio.gather(
+                *[engine.detect("stand-in", f"message {wave}.{i}") for i in range(8)]
+            )
+        return results
+
+    started = time.perf_counter()
+    results = event_loop.run(waves())
+    print(f"{len(results)} calls in {time.perf_counter() - started:.2f}s")
+    served = {}
+    for result in results:
+        served[result.explanation] = served.get(result.explanation, 0) + 1
+    print(served)
+    for endpoint in pool.stats():
+        print(endpoint)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama endpoint pool tools")
+    parser.add_argument("command", choices=["standin", "demo"])
+    parser.add_argument("--port", type=int, default=11501)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.command == "standin":
+        print(f"Stand-in Ollama on http://127.0.0.1:{args.port}")
+        start_standin(args.port, args.delay).serve_forever()
+    else:
+        demo()
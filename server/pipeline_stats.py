@@ -0,0 +1,50 @@
+"""
+In-process counters and latency samples for the analysis pipeline, reported on
+GET /stats and by evaluate.py.
+"""
+
+import threading
+from collections import deque
+
+
+class PipelineStats:
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latencies = {}
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self._latencies:
+                self._latencies[name] = deque(maxlen=self.max_samples)
+            self._latencies[name].append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._latencies.clear()
+
+    @staticmethod
+    def _percentile(samples, fraction):
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = {}
+            for name, samples in self._latencies.items():
+                if samples:
+                    latencies[name] = {
+                        "count": len(samples),
+                        "p50": round(self._percentile(samples, 0.5), 4),
+                        "p95": round(self._percentile(samples, 0.95), 4),
+                    }
+            return {"counters": dict(self._counters), "latency_seconds": latencies}
+
+
+pipeline_stats = PipelineStats()
@@ -0,0 +1,266 @@
+"""
+Deterministic pre-classifier that runs ahead of the LLM.
+
+A precompiled Aho-Corasick automaton matches a curated phrase list in one pass
+over the text, and URL heuristics score the links (throwaway TLDs, brand
+lookalike hosts, raw IPs). Clear SCAM windows short-circuit the LLM; for
+everything else the matched features are added to the prompt. There is no SAFE
+fast path: the absence of known phrases says nothing about scams the list does
+not cover (grandparent, investment, tax threats), so those go to the model.
+
+Usage:
+    python rules.py                      # classify the url_extractions samples
+    python rules.py bench labeled.jsonl  # speed, LLM traffic removed, accuracy
+"""
+
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from url_extractions import extract_urls_from_text
+
+logger = logging.getLogger(__name__)
+
+# phrase -> (feature, weight). Phrases are matched case-insensitively.
+DEFAULT_PHRASES = {
+    # "Reply Y" trick used to get iMessage to enable links from unknown senders
+    "reply with a y": ("reply_y_activation", 4),
+    "please reply y": ("reply_y_activation", 4),
+    "open it again to activate the link": ("reply_y_activation", 4),
+    "copy the link into your safari": ("copy_link_to_browser", 3),
+    "u.s. post": ("parcel_brand", 1),
+    "usps": ("parcel_brand", 1),
+    "parcel": ("parcel_brand", 1),
+    "package delivery": ("parcel_brand", 1),
+    "invalid zip code": ("delivery_problem", 2),
+    "temporarily detained": ("delivery_problem", 2),
+    "tolls": ("toll_brand", 1),
+    "fastrak": ("toll_brand", 1),
+    "ezdrive": ("toll_brand", 1),
+    "within 24 hours": ("urgency", 1),
+    "avoid a fine": ("urgency", 1),
+    "keep your license": ("urgency", 1),
+    "account has been suspended": ("account_threat", 2),
+    "verify your account": ("account_threat", 2),
+    "gift card": ("gift_card", 2),
+    "wire transfer": ("payment_request", 1),
+    "bitcoin": ("payment_request", 1),
+    "allcreditwelcome": ("loan_spam", 3),
+    "struggling with": ("loan_spam", 1),
+    "to end txt": ("bulk_sms", 2),
+    "reply stop": ("bulk_sms", 1),
+}
+
+DEFAULT_SUSPICIOUS_TLDS = {
+    "top", "xyz", "icu", "cyou", "buzz", "sbs", "click", "rest", "bond",
+    "live", "shop", "vip", "win", "mom", "lol", "cfd", "qpon", "tk",
+}
+
+SHORTENERS = {"bit.ly", "tinyurl.com", "t.co", "is.gd", "cutt.ly", "rebrand.ly"}
+
+SCAM = "SCAM"
+
+
+@dataclass
+class RuleResult:
+    # SCAM when the rules are sure, None to hand over to the LLM
+    verdict: Optional[str]
+    score: int = 0
+    features: List[str] = field(default_factory=list)
+
+    def prompt_hint(self) -> str:
+        if not self.features:
+            return ""
+        return f", and a rule-based pre-check that flagged: {', '.join(self.features)}"
+
+    def response(self) -> dict:
+        return {
+            "sentiment": self.verdict,
+            "alert_needed": self.verdict == SCAM,
+            "explanation": f"Rule-based pre-check matched known scam patterns: {', '.join(self.features)}.",
+            "confidence": 1.0,
+        }
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher: every pattern found in one pass over the text."""
+
+    def __init__(self, patterns):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(pattern)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text: str) -> List[str]:
+        found = []
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.extend(output[state])
+        return found
+
+
+_IP_HOST = re.compile(r"^\d{1,3}(\.\d{1,3}){3}$")
+
+
+class RuleSet:
+    def __init__(
+        self,
+        phrases: Dict[str, Tuple[str, int]] = None,
+        suspicious_tlds=None,
+        scam_score: int = 6,
+    ):
+        self.phrases = {p.lower(): tuple(v) for p, v in (phrases or DEFAULT_PHRASES).items()}
+        self.suspicious_tlds = set(suspicious_tlds or DEFAULT_SUSPICIOUS_TLDS)
+        self.scam_score = scam_score
+        self.matcher = AhoCorasick(self.phrases)
+
+    @classmethod
+    def from_file(cls, path: str):
+        """JSON with optional "phrases" ({phrase: [feature, weight]}), "suspicious_tlds", "scam_score"."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(
+            phrases=data.get("phrases"),
+            suspicious_tlds=data.get("suspicious_tlds"),
+            scam_score=data.get("scam_score", 6),
+        )
+
+    def url_features(self, url: str) -> List[Tuple[str, int]]:
+        host = (urlsplit(url).hostname or "").lower()
+        features = []
+        if not host:
+            return features
+        if _IP_HOST.match(host):
+            features.append(("ip_host", 3))
+        if host.rsplit(".", 1)[-1] in self.suspicious_tlds:
+            features.append((f"tld_{host.rsplit('.', 1)[-1]}", 3))
+        # ezdrivema.com-dkbnda.top: a brand domain glued onto a throwaway one
+        if re.search(r"\.(com|org|gov|net)-", host):
+            features.append(("lookalike_host", 3))
+        if host in SHORTENERS:
+            features.append(("url_shortener", 1))
+        if not url.lower().startswith("https://"):
+            features.append(("plain_http", 1))
+        return features
+
+    def classify(self, text: str) -> RuleResult:
+        lowered = text.lower()
+        weights = {}
+        for phrase in self.matcher.find(lowered):
+            feature, weight = self.phrases[phrase]
+            # Each feature counts once however many of its phrases matched
+            weights[feature] = max(weights.get(feature, 0), weight)
+        for url in extract_urls_from_text(text):
+            for feature, weight in self.url_features(url):
+                weights[feature] = max(weights.get(feature, 0), weight)
+
+        score = sum(weights.values())
+        features = sorted(weights, key=weights.get, reverse=True)
+        if score >= self.scam_score:
+            return RuleResult(SCAM, score, features)
+        return RuleResult(None, score, features)
+
+
+_preclassifier = None
+
+
+def get_preclassifier() -> Optional[Callable[[str], RuleResult]]:
+    """
+    The configured pre-classifier: PRECLASSIFIER=rules (default, optionally
+    with RULES_PATH), off, or "module:callable" for a custom text -> RuleResult.
+    """
+    global _preclassifier
+    setting = os.getenv("PRECLASSIFIER", "rules")
+    if _preclassifier is None or _preclassifier[0] != setting:
+        if setting == "off":
+            classifier = None
+        elif setting == "rules":
+            path = os.getenv("RULES_PATH")
+            classifier = (RuleSet.from_file(path) if path else RuleSet()).classify
+        else:
+            module, _, attr = setting.partition(":")
+            classifier = getattr(importlib.import_module(module), attr)
+        _preclassifier = (setting, classifier)
+    return _preclassifier[1]
+
+
+def benchmark(path: str, rules: RuleSet = None):
+    rules = rules or RuleSet()
+    with open(path, "r") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    texts = ["\n".join(example["messages"]) for example in examples]
+
+    started = time.perf_counter()
+    results = [rules.classify(text) for text in texts]
+    per_call = (time.perf_counter() - started) / max(len(texts), 1)
+
+    decided = [(r, e["label"]) for r, e in zip(results, examples) if r.verdict]
+    correct = sum(r.verdict == label for r, label in decided)
+    print(f"Examples:            {len(examples)}")
+    print(f"Time per window:     {per_call * 1e6:.1f} us")
+    print(f"Short-circuited:     {len(decided)} ({len(decided) / max(len(examples), 1):.1%} of LLM traffic removed)")
+    if decided:
+        print(f"Short-circuit accuracy: {correct / len(decided):.1%}")
+    for r, label in decided:
+        if r.verdict != label:
+            print(f"  wrong: {label} -> {r.verdict} {r.features}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "bench":
+        benchmark(sys.argv[2])
+    else:
+        samples = [
+            "U.S. Post: You have a USPS parcel being cleared, due to the detection of an invalid zip code address. "
+            "https://uspscjdp.top/i (Please reply with a Y, then exit the text message and open it again to activate the link)",
+            "Pay your FastTrak Lane tolls by January 16, 2025. To avoid a fine pay at https://ezdrivema.com-dkbnda.top/i",
+            "Struggling with_bills? AllCreditWelcome to request as much as 2400_F A S T at http://6mjpwl.com/exagh upnao To end txt 3",
+            "Are we still on for lunch tomorrow?",
+            "Here is the doc you asked for https://docs.google.com/document/d/abc",
+        ]
+        rules = RuleSet()
+        for text in samples:
+            started = time.perf_counter()
+            result = rules.classify(text)
+            elapsed = (time.perf_counter() - started) * 1e6
+            print(f"{str(result.verdict):<5} score={result.score:<3} {elapsed:6.1f}us {result.features}")
@@ -1,27 +1,33 @@
-from llama_cpp import Llama
-import json
 from typing import List
-from dotenv import load_dotenv
 from models import *
 import os
 import logging
 import sys
-import contextlib
-import signal
-from functools import partial
-import threading
-from ollama import chat
-from ollama import ChatResponse
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from guardian import *
+from pydantic import ValidationError
 from url_extractions import extract_urls_from_text
-import re
-from tkinter import messagebox
-import tkinter as tk
+import time
+import asyncio
+
+# llama_cpp and tkinter are deliberately not imported here: llama_cpp is only
+# loaded by the in-process backend (GUARDIAN_BACKEND=llama_cpp, which reads
+# LLAMA_MODEL_PATH) and both dominated cold start. Environment variables (.env) are
+# loaded once by the lifespan hook in main.py.
+
+from enrichment import enrich, enrich_async, lookup_timeout
+from deadline import DeadlineBudget
+from pipeline_stats import pipeline_stats
+from voting import run_candidates, tally, vote_settings
+from rules import get_preclassifier
+from knn import get_index, knn_settings, knn_verdict
+from campaigns import campaign_settings, get_campaign_index
+from verdict_cache import get_verdict_cache, normalize_window, verdict_cache_enabled, window_key
+from cascade import budget_shares, cascade_settings, fast_tier_verdict, guardian_model, timed_guardian
+import event_loop
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from API_check.email_check import EmailCheck
-from API_check.url_check import UrlCheck
-from API_check.phone_check import PhoneCheck
+from app_config import get_config
 
 # Add this near the top of the file, after imports
 parent_monitor = None
@@ -42,233 +48,488 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class TimeoutException(Exception):
-    pass
-
-
-@contextlib.contextmanager
-def timeout(seconds):
-    def signal_handler(signum, frame):
-        raise TimeoutException("Timed out")
-
-    # Register the signal handler
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
+# Detector/validator rounds when the server is idle
+MAX_ROUNDS = 6
+
+# Bump whenever the detector or validator prompts (here or in
+# guardian.INSTRUCTIONS) change, so cached verdicts from the old prompts are dropped
+PROMPT_VERSION = "5"
+
+
+def validator_skip_confidence() -> float:
+    """
+    Skip the validator when the detector is at least this sure and a strong
+    deterministic signal agrees with it. Above 1.0 never skips.
+    """
+    return float(os.getenv("VALIDATOR_SKIP_CONFIDENCE", "0.8"))
+
+
+def partial_verdict(enrichment, parsed_result=None, reason="") -> SentimentResponse:
+    """
+    Best verdict available when the time budget runs out: the unvalidated guardian
+    verdict if there is one, otherwise one built from the reputation lookups that
+    actually returned (a failed lookup is mentioned, never counted as a hit).
+    """
+    if parsed_result is not None:
+        result = dict(parsed_result)
+        result["explanation"] = f"{result['explanation']} (Not validated: {reason}.)"
+        return SentimentResponse(**result)
+
+    signals = []
+    if enrichment is not None:
+        if enrichment.urls_safe is False:
+            return SentimentResponse(
+                sentiment="SCAM",
+                alert_needed=True,
+                explanation=f"Google Safe Browsing flagged a link in the messages. Model analysis did not finish: {reason}.",
+            )
+        if enrichment.urls_safe:
+            signals.append("links checked safe")
+        elif enrichment.url_lookup_failed:
+            signals.append("links could not be checked")
+        if enrichment.phone_score is not None:
+            signals.append(f"phone score {enrichment.phone_score:.2f}")
+        if enrichment.email_score is not None:
+            signals.append(f"email score {enrichment.email_score:.2f}")
+    checked = ", ".join(signals) if signals else "no reputation signals available"
+    return SentimentResponse(
+        sentiment="SUSPICIOUS",
+        alert_needed=True,
+        explanation=f"Model analysis did not finish: {reason}. Marking as suspicious for safety ({checked}).",
+    )
+
+
+def strong_signal_agrees(sentiment: str, enrichment) -> bool:
+    """
+    True if a deterministic reputation signal independently backs a SCAM verdict:
+    a Safe Browsing hit or a phone number no provider considers valid, with every
+    provider having answered. A lookup that failed is not a signal (urls_safe is
+    None then).
+    """
+    if sentiment != "SCAM" or enrichment is None:
+        return False
+    return enrichment.urls_safe is False or enrichment.phone_invalid
+
+
+def provisional_risk(enrichment, pre=None) -> dict:
+    """
+    Risk level from the fast checks alone (rules and reputation lookups), shown
+    to the parent while the model is still working. Never a final verdict.
+    """
+    # urls_safe is False only for a real hit, never for a lookup that failed
+    if enrichment is not None and enrichment.urls_safe is False:
+        return {"level": "HIGH", "reason": "Google Safe Browsing flagged a link"}
+    if enrichment is not None and enrichment.phone_invalid:
+        return {"level": "HIGH", "reason": "no provider considers the phone number valid"}
+    reasons = []
+    if pre is not None and pre.features:
+        reasons.append("scam phrases: " + ", ".join(pre.features))
+    if enrichment is not None:
+        for name, score in (("phone", enrichment.phone_score), ("email", enrichment.email_score)):
+            if score is not None and score < 0.5:
+                reasons.append(f"low {name} score {score:.2f}")
+    # Not a warning sign, but the parent should know the links are unverified
+    notes = ["links could not be checked"] if enrichment is not None and enrichment.url_lookup_failed else []
+    if reasons:
+        return {"level": "MEDIUM", "reason": "; ".join(reasons + notes)}
+    return {"level": "LOW", "reason": "; ".join(["no warning signs in the fast checks"] + notes)}
+
+
+def rounds_for_load(load: float) -> int:
+    """Full retry budget when idle, down to a single round when the queue is full."""
+    return max(1, round(MAX_ROUNDS * (1 - load)))
+
+
+# The fixed instructions live in guardian.INSTRUCTIONS and are sent as the
+# system message; these build only the per-request part that follows them.
+
+
+def detector_prompt(timestamp_text, channel, score, signals, messages_text) -> str:
+    return (
+        f"Timestamp: {timestamp_text}\n"
+        f"Average valid {channel} score: {score}\n"
+        f"Other signals: {signals.lstrip(', ') or 'none'}\n\n"
+        f"Messages:\n\n{messages_text}"
+    )
+
+
+def retry_note(attempt: int) -> str:
+    """Appended after the messages, so retries keep the cached prefix."""
+    return (
+        f"\n\nThe scam detecting result validator has validated your conclusion and determined "
+        f"it is incorrect for the {attempt}th time. Please reconsider your initial answer and "
+        f"provide another response."
+    )
+
+
+def validator_prompt(explanation, timestamp, score, url_prompt) -> str:
+    return (
+        f"Previous conclusion of the scam detector:\n\n{explanation}\n\n"
+        f"Timestamp: {timestamp}\n"
+        f"Average valid phone or email score: {score}\n"
+        f"Other signals: {url_prompt.lstrip(', ') or 'none'}"
+    )
+
+
+def verdict_version() -> str:
+    """Everything besides the window and its features that can change a verdict."""
+    settings = cascade_settings()
+    return "|".join(
+        [PROMPT_VERSION, settings["fast_model"], settings["model"], guardian_mode()]
+    )
+
+
+def guardian_mode() -> str:
+    """"sequential" (detect -> validate -> retry) or "vote" (parallel self-consistency)."""
+    return os.getenv("GUARDIAN_MODE", "sequential")
+
+
+def vote_verdict(
+    prompt,
+    enrichment,
+    budget,
+    make_validator_prompt,
+    remember=lambda response: response,
+    emit=lambda stage, data: None,
+) -> SentimentResponse:
+    """
+    Run several detector candidates at once and take the vote. The validator only
+    runs to break a tie; the vote margin becomes the verdict's confidence.
+    Final verdicts (not partial ones) are passed through remember.
+    """
+    settings = vote_settings()
+    stage_timeout = budget.stage_timeout("first_guardian")
+    candidates = event_loop.run(
+        run_candidates(
+            guardian_model(),
+            prompt,
+            settings["candidates"],
+            settings["temperature"],
+            stage_timeout,
+        )
+    )
+    vote = tally(candidates, settings["weighting"])
+    logger.info(f"Vote weights: {vote.weights}, confidence: {vote.confidence:.2f}")
+    if vote.winner is None and not vote.tied:
+        return partial_verdict(enrichment, None, "no detector candidate finished in time")
+    # On a tie the most severe tied verdict is reported until the validator decides
+    leader = vote.winner or vote.tied[0]
+    emit(
+        "first_guardian",
+        {"round": 1, "tier": "vote", "sentiment": leader["sentiment"], "confidence": vote.confidence},
+    )
+    if vote.winner is not None:
+        pipeline_stats.incr("vote_decided")
+        return remember(SentimentResponse(**dict(vote.winner, confidence=vote.confidence)))
+
+    # Tie: ask the validator about each tied verdict at once
+    pipeline_stats.incr("vote_tied")
+    stage_timeout = budget.stage_timeout("validator")
+
+    async def validate_all():
+        return await asyncio.gather(
+            *[
+                second_guardian_async(
+                    model=guardian_model(),
+                    prompt=make_validator_prompt(candidate["explanation"]),
+                    first_output=candidate["explanation"],
+                    status=candidate["sentiment"],
+                )
+                for candidate in vote.tied
+            ],
+            return_exceptions=True,
+        )
 
     try:
-        yield
-    finally:
-        # Disable the alarm
-        signal.alarm(0)
-
+        validity = event_loop.run(validate_all(), timeout=stage_timeout)
+    except FutureTimeoutError:
+        # vote.tied is ordered most severe first
+        return partial_verdict(
+            enrichment, vote.tied[0], "the validator ran out of time breaking a tie"
+        )
+    pipeline_stats.incr("validator_runs", len(vote.tied))
+    emit("validator", {"round": 1, "tier": "vote", "valid": any(valid is True for valid in validity)})
+    for candidate, valid in zip(vote.tied, validity):
+        if valid is True:
+            return remember(SentimentResponse(**dict(candidate, confidence=vote.confidence)))
+    return remember(
+        SentimentResponse(
+            sentiment="SUSPICIOUS",
+            alert_needed=True,
+            explanation="Detector candidates disagreed and the validator accepted none of them, marking as suspicious",
+            confidence=vote.confidence,
+        )
+    )
+
+
+def analyze_sentiment(
+    chats: List[Chat], max_rounds: int = None, on_event=None
+) -> SentimentResponse:
+    """
+    Run the full pipeline on a window of chats. max_rounds caps the
+    detector/validator retries (see rounds_for_load). on_event(stage, data), if
+    given, is called as each stage finishes (rules, enrichment, first_guardian,
+    validator) so progress can be streamed before the final verdict.
+    """
+    started = time.perf_counter()
+
+    def emit(stage, data):
+        if on_event is None:
+            return
+        try:
+            on_event(stage, data)
+        except Exception as e:
+            logger.error(f"Progress callback failed for {stage}: {e!r}")
 
-@contextlib.contextmanager
-def redirect_metal_output():
-    metal_log = open("metal_init.log", "a")
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
     try:
-        sys.stdout = metal_log
-        sys.stderr = metal_log
-        yield
+        return _analyze_sentiment(chats, max_rounds or MAX_ROUNDS, emit)
     finally:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-        metal_log.close()
-
-
-def load_scammer_email():
+        pipeline_stats.observe("analysis", time.perf_counter() - started)
+
+
+def group_windows(windows: List[List[Chat]]) -> List[List[int]]:
+    """
+    Positions of each distinct window of a batch, in first-seen order, so
+    identical windows (ignoring case and whitespace) are analyzed once.
+    """
+    groups = {}
+    for position, chats in enumerate(windows):
+        text = "\n".join(chat.message for chat in chats)
+        groups.setdefault(normalize_window(text), []).append(position)
+    pipeline_stats.incr("batch_windows", len(windows))
+    pipeline_stats.incr("batch_duplicates", len(windows) - len(groups))
+    return list(groups.values())
+
+
+async def prewarm_batch(windows: List[List[Chat]]):
+    """
+    Check every URL of a batch in one reputation pass on the shared loop, so
+    each window's own enrichment is a cache hit. Awaitable from any loop.
+    """
+    config = get_config()
+    urls = sorted({url for chats in windows for chat in chats for url in extract_urls_from_text(chat.message)})
     try:
-        with open("./../config.json", "r") as f:
-            config = json.load(f)
-            if config.get("scammer_email"):
-                return config.get("scammer_email")
-            else:
-                return None
-    except Exception as e:
-        logging.error(f"Error loading scammer info: {e}")
-        return None
-
-
-def load_scammer_phone():
-    try:
-        with open("./../config.json", "r") as f:
-            config = json.load(f)
-            if config.get("scammer_phone"):
-                return config.get("scammer_phone")
-            else:
-                return None
-    except Exception as e:
-        logging.error(f"Error loading scammer info: {e}")
-        return None
-
-
-def load_scammer_timestamp():
-    try:
-        with open("./../config.json", "r") as f:
-            config = json.load(f)
-            if config.get("scammer_timestamp"):
-                return config.get("scammer_timestamp")
-            else:
-                return None
+        await event_loop.submit(
+            enrich_async(urls, phone=config.scammer_phone, email=config.scammer_email, timeout=lookup_timeout())
+        )
     except Exception as e:
-        logging.error(f"Error loading scammer info: {e}")
-        return None
+        logger.error(f"Batch enrichment failed: {e!r}")
 
 
-def analyze_sentiment(chats: List[Chat]) -> SentimentResponse:
+def _analyze_sentiment(chats: List[Chat], max_rounds: int, emit) -> SentimentResponse:
     logger.info("Starting sentiment analysis")
+    # One latency budget for the whole request, shared by enrichment, the first
+    # guardian and the validator (and their retries)
+    budget = DeadlineBudget.from_env(budget_shares())
+    enrichment = None
 
     try:
-        load_dotenv()
-
-        model_path = os.getenv("LLAMA_MODEL_PATH")
-        if not model_path:
-            logger.error("LLAMA_MODEL_PATH not found in environment variables")
-            raise ValueError("LLAMA_MODEL_PATH environment variable is not set")
-
-        messages_text = chats[0].message
-        phone = None
-        if load_scammer_phone():
-            phone = load_scammer_phone()
-        if load_scammer_email():
-            email = load_scammer_email()
-        if load_scammer_timestamp():
-            timestamp = load_scammer_timestamp()
-
+        messages_text = "\n".join(chat.message for chat in chats)
+        # Cached config, reloaded in the background when config.json changes
+        config = get_config()
+        phone = config.scammer_phone
+        email = config.scammer_email
+        timestamp = config.scammer_timestamp
+
+        # Microsecond rule check first: obvious windows never reach the LLM or
+        # the reputation APIs
+        preclassifier = get_preclassifier()
+        pre = preclassifier(messages_text) if preclassifier else None
+        if pre is not None:
+            emit("rules", {"verdict": pre.verdict, "score": pre.score, "features": pre.features})
+        # Only SCAM short-circuits; a SAFE from a custom classifier still goes to the model
+        if pre is not None and pre.verdict == "SCAM":
+            logger.info(f"Pre-classifier verdict {pre.verdict}: {pre.features}")
+            pipeline_stats.incr(f"rules_{pre.verdict.lower()}")
+            return SentimentResponse(**pre.response())
+        pipeline_stats.incr("rules_passed")
+        rules_prompt = pre.prompt_hint() if pre is not None else ""
+
+        # Every URL in the window is checked in one batched Safe Browsing call
         url = extract_urls_from_text(messages_text)
+        # URL, phone and email reputation lookups run concurrently
+        enrichment = enrich(
+            url,
+            phone=phone,
+            email=email,
+            timeout=min(lookup_timeout(), budget.stage_timeout("enrichment")),
+        )
         if url:
-            url_checker = UrlCheck()
-            url_valid = url_checker.check_url(url)["is_safe"]
+            url_valid = enrichment.urls_safe
             if url_valid:
                 url_prompt = ",a safe url from the text message after being checked with google safe browser"
-            else:
+            elif url_valid is False:
                 url_prompt = ",an unsafe url from the text message after being checked with google safe browser"
+            else:
+                # Lookup failed or timed out: tell the model nothing was verified
+                url_prompt = ",a url from the text message that could not be checked with google safe browser"
         else:
             url_prompt = ""
-        if phone:
-            phone_checker = PhoneCheck()
-            score = phone_checker.check_phone(phone_number=phone)
+        emit(
+            "enrichment",
+            {
+                "urls_safe": enrichment.urls_safe if url else None,
+                "phone_score": enrichment.phone_score,
+                "email_score": enrichment.email_score,
+                "risk": provisional_risk(enrichment, pre),
+            },
+        )
 
-            # Convert timestamp (assumed format "HH:MM") into an integer hour.
-            try:
-                hour = int(timestamp.split(":")[0])
-            except Exception as e:
-                logger.error(f"Failed to parse timestamp to integer: {e}")
-                # Set default hour or handle the error as needed.
-                hour = 0
-            if hour > 17 or hour < 9:
-                timestamp_text = "out of the business hour"
-            else:
-                timestamp_text = "in the business hour"
-
-            logger.info(f"timestamp_text: {timestamp_text}")
-
-            initial_prompt = f"""
-            You are a scam detecting assistant. Given the timestamp is {timestamp_text}, the average valid phone score of {score} from the preset fields pipeline {url_prompt}, and the message content below, determine to what extent is this text conversation a safe message and provide the entire thought process behind this conclusion.
-            Please analyze the user's messages in a concise manner, following the format below.\n\n
-            Classify each conversation as "SCAM", "SUSPICIOUS", or "SAFE" based on its content.
-            Return valid JSON with keys: "sentiment" (SCAM, SUSPICIOUS, or SAFE), "alert_needed" (true/false), and "explanation".
-            Note that for sentiment key, the only three options are "SCAM", "SUSPICIOUS", or "SAFE".  Analyze these chat messages briefly and respond *only* with JSON.\n\n
-            Messages:\n\n
-            {messages_text}
-            """
+        channel = "phone" if phone else "email"
+        score = enrichment.phone_score if phone else enrichment.email_score
+        # Convert timestamp (assumed format "HH:MM") into an integer hour.
+        try:
+            hour = int(timestamp.split(":")[0])
+        except Exception as e:
+            logger.error(f"Failed to parse timestamp to integer: {e}")
+            # Set default hour or handle the error as needed.
+            hour = 0
+        if hour > 17 or hour < 9:
+            timestamp_text = "out of the business hour"
         else:
-            email_checker = EmailCheck()
-            score = email_checker.check_email(email=None)
-            # Convert timestamp (assumed format "HH:MM") into an integer hour.
+            timestamp_text = "in the business hour"
+        logger.info(f"timestamp_text: {timestamp_text}")
+
+        # Identical windows with identical reputation signals get the same
+        # verdict, so broadcast scams are analyzed once. Checked before the
+        # campaign signature and the kNN embedding, which a hit never needs.
+        cache_key = None
+        if verdict_cache_enabled():
+            cache_key = window_key(
+                messages_text,
+                {
+                    "channel": channel,
+                    "score": None if score is None else round(score, 2),
+                    "urls_safe": enrichment.urls_safe if url else None,
+                    "business_hours": timestamp_text,
+                    "rules": pre.features if pre is not None else [],
+                },
+                verdict_version(),
+            )
+            cached = get_verdict_cache(verdict_version()).get(cache_key)
+            if cached is not None:
+                pipeline_stats.incr("verdict_cache_hits")
+                return SentimentResponse(**cached)
+
+        # Templated campaigns: a near-duplicate of an earlier analyzed window
+        # either reuses its verdict (below) or is shown to the model as evidence
+        campaign = campaign_settings()
+        campaign_prompt = ""
+        signature, match, similarity = None, None, 0.0
+        if campaign["enabled"]:
+            signature = get_campaign_index().signature(messages_text)
+            match, similarity = get_campaign_index().nearest(signature)
+            if match is not None and similarity >= campaign["evidence"]:
+                campaign_prompt = (
+                    f", and a near-duplicate (similarity {similarity:.2f}) of an earlier message "
+                    f"judged {match.verdict['sentiment']} because: {match.verdict['explanation']}"
+                )
+
+        def remember(response: SentimentResponse) -> SentimentResponse:
+            if cache_key is not None:
+                get_verdict_cache(verdict_version()).put(cache_key, response.model_dump())
+            if signature is not None:
+                get_campaign_index().add(messages_text, response.model_dump(), signature)
+            return response
+
+        # A link flagged now overrides a SAFE verdict given to the template earlier
+        if (
+            match is not None
+            and similarity >= campaign["reuse"]
+            and not (match.verdict["sentiment"] == "SAFE" and enrichment.urls_safe is False)
+        ):
+            logger.info(f"Reusing verdict of campaign {match.campaign} (similarity {similarity:.2f})")
+            pipeline_stats.incr("campaign_reused")
+            get_campaign_index().add(messages_text, match.verdict, signature)
+            reused = dict(match.verdict)
+            reused["explanation"] = (
+                f"Near-duplicate of an earlier analyzed message (campaign {match.campaign}, "
+                f"similarity {similarity:.2f}): {reused['explanation']}"
+            )
+            return SentimentResponse(**reused)
+
+        # Labeled-example retrieval: clear cases are decided here, the rest get
+        # the closest examples as few-shot context. After campaign reuse, so a
+        # reused verdict never pays for the embedding call.
+        knn_result = None
+        knn_prompt = ""
+        index = get_index()
+        if index is not None:
+            started = time.perf_counter()
             try:
-                hour = int(timestamp.split(":")[0])
+                vector = event_loop.run(
+                    embed_async(index.model, [messages_text]),
+                    timeout=min(lookup_timeout(), budget.remaining()),
+                )[0]
+                settings = knn_settings()
+                knn_result = index.search(vector, settings["k"], settings["nprobe"])
+                knn_prompt = knn_result.few_shot()
             except Exception as e:
-                logger.error(f"Failed to parse timestamp to integer: {e}")
-                # Set default hour or handle the error as needed.
-                hour = 0
-            if hour > 17 or hour < 9:
-                timestamp_text = "out of the business hour"
-            else:
-                timestamp_text = "in the business hour"
-            initial_prompt = f"""
-            You are a scam detecting assistant. Given the timestamp is {timestamp_text}, the average valid email score of {score} from the preset fields pipeline {url_prompt}, and the message content below, determine to what extent is this text conversation a safe message and provide the entire thought process behind this conclusion.
-            Please analyze the user's messages in a concise manner, following the format below.\n\n
-            Classify each conversation as "SCAM", "SUSPICIOUS", or "SAFE" based on its content.
-            Return valid JSON with keys: "sentiment" (SCAM, SUSPICIOUS, or SAFE), "alert_needed" (true/false), and "explanation".
-            Note that for sentiment key, the only three options are "SCAM", "SUSPICIOUS", or "SAFE".  Analyze these chat messages briefly and respond *only* with JSON.\n\n
-            Messages:\n\n
-            {messages_text}
-            """
+                logger.error(f"kNN retrieval failed: {e!r}")
+            pipeline_stats.observe("knn", time.perf_counter() - started)
+
+        direct = knn_verdict(knn_result) if knn_result is not None else None
+        if direct is not None:
+            logger.info(f"kNN verdict {direct['sentiment']} (score {knn_result.score:.2f})")
+            pipeline_stats.incr("knn_decided")
+            return remember(SentimentResponse(**direct))
+
+        initial_prompt = detector_prompt(
+            timestamp_text,
+            channel,
+            score,
+            f"{url_prompt}{rules_prompt}{campaign_prompt}{knn_prompt}",
+            messages_text,
+        )
+
+        # Most benign chatter is settled by the fast model; only uncertain
+        # verdicts pay for the large one
+        if cascade_settings()["fast_model"]:
+            verdict = fast_tier_verdict(
+                initial_prompt,
+                budget,
+                enrichment,
+                lambda explanation: validator_prompt(explanation, timestamp, score, url_prompt),
+                emit,
+            )
+            if verdict is not None:
+                return remember(verdict)
+
+        if guardian_mode() == "vote":
+            return vote_verdict(
+                initial_prompt,
+                enrichment,
+                budget,
+                lambda explanation: validator_prompt(explanation, timestamp, score, url_prompt),
+                remember,
+                emit,
+            )
 
         reason_valid = None
-        for i in range(6):
+        parsed_result = None
+        for i in range(max_rounds):
+            if budget.expired():
+                break
             # Generate completion with timeout
             logger.info("Starting response generation...")
             if i == 0:  # it is the first iteration
                 prompt = initial_prompt
             else:
-                add_on_prompt = f"""
-                The scam detecting result validator has validated your conclusion and determined it is incorrect for the {i}th time. 
-                Please reconsider your initial answer and provide another response.\n\n
-                """
-                prompt = add_on_prompt + initial_prompt
-                # logger.info(f"prompt:{prompt}")
+                prompt = initial_prompt + retry_note(i)
+            stage_timeout = budget.stage_timeout("first_guardian")
             try:
-                with redirect_metal_output(), timeout(60):  # 30 second timeout
-                    response = first_guardian(
-                        model="deepseek-r1:8b",
-                        # model="llama3.2:latest",
-                        prompt=prompt,
-                    )
-
-            except TimeoutException:
-                logger.error("Model inference timed out after 30 seconds")
-                return SentimentResponse(
-                    sentiment="ERROR",
-                    alert_needed=False,
-                    explanation="Model inference timed out",
+                # Cancelled (and generation stopped) if it overruns its share
+                response = event_loop.run(
+                    timed_guardian(guardian_model(), prompt),
+                    timeout=stage_timeout,
                 )
 
-            # Process response
-            try:
-                result = response
-                match = re.search(r"\{.*\}", result, re.DOTALL)
-                if not match:
-                    logger.error("No JSON object found in the response.")
-                    return SentimentResponse(
-                        sentiment="SUSPICIOUS",
-                        alert_needed=True,
-                        explanation="Failed to find JSON block in model response.",
-                    )
-
-                json_str = match.group(0)  # The substring that *should* be valid JSON
-                parsed_result = json.loads(json_str)
-                explanation, sentiment = (
-                    parsed_result["explanation"],
-                    parsed_result["sentiment"],
-                )
-                second_prompt = f"""
-                You are a scam detecting result validator. From this previous conclusion of a scam detector:\n\n{explanation}\n\nConsider the thought process and the following content related to the message: The timestamp is {timestamp}, 
-                the average valid phone or email score of {score} from the preset fields pipeline {url_prompt}.
-                Please analyze the previous detector's reasonings and determine its validity.
-                Classify the reasoning for the conversation as "VALID" or "INVALID".
-                Return valid JSON with keys: "valid" (True or False).
-                Note that for valid key, the only options are True or False.
-                """
-
-                reason_valid = second_guardian(
-                    model="deepseek-r1:8b",
-                    prompt=second_prompt,
-                    first_output=explanation,
-                    status=sentiment,
+            except FutureTimeoutError:
+                logger.error(f"Model inference timed out after {stage_timeout:.1f} seconds")
+                return partial_verdict(
+                    enrichment, parsed_result, "the detector ran out of time"
                 )
-                logger.info(f"current iteration: {i}, reason_valid: {reason_valid}")
-
-                if reason_valid:
-                    logger.info(f"The reason is valid, returning the result")
-                    return SentimentResponse(**parsed_result)
-                else:
-                    logger.info(f"Invalid analysis result, retrying (attempt {i+1})...")
-                    continue
-
-            except (json.JSONDecodeError, KeyError, IndexError) as e:
+            except ValidationError as e:
                 logger.error(f"Error processing response: {str(e)}")
                 return SentimentResponse(
                     sentiment="SUSPICIOUS",
@@ -276,14 +537,62 @@ def analyze_sentiment(chats: List[Chat]) -> SentimentResponse:
                     explanation="Failed to parse model response. Defaulting to suspicious for safety.",
                 )
 
-        # if the reason is not valid after 4 iterations, return SUSPICIOUS
+            # The engine returns the validated verdict, no re-parsing needed
+            parsed_result = response.model_dump()
+            explanation, sentiment = response.explanation, response.sentiment
+            emit(
+                "first_guardian",
+                {"round": i + 1, "tier": "large", "sentiment": sentiment, "confidence": response.confidence},
+            )
+            if response.confidence >= validator_skip_confidence() and strong_signal_agrees(
+                sentiment, enrichment
+            ):
+                logger.info("Confident verdict backed by reputation signals, skipping validator")
+                pipeline_stats.incr("validator_skipped")
+                return remember(SentimentResponse(**parsed_result))
+            second_prompt = validator_prompt(explanation, timestamp, score, url_prompt)
+
+            stage_timeout = budget.stage_timeout("validator")
+            try:
+                reason_valid = event_loop.run(
+                    second_guardian_async(
+                        model=guardian_model(),
+                        prompt=second_prompt,
+                        first_output=explanation,
+                        status=sentiment,
+                    ),
+                    timeout=stage_timeout,
+                )
+            except FutureTimeoutError:
+                logger.error(f"Validator timed out after {stage_timeout:.1f} seconds")
+                return partial_verdict(
+                    enrichment, parsed_result, "the validator ran out of time"
+                )
+            pipeline_stats.incr("validator_runs")
+            emit("validator", {"round": i + 1, "tier": "large", "valid": bool(reason_valid)})
+            logger.info(f"current iteration: {i}, reason_valid: {reason_valid}")
+
+            if reason_valid:
+                logger.info(f"The reason is valid, returning the result")
+                return remember(SentimentResponse(**parsed_result))
+            else:
+                logger.info(f"Invalid analysis result, retrying (attempt {i+1})...")
+                continue
+
+        if budget.expired():
+            logger.info("Time budget exhausted between retries")
+            return partial_verdict(
+                enrichment, parsed_result, "the time budget ran out before a valid result"
+            )
+
+        # if the reason is not valid after max_rounds iterations, return SUSPICIOUS
         parsed_result = {
             "sentiment": "SUSPICIOUS",
             "alert_needed": True,
-            "explanation": "Failed to find valid reason after 4 iterations, marking as suspicious",
+            "explanation": f"Failed to find valid reason after {max_rounds} iterations, marking as suspicious",
         }
         logger.info(
-            f"After 4 iterations, the reason is not valid, returning SUSPICIOUS"
+            f"After {max_rounds} iterations, the reason is not valid, returning SUSPICIOUS"
         )
         return SentimentResponse(**parsed_result)
     except Exception as e:
@@ -0,0 +1,62 @@
+"""
+Startup profile mode: report how long each module takes to import when the
+server boots.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter (so nothing
+is already cached in sys.modules) and prints the slowest modules.
+
+Usage:
+    python startup_profile.py            # top 25 modules by cumulative time
+    python startup_profile.py --top 50
+    python startup_profile.py --self     # sort by time spent in the module itself
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def profile_imports(target="main"):
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=server_dir,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        # importtime lines come first, the traceback is at the end of stderr
+        print(result.stderr.strip().splitlines()[-1], file=sys.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--self", dest="by_self", action="store_true")
+    parser.add_argument("--target", default="main")
+    args = parser.parse_args()
+
+    rows, wall = profile_imports(args.target)
+    key = 1 if args.by_self else 2
+    rows.sort(key=lambda row: row[key], reverse=True)
+
+    print(f"Importing {args.target} took {wall:.2f}s wall time ({len(rows)} modules)")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in rows[: args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Content-addressed cache of final verdicts.
+
+Scam broadcasts repeat verbatim across victims, so a verdict is keyed by a hash
+of the normalized message window, the enrichment features the prompt was built
+from and the model/prompt version. Entries live in a bounded in-memory LRU with
+an optional SQLite tier (VERDICT_CACHE_PATH) that survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_window(text: str) -> str:
+    """Case and whitespace differences do not change the verdict."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def window_key(text: str, features: dict, version: str) -> str:
+    payload = json.dumps(
+        {"text": normalize_window(text), "features": features, "version": version},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    def __init__(self, version: str, max_entries: int = 5000, path: Optional[str] = None):
+        self.version = version
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            # Verdicts from another model or prompt version can never match again
+            self._conn.execute("DELETE FROM verdicts WHERE version != ?", (version,))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: dict):
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, version, value, created_at) VALUES (?, ?, ?, ?)",
+                    (key, self.version, json.dumps(value), time.time()),
+                )
+                self._conn.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, version: Optional[str] = None):
+        """Drop every cached verdict, e.g. after a prompt or model change."""
+        with self._lock:
+            self._memory.clear()
+            if version is not None:
+                self.version = version
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM verdicts")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_size = None
+            if self._conn is not None:
+                disk_size = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            return {
+                "version": self.version,
+                "size": len(self._memory),
+                "disk_size": disk_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+_cache = None
+_cache_pid = None
+
+
+def get_verdict_cache(version: str) -> VerdictCache:
+    """
+    Per-process cache for the given model/prompt version. A different version
+    (models swapped in .env, prompt edited) invalidates everything cached.
+    """
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        _cache_pid = os.getpid()
+        _cache = VerdictCache(
+            version,
+            max_entries=int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "5000")),
+            path=os.getenv("VERDICT_CACHE_PATH") or None,
+        )
+    elif _cache.version != version:
+        _cache.invalidate(version)
+    return _cache
+
+
+def verdict_cache_enabled() -> bool:
+    return os.getenv("VERDICT_CACHE", "1") == "1"
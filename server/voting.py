@@ -0,0 +1,101 @@
+"""
+Self-consistency voting: sample several first_guardian verdicts in parallel and
+let them vote, instead of the sequential generate -> validate -> retry loop.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from guardian import first_guardian_async
+
+logger = logging.getLogger(__name__)
+
+# Most severe first, used to break ties cautiously when nothing else can
+SEVERITY = ["SCAM", "SUSPICIOUS", "SAFE"]
+
+
+@dataclass
+class VoteResult:
+    winner: Optional[dict]
+    # Share of the total vote weight behind the winner (0.0 - 1.0)
+    confidence: float = 0.0
+    # One representative candidate per sentiment sharing the top weight
+    tied: List[dict] = field(default_factory=list)
+    weights: dict = field(default_factory=dict)
+
+
+def vote_settings():
+    return {
+        "candidates": int(os.getenv("VOTE_CANDIDATES", "3")),
+        "temperature": float(os.getenv("VOTE_TEMPERATURE", "0.7")),
+        "weighting": os.getenv("VOTE_WEIGHTING", "majority"),
+    }
+
+
+async def run_candidates(model: str, prompt: str, n: int, temperature: float, timeout: float):
+    """
+    Generate n verdicts concurrently. Candidates still running at the timeout
+    are cancelled; the ones that finished are returned (possibly none).
+    """
+    tasks = [
+        asyncio.ensure_future(
+            first_guardian_async(
+                model=model,
+                prompt=prompt,
+                # Different seeds so the candidates actually differ
+                options={"temperature": temperature, "seed": seed},
+            )
+        )
+        for seed in range(n)
+    ]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    candidates = []
+    for task in done:
+        if task.exception() is not None:
+            logger.error(f"Vote candidate failed: {task.exception()!r}")
+            continue
+        candidate = task.result().model_dump()
+        if candidate["sentiment"] in SEVERITY:
+            candidates.append(candidate)
+    logger.info(f"{len(candidates)}/{n} vote candidates finished ({len(pending)} cancelled)")
+    return candidates
+
+
+def tally(candidates: List[dict], weighting: str = "majority") -> VoteResult:
+    """
+    Majority vote, or confidence-weighted vote with weighting="confidence".
+    The winner's representative is its most confident candidate.
+    """
+    if not candidates:
+        return VoteResult(winner=None)
+
+    weights = {}
+    best = {}
+    for candidate in candidates:
+        sentiment = candidate["sentiment"]
+        if weighting == "confidence":
+            # A zero-confidence candidate still counts a little
+            weight = max(float(candidate.get("confidence", 0)), 0.05)
+        else:
+            weight = 1.0
+        weights[sentiment] = weights.get(sentiment, 0.0) + weight
+        if sentiment not in best or candidate.get("confidence", 0) > best[sentiment].get("confidence", 0):
+            best[sentiment] = candidate
+
+    top = max(weights.values())
+    leaders = [s for s in SEVERITY if weights.get(s) == top]
+    confidence = top / sum(weights.values())
+    if len(leaders) > 1:
+        return VoteResult(
+            winner=None,
+            confidence=confidence,
+            tied=[best[s] for s in leaders],
+            weights=weights,
+        )
+    return VoteResult(winner=best[leaders[0]], confidence=confidence, weights=weights)
@@ -0,0 +1,169 @@
+"""
+Bounded worker pool that keeps the blocking analysis pipeline off the event loop.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the admission queue is full and new work is rejected."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Analysis queue is full")
+        self.retry_after = retry_after
+
+
+class AnalysisPool:
+    """
+    Runs blocking callables on a thread or process pool behind an admission queue.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more may wait
+    for a worker. Anything beyond that is rejected immediately with
+    PoolSaturatedError so the caller can answer with 503 + Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 8,
+        kind: str = "thread",
+        retry_after: int = 5,
+        initializer=None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.retry_after = retry_after
+
+        if kind == "process":
+            # initializer() runs once in each worker process before its first job
+            self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="analysis"
+            )
+
+        self._lock = threading.Lock()
+        self._admitted = 0  # running + waiting
+        self._running = 0
+        self._rejected = 0
+        self._completed = 0
+
+    @classmethod
+    def from_env(cls, initializer=None):
+        return cls(
+            max_workers=int(os.getenv("ANALYSIS_WORKERS", "4")),
+            max_queue=int(os.getenv("ANALYSIS_QUEUE_SIZE", "8")),
+            kind=os.getenv("ANALYSIS_POOL_KIND", "thread"),
+            retry_after=int(os.getenv("ANALYSIS_RETRY_AFTER", "5")),
+            initializer=initializer,
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _admit(self, count: int = 1):
+        with self._lock:
+            if self._admitted + count > self.capacity:
+                self._rejected += count
+                raise PoolSaturatedError(self.retry_after)
+            self._admitted += count
+
+    def _release(self, _future=None, count: int = 1):
+        with self._lock:
+            self._admitted -= count
+            self._completed += count
+
+    def has_room(self, count: int = 1) -> bool:
+        """Whether `count` more jobs would be admitted right now."""
+        with self._lock:
+            return self._admitted + count <= self.capacity
+
+    def load(self) -> float:
+        """Fraction of the admission capacity currently in use (0.0 - 1.0)."""
+        with self._lock:
+            return self._admitted / self.capacity
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool, raising PoolSaturatedError if it is full."""
+        return await self.submit(fn, *args)
+
+    def submit(self, fn, *args) -> asyncio.Future:
+        """
+        Admit and start fn(*args) right away, returning an awaitable for its
+        result. Raises PoolSaturatedError if the pool is full.
+        """
+        self._admit()
+        return self._start(fn, args)
+
+    def submit_all(self, fn, argsets: list) -> list:
+        """
+        Admit one job per argument tuple, all of them or none (PoolSaturatedError),
+        and start them. Each returned awaitable resolves as soon as its own job ends.
+        """
+        self._admit(len(argsets))
+        futures = []
+        for position, args in enumerate(argsets):
+            try:
+                futures.append(self._start(fn, args))
+            except Exception:
+                self._release(count=len(argsets) - position - 1)
+                raise
+        return futures
+
+    def _start(self, fn, args) -> asyncio.Future:
+        # Expects one admitted slot, which is released when the job ends
+        try:
+            if self.kind == "thread":
+                fn = _Tracked(self, fn)
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Release on the executor future, not the asyncio wrapper, so a client
+        # disconnect does not free the slot while the job is still running.
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "running": self._running if self.kind == "thread" else None,
+                "waiting": max(self._admitted - self.max_workers, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Analysis pool shut down")
+
+
+class _Tracked:
+    """Callable wrapper that counts running jobs on a thread pool."""
+
+    def __init__(self, pool: AnalysisPool, fn):
+        self.pool = pool
+        self.fn = fn
+
+    def __call__(self, *args):
+        with self.pool._lock:
+            self.pool._running += 1
+        try:
+            return self.fn(*args)
+        finally:
+            with self.pool._lock:
+                self.pool._running -= 1
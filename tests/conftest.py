@@ -0,0 +1,63 @@
+"""
+Shared test setup. Server modules are imported flat, the way main.py imports
+them, and API_check as a package from the repository root.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "server"), os.path.join(ROOT, "client"), ROOT]
+
+# sentiment_analyzer opens parent_app.log in the working directory on import;
+# import it once from a scratch directory so the tests leave no log behind
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+try:
+    import sentiment_analyzer  # noqa: F401
+finally:
+    os.chdir(_cwd)
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    """
+    run(messages, enrichment=None, detect=None, valid=True, backend=None) runs
+    analyze_sentiment with a mock model (or the given backend) and canned
+    enrichment, so nothing touches the network.
+    Caches, campaigns, kNN and the cascade are off unless a test turns them on.
+    """
+    import guardian
+    import sentiment_analyzer
+    from app_config import AppConfig
+    from enrichment import Enrichment
+    from models import Chat
+
+    for name, value in {
+        "GUARDIAN_BACKEND": "mock",
+        "GUARDIAN_MODE": "sequential",
+        "GUARDIAN_FAST_MODEL": "",
+        "PRECLASSIFIER": "rules",
+        "VERDICT_CACHE": "0",
+        "CAMPAIGN_DETECTION": "0",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("KNN_INDEX_PATH", raising=False)
+    monkeypatch.setattr(
+        sentiment_analyzer,
+        "get_config",
+        lambda: AppConfig(scammer_phone="15555550100", scammer_timestamp="10:00"),
+    )
+    # Restored after the test, whatever engine the test installs
+    monkeypatch.setattr(guardian, "_engine", None)
+
+    def run(messages, enrichment=None, detect=None, valid=True, backend=None, **kwargs):
+        monkeypatch.setattr(sentiment_analyzer, "enrich", lambda *a, **k: enrichment or Enrichment())
+        guardian.set_engine(guardian.GuardianEngine(backend or guardian.MockBackend(detect, valid)))
+        chats = [Chat(sender="scammer", message=message) for message in messages]
+        return sentiment_analyzer.analyze_sentiment(chats, **kwargs)
+
+    return run
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+
+import enrichment
+import main
+import sentiment_analyzer
+from API_check.reputation_cache import ReputationCache
+from API_check.url_check import UrlCheck
+from app_config import AppConfig
+from batching import MicroBatcher
+from models import Chat
+from worker_pool import AnalysisPool, PoolSaturatedError
+
+
+def window(text):
+    return [Chat(sender="scammer", message=text)]
+
+
+class SafeBrowsing:
+    """Async client stand-in that counts Safe Browsing calls and finds nothing."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def post(self, url, params=None, json=None):
+        self.calls += 1
+        return httpx.Response(200, json={}, request=httpx.Request("POST", url))
+
+
+@pytest.fixture
+def safe_browsing(tmp_path, monkeypatch):
+    """Reputation lookups against a scratch cache and a counting Safe Browsing."""
+    client = SafeBrowsing()
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    checker = UrlCheck(session=object(), async_client=client, cache=cache)
+    monkeypatch.setattr(enrichment, "_cache", cache)
+    monkeypatch.setattr(enrichment, "_cache_pid", os.getpid())
+    monkeypatch.setattr(enrichment, "_checkers", {"url": checker})
+    monkeypatch.setattr(sentiment_analyzer, "get_config", lambda: AppConfig())
+    return client
+
+
+@pytest.fixture
+def pool(monkeypatch, safe_browsing):
+    """A two-slot pool behind main, running a stand-in analysis."""
+    pool = AnalysisPool(max_workers=2, max_queue=0)
+    release = threading.Event()
+
+    def analyze(chats, max_rounds):
+        if chats[0].message.startswith("slow"):
+            release.wait(5)
+        return chats[0].message
+
+    monkeypatch.setattr(main, "analysis_pool", pool)
+    monkeypatch.setattr(main, "analyze_sentiment", analyze)
+    yield pool, release
+    release.set()
+    pool.shutdown()
+
+
+def test_submit_all_admits_every_job_or_none():
+    pool = AnalysisPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(PoolSaturatedError):
+            pool.submit_all(release.wait, [(5,), (5,), (5,)])
+        assert pool.stats()["admitted"] == 0
+        jobs = pool.submit_all(release.wait, [(5,), (5,)])
+        with pytest.raises(PoolSaturatedError):
+            pool.submit(release.wait, 5)
+        release.set()
+        await asyncio.gather(*jobs)
+
+    asyncio.run(scenario())
+    assert pool.stats()["admitted"] == 0
+    pool.shutdown()
+
+
+def test_each_request_resolves_on_its_own(pool):
+    _, release = pool
+
+    async def scenario():
+        batcher = MicroBatcher(main.submit_prewarmed, window=0.01, max_size=16)
+        slow = asyncio.ensure_future(batcher.submit(window("slow")))
+        fast = asyncio.ensure_future(batcher.submit(window("fast")))
+        # The fast window finishes while its batch neighbour is still running
+        assert await asyncio.wait_for(fast, 2) == "fast"
+        assert not slow.done()
+        release.set()
+        assert await slow == "slow"
+
+    asyncio.run(scenario())
+
+
+def test_every_request_counts_against_admission(pool):
+    _, release = pool
+
+    async def scenario():
+        batcher = MicroBatcher(main.submit_prewarmed, window=0.01, max_size=16)
+        requests = [asyncio.ensure_future(batcher.submit(window(text))) for text in ("slow", "slow 2", "fast")]
+        outcomes = await asyncio.wait_for(
+            asyncio.gather(requests[2], return_exceptions=True), 2
+        )
+        # Two slots: the third distinct window is turned away on its own
+        assert isinstance(outcomes[0], PoolSaturatedError)
+        release.set()
+        assert await asyncio.gather(*requests[:2]) == ["slow", "slow 2"]
+
+    asyncio.run(scenario())
+
+
+def test_micro_batched_requests_share_one_lookup(pool, safe_browsing, monkeypatch):
+    def analyze(chats, max_rounds):
+        urls = [word for word in chats[0].message.split() if word.startswith("http")]
+        return enrichment.enrich(urls).urls_safe
+
+    monkeypatch.setattr(main, "analyze_sentiment", analyze)
+
+    async def scenario():
+        batcher = MicroBatcher(main.submit_prewarmed, window=0.01, max_size=16)
+        return await asyncio.gather(
+            batcher.submit(window("your parcel is held http://example.com/track")),
+            batcher.submit(window("pay the fee at http://example.com/track today")),
+        )
+
+    assert asyncio.run(scenario()) == [True, True]
+    assert safe_browsing.calls == 1
+
+
+def test_identical_windows_share_one_job(pool):
+    async def scenario():
+        return await main.run_batch([window("fast"), window("FAST "), window("fast")])
+
+    assert asyncio.run(scenario()) == ["fast"] * 3
+    assert pool[0].stats()["completed"] == 1
+
+
+def test_batch_larger_than_the_free_slots_is_rejected_whole(pool):
+    async def scenario():
+        return await main.run_batch([window("a"), window("b"), window("c")])
+
+    with pytest.raises(PoolSaturatedError):
+        asyncio.run(scenario())
+    assert pool[0].stats()["admitted"] == 0
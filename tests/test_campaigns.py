@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+import campaigns
+from campaigns import CampaignIndex, MinHasher, normalize_for_shingles, shingles, similarity
+from enrichment import Enrichment
+from pipeline_stats import pipeline_stats
+
+TEMPLATE = (
+    "U.S. Post: You have a USPS parcel being cleared, due to the detection of an invalid zip code "
+    "address, the parcel can not be cleared. Please confirm your address at {url} within {hours} hours."
+)
+FIRST = TEMPLATE.format(url="https://usps-a1b2.top/track", hours=12)
+VARIANT = TEMPLATE.format(url="https://usps-zz91.top/i", hours=24)
+UNRELATED = "Hey, are we still on for soccer practice after school on Thursday? Bring your cleats."
+SCAM = {"sentiment": "SCAM", "alert_needed": True, "explanation": "fake parcel notice", "confidence": 0.9}
+SAFE = {"sentiment": "SAFE", "alert_needed": False, "explanation": "looks fine", "confidence": 0.9}
+
+
+def signature(text):
+    return MinHasher().signature(shingles(text))
+
+
+def test_normalization_folds_links_and_numbers():
+    assert normalize_for_shingles("Pay $120 at  HTTPS://x.top/a1 NOW") == "pay $0 at url now"
+    assert shingles(FIRST) == shingles(VARIANT)
+
+
+def test_signature_similarity():
+    assert similarity(signature(FIRST), signature(FIRST)) == 1.0
+    edited = FIRST.replace("Please confirm", "Kindly verify")
+    assert similarity(signature(FIRST), signature(edited)) > 0.7
+    assert similarity(signature(FIRST), signature(UNRELATED)) < 0.2
+    # Signatures are deterministic across processes
+    assert MinHasher().permutations == MinHasher().permutations
+
+
+def test_index_groups_lookalikes_into_campaigns():
+    index = CampaignIndex()
+    first = index.add(FIRST, SCAM)
+    index.add(FIRST.replace("Please confirm", "Kindly verify"), SCAM)
+    index.add(UNRELATED, SAFE)
+
+    match, score = index.nearest(index.signature(VARIANT))
+    assert match.id == first.id and score == 1.0
+    (campaign,) = index.campaigns()
+    assert campaign["size"] == 2
+    assert campaign["sentiments"] == {"SCAM": 2}
+    assert len(index.campaign(first.campaign)["messages"]) == 2
+    assert index.campaign(12345) is None
+
+
+def test_eviction_drops_oldest_from_buckets():
+    index = CampaignIndex(max_entries=1)
+    index.add(FIRST, SCAM)
+    index.add(UNRELATED, SAFE)
+    assert len(index) == 1
+    assert index.nearest(index.signature(FIRST)) == (None, 0.0)
+    assert list(index._entries) == [1]
+    assert all(entry_ids == [1] for buckets in index._buckets for entry_ids in buckets.values())
+
+
+@pytest.fixture
+def with_campaigns(analyzer, monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_DETECTION", "1")
+    # The parcel template would otherwise be settled by the rules first
+    monkeypatch.setenv("PRECLASSIFIER", "off")
+    monkeypatch.setattr(campaigns, "_index", CampaignIndex())
+    monkeypatch.setattr(campaigns, "_index_pid", os.getpid())
+    pipeline_stats.reset()
+    return analyzer
+
+
+def test_near_duplicate_reuses_the_earlier_verdict(with_campaigns):
+    prompts = []
+
+    def detect(prompt):
+        prompts.append(prompt)
+        return SCAM
+
+    with_campaigns([FIRST], detect=detect)
+    result = with_campaigns([VARIANT], detect=detect)
+    assert len(prompts) == 1
+    assert result.sentiment == "SCAM"
+    assert result.explanation.startswith("Near-duplicate")
+    assert pipeline_stats.snapshot()["counters"]["campaign_reused"] == 1
+
+
+def test_flagged_link_overrides_a_reused_safe(with_campaigns):
+    prompts = []
+
+    def detect(prompt):
+        prompts.append(prompt)
+        return SAFE if len(prompts) == 1 else SCAM
+
+    with_campaigns([FIRST], detect=detect)
+    flagged = Enrichment(url_verdicts={"https://usps-zz91.top/i": {"is_safe": False, "details": []}})
+    result = with_campaigns([VARIANT], flagged, detect=detect)
+    assert len(prompts) >= 2
+    assert result.sentiment == "SCAM"
@@ -0,0 +1,86 @@
+import pytest
+
+from cascade import escalation_reason
+from enrichment import Enrichment
+from guardian import Guardian2Response, GuardianResponse, MockBackend
+from pipeline_stats import pipeline_stats
+
+
+def verdict(sentiment, confidence=0.9, explanation=None):
+    return {
+        "sentiment": sentiment,
+        "alert_needed": sentiment != "SAFE",
+        "explanation": explanation or sentiment.lower(),
+        "confidence": confidence,
+    }
+
+
+class TieredBackend(MockBackend):
+    """Answers per model name, and records which models were asked what."""
+
+    def __init__(self, verdicts, valid=True):
+        super().__init__()
+        self.verdicts = verdicts
+        self.valid = valid
+        self.calls = []
+
+    def chat_json_sync(self, model, prompt, response_model, options=None):
+        self.calls.append((model, response_model.__name__))
+        if response_model is Guardian2Response:
+            return Guardian2Response(valid=self.valid)
+        return GuardianResponse.model_validate(self.verdicts[model])
+
+
+@pytest.fixture
+def cascade(analyzer, monkeypatch):
+    monkeypatch.setenv("GUARDIAN_FAST_MODEL", "fast")
+    monkeypatch.setenv("GUARDIAN_MODEL", "large")
+    pipeline_stats.reset()
+    return analyzer
+
+
+def test_escalation_reasons():
+    assert escalation_reason(None, 0.75) == "no usable verdict"
+    assert escalation_reason(verdict("SUSPICIOUS"), 0.75).startswith("sentiment")
+    assert escalation_reason(verdict("SCAM", 0.5), 0.75).startswith("confidence")
+    assert escalation_reason(verdict("SAFE"), 0.75, Enrichment()) is None
+    flagged = Enrichment(url_verdicts={"u": {"is_safe": False, "details": []}})
+    assert "Safe Browsing" in escalation_reason(verdict("SAFE"), 0.75, flagged)
+    invalid = Enrichment(phone_score=0.0, phone_answered=3, phone_asked=3)
+    assert "phone" in escalation_reason(verdict("SAFE"), 0.75, invalid)
+    # A 0 from the only provider that answered is no contradiction
+    partial = Enrichment(phone_score=0.0, phone_answered=1, phone_asked=3)
+    assert escalation_reason(verdict("SAFE"), 0.75, partial) is None
+    # A SCAM verdict agrees with both signals
+    assert escalation_reason(verdict("SCAM"), 0.75, flagged) is None
+
+
+def test_fast_safe_contradicting_a_hit_escalates(cascade):
+    backend = TieredBackend({"fast": verdict("SAFE"), "large": verdict("SCAM", explanation="large")})
+    flagged = Enrichment(url_verdicts={"http://x.top": {"is_safe": False, "details": []}})
+    result = cascade(["hi http://x.top"], flagged, backend=backend)
+    assert result.explanation == "large"
+    assert pipeline_stats.snapshot()["counters"]["cascade_escalated"] == 1
+
+
+def test_fast_safe_needs_the_validator(cascade):
+    backend = TieredBackend({"fast": verdict("SAFE", explanation="fast"), "large": verdict("SCAM")})
+    result = cascade(["lunch tomorrow?"], backend=backend)
+    assert result.explanation == "fast"
+    assert ("large", "Guardian2Response") in backend.calls
+    assert pipeline_stats.snapshot()["counters"]["cascade_accepted"] == 1
+
+
+def test_rejected_fast_safe_escalates(cascade):
+    backend = TieredBackend({"fast": verdict("SAFE"), "large": verdict("SCAM")}, valid=False)
+    result = cascade(["lunch tomorrow?"], backend=backend, max_rounds=1)
+    assert result.sentiment != "SAFE"
+    assert ("large", "GuardianResponse") in backend.calls
+    assert pipeline_stats.snapshot()["counters"]["cascade_escalated"] == 1
+
+
+def test_confident_fast_scam_is_final(cascade):
+    backend = TieredBackend({"fast": verdict("SCAM", explanation="fast")})
+    result = cascade(["send the gift card codes"], backend=backend)
+    assert result.explanation == "fast"
+    assert backend.calls == [("fast", "GuardianResponse")]
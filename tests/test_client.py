@@ -0,0 +1,132 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+
+import httpx
+import pytest
+
+from client import Chat, ChatMonitorClient
+
+VERDICT = {"sentiment": "SCAM", "alert_needed": True, "explanation": "gift cards", "confidence": 0.9}
+# Longer than the 30s request timeout the client used to wait at most
+ANALYSIS_SECONDS = 45
+
+
+class VirtualClock:
+    """
+    An event loop on its own thread whose clock the test moves forward, so an
+    analysis can take minutes of loop time in a few milliseconds.
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.new_event_loop()
+        self.offset = 0.0
+        real_time = self.loop.time
+        self.loop.time = lambda: real_time() + self.offset
+        self.thread = None
+        if loop is None:
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+
+    def run_until(self, done, limit=600, step=5):
+        while not done() and self.offset < limit:
+            time.sleep(0.005)
+            self.offset += step
+            # Wake the loop so it notices its timers are due
+            self.loop.call_soon_threadsafe(lambda: None)
+        return done()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+
+def slow_server(clock):
+    """Mock transport: jobs and streams that finish ANALYSIS_SECONDS of loop time after they start."""
+    started = {}
+
+    async def handler(request):
+        if request.url.path == "/jobs":
+            started["job"] = clock.loop.time()
+            return httpx.Response(202, json={"id": "j1", "status": "queued"})
+        if request.url.path == "/jobs/j1":
+            await asyncio.sleep(float(request.url.params["wait"]))
+            if clock.loop.time() - started["job"] < ANALYSIS_SECONDS:
+                return httpx.Response(200, json={"id": "j1", "status": "running", "result": None, "error": None})
+            return httpx.Response(200, json={"id": "j1", "status": "done", "result": VERDICT, "error": None})
+        if request.url.path == "/analyze_chats/stream":
+            async def events():
+                yield b'event: enrichment\ndata: {"risk": {"level": "HIGH", "reason": "flagged link"}}\n\n'
+                await asyncio.sleep(ANALYSIS_SECONDS)
+                yield f"event: final\ndata: {json.dumps(VERDICT)}\n\n".encode()
+
+            return httpx.Response(200, content=events())
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+def monitor_client(clock):
+    client = ChatMonitorClient()
+    client.client = httpx.AsyncClient(transport=slow_server(clock), timeout=30.0)
+    return client
+
+
+def test_long_job_result_is_returned():
+    clock = VirtualClock()
+    client = monitor_client(clock)
+    future = asyncio.run_coroutine_threadsafe(
+        client.analyze_chats("kid", [Chat(sender="scammer", message="send gift cards")]), clock.loop
+    )
+    assert clock.run_until(future.done)
+    assert future.result().sentiment == "SCAM"
+    assert not client.message_cache
+    clock.stop()
+
+
+@pytest.fixture
+def messenger(tmp_path, monkeypatch):
+    """A MessengerChat without its Tk windows, analyzing against slow_server."""
+    pytest.importorskip("nest_asyncio")
+    # messenger_chat logs to chat_app.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    from messenger_chat import AsyncTkThread, MessengerChat
+
+    handler = AsyncTkThread()
+    clock = VirtualClock(handler.loop)
+    messenger = object.__new__(MessengerChat)
+    messenger.async_handler = handler
+    messenger.client = monitor_client(clock)
+    messenger.message_queue = queue.Queue()
+    messenger.alert_queue = queue.Queue()
+    messenger.current_chat = [Chat(sender="scammer", message="send gift cards")]
+    messenger.window_size = 1
+    messenger.last_analyzed_index = -1
+    messenger.messages_since_analysis = 1
+    yield messenger, clock
+    handler.stop()
+
+
+def test_long_analysis_reaches_the_chat_window(messenger):
+    messenger, clock = messenger
+    messenger.analyze_window("scammer")
+    assert clock.run_until(lambda: not messenger.message_queue.empty())
+    sender, results = messenger.message_queue.get_nowait()
+    assert (sender, results.sentiment) == ("scammer", "SCAM")
+    assert messenger.messages_since_analysis == 0
+
+
+def test_streamed_progress_comes_first_and_the_verdict_still_arrives(messenger):
+    messenger, clock = messenger
+    messenger.analyze_window("scammer")
+    assert clock.run_until(lambda: not messenger.alert_queue.empty(), step=1)
+    assert clock.offset < ANALYSIS_SECONDS
+    assert messenger.alert_queue.get_nowait().level == "HIGH"
+    assert messenger.message_queue.empty()
+    # The final event comes long after the client's 30s request timeout
+    assert clock.run_until(lambda: not messenger.message_queue.empty())
+    assert clock.offset >= ANALYSIS_SECONDS
+    assert messenger.message_queue.get_nowait()[1].sentiment == "SCAM"
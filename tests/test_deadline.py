@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from deadline import DeadlineBudget
+from enrichment import Enrichment
+
+FAILED = {"is_safe": False, "error": "timed out"}
+
+
+def test_stage_timeout_splits_remaining_time_by_share():
+    budget = DeadlineBudget(100, {"enrichment": 0.1, "first_guardian": 0.5, "validator": 0.4})
+    assert budget.stage_timeout("enrichment") == pytest.approx(10, abs=0.01)
+    assert budget.stage_timeout("first_guardian") == pytest.approx(100 * 0.5 / 0.9, abs=0.01)
+    assert budget.stage_timeout("validator") == pytest.approx(100, abs=0.01)
+
+
+def test_unused_time_rolls_forward():
+    budget = DeadlineBudget(100, {"enrichment": 0.5, "validator": 0.5})
+    # Enrichment took 10s of its 50s share: the validator gets all that is left
+    budget.started = time.monotonic() - 10
+    assert budget.stage_timeout("validator") == pytest.approx(90, abs=0.01)
+
+
+def test_expired_budget():
+    budget = DeadlineBudget(5)
+    assert not budget.expired()
+    budget.started = time.monotonic() - 6
+    assert budget.expired()
+    assert budget.remaining() == 0
+    assert budget.stage_timeout("validator") == 0
+
+
+def test_partial_verdict_ignores_failed_url_lookup(analyzer, monkeypatch):
+    monkeypatch.setenv("ANALYSIS_BUDGET", "0")
+    enrichment = Enrichment(url_verdicts={"http://example.com": FAILED}, phone_score=0.5)
+    result = analyzer(["see http://example.com"], enrichment)
+    assert result.sentiment == "SUSPICIOUS"
+    assert "flagged" not in result.explanation
+    assert "links could not be checked" in result.explanation
+    assert "phone score 0.50" in result.explanation
+
+
+def test_partial_verdict_reports_real_hit(analyzer, monkeypatch):
+    monkeypatch.setenv("ANALYSIS_BUDGET", "0")
+    flagged = {"is_safe": False, "details": [{"threatType": "MALWARE"}]}
+    result = analyzer(["see http://example.com"], Enrichment(url_verdicts={"http://example.com": flagged}))
+    assert result.sentiment == "SCAM"
+    assert "flagged a link" in result.explanation
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import httpx
+
+from API_check.reputation_cache import MISS, ReputationCache
+from API_check.url_check import UrlCheck
+import enrichment
+from enrichment import Enrichment, enrich_async
+from pipeline_stats import pipeline_stats
+
+FLAGGED = {"is_safe": False, "details": [{"threatType": "SOCIAL_ENGINEERING"}]}
+CLEAN = {"is_safe": True, "details": "No threats found."}
+FAILED = {"is_safe": False, "error": "[Errno -2] Name or service not known"}
+
+
+def test_urls_safe_states():
+    assert Enrichment().urls_safe is None
+    assert Enrichment(url_verdicts={"a": CLEAN, "b": CLEAN}).urls_safe is True
+    assert Enrichment(url_verdicts={"a": CLEAN, "b": FLAGGED}).urls_safe is False
+    # A hit wins over another URL's failed lookup
+    assert Enrichment(url_verdicts={"a": FAILED, "b": FLAGGED}).urls_safe is False
+
+
+def test_failed_lookup_is_not_flagged():
+    enrichment = Enrichment(url_verdicts={"a": CLEAN, "b": FAILED})
+    assert enrichment.urls_safe is None
+    assert enrichment.url_lookup_failed
+
+
+def test_timed_out_lookup_is_failed():
+    assert Enrichment(timings={"url": 5.0}).url_lookup_failed
+    assert not Enrichment().url_lookup_failed
+
+
+class FailingClient:
+    async def post(self, *args, **kwargs):
+        raise httpx.ConnectError("Name or service not known")
+
+
+def test_failed_url_lookup_is_not_cached(tmp_path):
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    checker = UrlCheck(session=object(), async_client=FailingClient(), cache=cache)
+    url = "http://example.com/login"
+    verdict = asyncio.run(checker.check_url_async(url))
+    assert "error" in verdict
+    assert cache.get("url", url) is MISS
+
+
+def test_failed_lookup_does_not_skip_validator(analyzer):
+    confident_scam = {"sentiment": "SCAM", "alert_needed": True, "explanation": "model", "confidence": 0.95}
+    messages = ["Your bank account is locked, log in at http://example.com/login"]
+
+    pipeline_stats.reset()
+    analyzer(messages, Enrichment(url_verdicts={"http://example.com/login": FAILED}), detect=confident_scam)
+    counters = pipeline_stats.snapshot()["counters"]
+    assert counters.get("validator_skipped", 0) == 0
+    assert counters["validator_runs"] == 1
+
+    pipeline_stats.reset()
+    analyzer(messages, Enrichment(url_verdicts={"http://example.com/login": FLAGGED}), detect=confident_scam)
+    assert pipeline_stats.snapshot()["counters"]["validator_skipped"] == 1
+
+
+class SlowChecker:
+    async def check_urls_async(self, urls):
+        await asyncio.sleep(1)
+        return {url: CLEAN for url in urls}
+
+    async def check_phone_answers_async(self, phone_number):
+        await asyncio.sleep(1)
+        return 1.0, 3, 3
+
+
+def test_zero_timeout_is_not_the_default(monkeypatch):
+    checker = SlowChecker()
+    monkeypatch.setattr(enrichment, "get_checkers", lambda: {"url": checker, "phone": checker, "email": checker})
+    started = time.perf_counter()
+    result = asyncio.run(enrich_async(["http://example.com"], phone="15555550100", timeout=0))
+    assert time.perf_counter() - started < 0.5
+    assert result.url_lookup_failed
+    assert result.phone_score is None
+    assert result.phone_answered is None
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+
+import pytest
+
+import guardian
+from guardian import GuardianResponse, JsonObjectScanner, _first_valid, stream_settings
+
+VERDICT = '{"sentiment": "SCAM", "alert_needed": true, "explanation": "asks for {codes}", "confidence": 0.9}'
+REASONING = '<think>maybe it is {"sentiment": "SAFE"} but gift cards...</think>'
+
+
+def scan(chunks):
+    scanner = JsonObjectScanner()
+    for chunk in chunks:
+        found = scanner.feed(chunk)
+        if found is not None:
+            return found
+    return None
+
+
+def test_finds_object_with_braces_in_strings():
+    assert scan(["noise ", VERDICT[:30], VERDICT[30:], " trailing"]) == VERDICT
+
+
+def test_skips_reasoning_block():
+    assert scan([REASONING + "\n" + VERDICT]) == VERDICT
+
+
+@pytest.mark.parametrize("split", range(1, len(REASONING)))
+def test_skips_reasoning_split_anywhere(split):
+    text = "prefix " + REASONING + VERDICT
+    split += len("prefix ")
+    assert scan([text[:split], text[split:]]) == VERDICT
+
+
+def test_one_character_at_a_time():
+    assert scan(list(REASONING + VERDICT)) == VERDICT
+
+
+def test_stream_without_object():
+    assert scan(["<think>{never closed", "</think> no json"]) is None
+
+
+def test_first_valid_skips_object_that_does_not_validate():
+    scanner = JsonObjectScanner()
+    assert _first_valid(scanner, '{"unrelated": 1} ' + VERDICT, GuardianResponse) == GuardianResponse(
+        **json.loads(VERDICT)
+    )
+
+
+def test_num_predict_has_a_default_cap(monkeypatch):
+    monkeypatch.delenv("GUARDIAN_NUM_PREDICT", raising=False)
+    assert stream_settings()["num_predict"] == 2048
+    monkeypatch.setenv("GUARDIAN_NUM_PREDICT", "0")
+    assert stream_settings()["num_predict"] is None
+
+
+def test_engine_is_built_once_across_threads(monkeypatch):
+    builds = []
+
+    class SlowBackend(guardian.MockBackend):
+        def __init__(self):
+            builds.append(1)
+            time.sleep(0.05)
+            super().__init__()
+
+    monkeypatch.setenv("GUARDIAN_BACKEND", "mock")
+    monkeypatch.setitem(guardian.BACKENDS, "mock", SlowBackend)
+    monkeypatch.setattr(guardian, "_engine", None)
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(guardian.get_engine())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert len({id(engine) for engine in engines}) == 1
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobStore, callback_allowed
+from models import SentimentResponse
+from worker_pool import PoolSaturatedError
+
+REQUEST = {"username": "kid", "chats": [{"sender": "scammer", "message": "hi"}]}
+SAFE = SentimentResponse(sentiment="SAFE", alert_needed=False, explanation="fine", confidence=0.9)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_store_lifecycle(store):
+    job_id = store.create(REQUEST, "http://hooks.example/done")
+    job = store.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["request"] == REQUEST
+    assert job["callback_url"] == "http://hooks.example/done"
+
+    store.update(job_id, RUNNING)
+    assert store.unfinished() == [job_id]
+    store.update(job_id, DONE, result={"sentiment": "SAFE"})
+    assert store.get(job_id)["result"] == {"sentiment": "SAFE"}
+    assert store.unfinished() == []
+    assert store.counts() == {DONE: 1}
+    assert store.get("missing") is None
+
+
+def test_purge_keeps_unfinished_jobs(store):
+    finished = store.create(REQUEST)
+    store.update(finished, FAILED, error="boom")
+    queued = store.create(REQUEST)
+    time.sleep(0.01)
+    store.purge(older_than=0)
+    assert store.get(finished) is None
+    assert store.get(queued) is not None
+
+
+def test_callback_allowlist(monkeypatch):
+    monkeypatch.delenv("JOB_CALLBACK_HOSTS", raising=False)
+    assert not callback_allowed("https://hooks.example/done")
+    monkeypatch.setenv("JOB_CALLBACK_HOSTS", "hooks.example, other.example")
+    assert callback_allowed("https://hooks.example/done")
+    assert callback_allowed("http://other.example:8080/x")
+    assert not callback_allowed("http://169.254.169.254/latest/meta-data")
+    assert not callback_allowed("http://hooks.example.evil.test/")
+    assert not callback_allowed("file://hooks.example/etc/passwd")
+
+
+def run_jobs(store, run_batch, requests):
+    async def scenario():
+        queue = JobQueue(store, run_batch, workers=1)
+        await queue.start()
+        job_ids = [queue.submit(request) for request in requests]
+        jobs = [await queue.wait(job_id, timeout=2) for job_id in job_ids]
+        await queue.stop()
+        return jobs
+
+    return asyncio.run(scenario())
+
+
+def test_jobs_finish_and_fail(store):
+    async def run_batch(windows):
+        if windows[0][0].message == "boom":
+            raise RuntimeError("model down")
+        return [SAFE]
+
+    failing = {"username": "kid", "chats": [{"sender": "scammer", "message": "boom"}]}
+    done, failed = run_jobs(store, run_batch, [REQUEST, failing])
+    assert done["status"] == DONE
+    assert done["result"]["sentiment"] == "SAFE"
+    assert failed["status"] == FAILED
+    assert failed["error"] == "model down"
+
+
+def test_saturated_pool_only_delays_a_job(store):
+    attempts = []
+
+    async def run_batch(windows):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise PoolSaturatedError(retry_after=0)
+        return [SAFE]
+
+    (job,) = run_jobs(store, run_batch, [REQUEST])
+    assert job["status"] == DONE
+    assert len(attempts) == 2
+
+
+def test_unreadable_job_fails_without_stopping_the_worker(store):
+    async def run_batch(windows):
+        return [SAFE]
+
+    malformed = {"username": "kid", "chats": [{"text": "no sender"}]}
+    bad, good = run_jobs(store, run_batch, [malformed, REQUEST])
+    assert bad["status"] == FAILED
+    assert good["status"] == DONE
+
+
+def test_disallowed_callback_is_not_called(store, monkeypatch):
+    monkeypatch.setenv("JOB_CALLBACK_HOSTS", "hooks.example")
+    posted = []
+
+    async def run_batch(windows):
+        return [SAFE]
+
+    async def scenario():
+        queue = JobQueue(store, run_batch, workers=1)
+        await queue.start()
+
+        async def post(url, json=None):
+            posted.append(url)
+
+        queue._http.post = post
+        first = queue.submit(REQUEST, "http://127.0.0.1:6379/")
+        second = queue.submit(REQUEST, "https://hooks.example/done")
+        await queue.wait(first, timeout=2)
+        await queue.wait(second, timeout=2)
+        await asyncio.sleep(0.05)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert posted == ["https://hooks.example/done"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import sentiment_analyzer
+from knn import KnnResult, VectorIndex, knn_verdict
+
+
+def clustered(n_per_cluster=50, clusters=4, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = np.concatenate([c + 0.05 * rng.normal(size=(n_per_cluster, dim)) for c in centers])
+    labels = [["SCAM", "SAFE", "SUSPICIOUS", "SAFE"][i // n_per_cluster] for i in range(len(vectors))]
+    return vectors, labels, [f"text {i}" for i in range(len(vectors))]
+
+
+@pytest.mark.parametrize("ivf", [False, True])
+def test_search_finds_the_stored_vector(ivf):
+    vectors, labels, texts = clustered()
+    index = VectorIndex.build(vectors, labels, texts, "mock", ivf=ivf)
+    result = index.search(vectors[3], k=5, nprobe=2)
+    assert result.neighbours[0]["text"] == "text 3"
+    assert result.neighbours[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+    assert result.score == pytest.approx(1.0)
+
+
+def test_ivf_with_every_partition_probed_matches_flat_search():
+    vectors, labels, texts = clustered(seed=1)
+    flat = VectorIndex.build(vectors, labels, texts, "mock", ivf=False)
+    ivf = VectorIndex.build(vectors, labels, texts, "mock", ivf=True)
+    query = vectors[120] + 0.1
+    everything = len(ivf.centroids)
+    expected = [n["text"] for n in flat.search(query, k=8).neighbours]
+    assert [n["text"] for n in ivf.search(query, k=8, nprobe=everything).neighbours] == expected
+
+
+def test_save_and_load_memory_maps_the_vectors(tmp_path):
+    vectors, labels, texts = clustered()
+    path = str(tmp_path / "index")
+    VectorIndex.build(vectors, labels, texts, "mock", ivf=True).save(path)
+    loaded = VectorIndex.load(path)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert len(loaded) == len(labels)
+    assert loaded.search(vectors[60], k=1).neighbours[0]["text"] == "text 60"
+
+
+def test_knn_verdict_needs_close_agreeing_neighbours(monkeypatch):
+    close = [{"label": "SCAM", "similarity": 0.95, "text": "x"}]
+    assert knn_verdict(KnnResult(score=0.95, neighbours=close))["sentiment"] == "SCAM"
+    assert knn_verdict(KnnResult(score=0.5, neighbours=close)) is None
+    far = [{"label": "SCAM", "similarity": 0.5, "text": "x"}]
+    assert knn_verdict(KnnResult(score=1.0, neighbours=far)) is None
+
+
+def test_campaign_reuse_skips_the_embedding(analyzer, monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_DETECTION", "1")
+    message = ["knn-order regression: your toll payment is overdue, settle it today to keep your plates"]
+    analyzer(message)
+
+    def unused(*args, **kwargs):
+        raise AssertionError("a reused campaign verdict must not be embedded")
+
+    monkeypatch.setattr(sentiment_analyzer, "get_index", unused)
+    assert analyzer(message).explanation.startswith("Near-duplicate of an earlier analyzed message")
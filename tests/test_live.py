@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from live import LiveSessions
+from models import SentimentResponse
+
+SCAM = SentimentResponse(sentiment="SCAM", alert_needed=True, explanation="gift cards", confidence=0.9)
+STAGES = 20
+
+
+@pytest.fixture
+def live():
+    """A /live app whose analysis emits STAGES progress events from a worker thread."""
+    calls = []
+
+    async def analyze(chats, on_event):
+        calls.append([chat.message for chat in chats])
+
+        def work():
+            for stage in range(STAGES):
+                on_event(f"stage{stage}", {})
+            return SCAM
+
+        return await asyncio.get_running_loop().run_in_executor(None, work)
+
+    sessions = LiveSessions(analyze, {"ttl": 60, "outbox": 256, "history": 50})
+    app = FastAPI()
+
+    @app.websocket("/live")
+    async def endpoint(websocket: WebSocket):
+        await sessions.serve(websocket)
+
+    with TestClient(app) as client:
+        yield client, calls
+
+
+def hello(websocket, session=None, ack=0):
+    websocket.send_json({"type": "hello", "username": "kid", "session": session, "ack": ack, "window": 1})
+    return websocket.receive_json()
+
+
+def data_frames(websocket, until="alert"):
+    frames = []
+    while not frames or frames[-1]["type"] != until:
+        frame = websocket.receive_json()
+        if frame["type"] != "ack":
+            frames.append(frame)
+    return frames
+
+
+def test_progress_frames_come_before_the_verdict(live):
+    client, _ = live
+    with client.websocket_connect("/live") as websocket:
+        assert hello(websocket)["ack"] == 0
+        websocket.send_json({"type": "message", "seq": 1, "sender": "scammer", "message": "send gift cards"})
+        frames = data_frames(websocket)
+    assert [frame["seq"] for frame in frames] == list(range(1, STAGES + 3))
+    assert [frame["type"] for frame in frames] == ["progress"] * STAGES + ["verdict", "alert"]
+    assert all(frame["through"] == 1 for frame in frames)
+
+
+def test_resume_resends_unacked_frames_once(live):
+    client, calls = live
+    message = {"type": "message", "seq": 1, "sender": "scammer", "message": "send gift cards"}
+    with client.websocket_connect("/live") as websocket:
+        session = hello(websocket)["session"]
+        websocket.send_json(message)
+        first = data_frames(websocket)
+        # Dropped before acking anything past the first progress frame
+
+    with client.websocket_connect("/live") as websocket:
+        welcome = hello(websocket, session, ack=1)
+        assert welcome == {"type": "welcome", "session": session, "ack": 1}
+        assert data_frames(websocket) == first[1:]
+        # The message itself is resent too, but it was already received
+        websocket.send_json(message)
+        assert websocket.receive_json() == {"type": "ack", "seq": 1}
+        websocket.send_json({"type": "bye"})
+    assert calls == [["send gift cards"]]
+
+
+def test_unknown_session_starts_fresh(live):
+    client, _ = live
+    with client.websocket_connect("/live") as websocket:
+        welcome = hello(websocket, "expired", ack=7)
+        assert welcome["session"] != "expired"
+        assert welcome["ack"] == 0
+
+
+class Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, raw):
+        self.sent.append(raw)
+
+
+def test_client_delivers_each_frame_once_and_acks():
+    pytest.importorskip("websockets")
+    from live_session import LiveSession
+
+    events = []
+    session = LiveSession("http://localhost:8000", "kid", lambda kind, frame: events.append(frame["seq"]))
+    session.websocket = Socket()
+
+    async def scenario():
+        await session.send_message("scammer", "hi")
+        await session.send_message("scammer", "gift cards")
+        for seq in (1, 2, 2, 1, 3):
+            await session._handle({"type": "progress", "seq": seq})
+        await session._handle({"type": "ack", "seq": 1})
+
+    asyncio.run(scenario())
+    assert events == [1, 2, 3]
+    assert [frame["seq"] for frame in session.outbox] == [2]
+    assert json.loads(session.websocket.sent[-1]) == {"type": "ack", "seq": 3}
@@ -0,0 +1,157 @@
+import socket
+import time
+
+import pytest
+
+import guardian
+import main
+from guardian import GuardianResponse
+from ollama_pool import OllamaPoolBackend, start_standin
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def host(port: int) -> str:
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def standins():
+    """start(port=None) runs a stand-in Ollama and returns its port; all are stopped afterwards."""
+    servers = []
+
+    def start(port=None):
+        server = start_standin(port or free_port())
+        servers.append(server)
+        return server.server_port
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def pools():
+    """pool(ports, **kwargs) builds a pool over local ports; health loops are stopped afterwards."""
+    built = []
+
+    def pool(ports, **kwargs):
+        kwargs.setdefault("health_interval", 0)
+        backend = OllamaPoolBackend([host(port) for port in ports], **kwargs)
+        built.append(backend)
+        return backend
+
+    yield pool
+    for backend in built:
+        if backend._health_task is not None:
+            backend._health_task.cancel()
+
+
+def detect(pool) -> str:
+    """Run one guardian call through the pool; returns the stand-in's explanation."""
+    return pool.chat_json_sync("stand-in", "hello", GuardianResponse).explanation
+
+
+def served_by(port: int) -> str:
+    return f"stand-in on {port}"
+
+
+def test_routes_to_the_lowest_expected_wait(standins, pools):
+    ports = [standins(), standins(), standins()]
+    pool = pools(ports)
+    idle_but_slow, busy_but_fast, busier = pool.endpoints
+    idle_but_slow.latency = 3.0
+    busy_but_fast.in_flight, busy_but_fast.latency = 1, 1.0
+    busier.in_flight, busier.latency = 2, 0.9
+    # (in_flight + 1) x latency: an idle host still costs one full call
+    assert [e.expected_wait() for e in pool.endpoints] == [3.0, 2.0, pytest.approx(2.7)]
+
+    assert detect(pool) == served_by(ports[1])
+    assert [e.requests for e in pool.endpoints] == [0, 1, 0]
+    # The answer moved the rolling latency towards the real (much shorter) call
+    assert busy_but_fast.latency < 1.0
+    assert busy_but_fast.in_flight == 1
+
+
+def test_connection_error_is_retried_on_another_host(standins, pools):
+    live, down = standins(), free_port()
+    pool = pools([down, live], eject_after=10)
+    # The unreachable host looks cheaper, so it is tried first
+    pool.endpoints[1].latency = 5.0
+
+    assert detect(pool) == served_by(live)
+    dead, alive = pool.endpoints
+    assert (dead.requests, dead.failures) == (1, 1)
+    assert (alive.requests, alive.failures) == (1, 0)
+    assert dead.healthy
+
+
+def test_host_is_ejected_after_consecutive_failures(standins, pools):
+    live, down = standins(), free_port()
+    pool = pools([down, live], eject_after=2)
+    dead, alive = pool.endpoints
+    alive.latency = 5.0
+
+    detect(pool)
+    assert dead.healthy
+    detect(pool)
+    assert not dead.healthy
+    assert dead.consecutive_failures == 2
+
+    # Ejected: later calls go straight to the healthy host
+    for _ in range(3):
+        assert detect(pool) == served_by(live)
+    assert dead.requests == 2
+
+
+def test_health_loop_readmits_a_host_that_answers_again(standins, pools):
+    live, down = standins(), free_port()
+    pool = pools([down, live], health_interval=0.05)
+    dead = pool.endpoints[0]
+
+    def wait_for(condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+    wait_for(lambda: not dead.healthy)
+    standins(down)
+    wait_for(lambda: dead.healthy)
+    assert dead.consecutive_failures == 0
+
+    dead.latency = 0.01
+    assert detect(pool) == served_by(down)
+
+
+def test_stats_report_every_host(standins, monkeypatch):
+    live, down = standins(), free_port()
+    monkeypatch.setenv("GUARDIAN_BACKEND", "ollama")
+    monkeypatch.setenv("OLLAMA_HOSTS", f"{host(live)}, {host(down)}")
+    monkeypatch.setenv("OLLAMA_EJECT_AFTER", "1")
+    monkeypatch.setenv("OLLAMA_HEALTH_INTERVAL", "0")
+    monkeypatch.setattr(guardian, "_engine", None)
+
+    pool = guardian.get_engine().backend
+    pool.endpoints[0].latency = 5.0
+    detect(pool)
+
+    # The guardian_endpoints section of /stats
+    reported = main.guardian_endpoints()
+    assert [e["host"] for e in reported] == [host(live), host(down)]
+    assert reported[0] == {
+        "host": host(live),
+        "healthy": True,
+        "in_flight": 0,
+        "latency": reported[0]["latency"],
+        "requests": 1,
+        "failures": 0,
+    }
+    assert reported[0]["latency"] < 5.0
+    assert reported[1]["healthy"] is False
+    assert (reported[1]["requests"], reported[1]["failures"], reported[1]["in_flight"]) == (1, 1, 0)
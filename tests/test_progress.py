@@ -0,0 +1,55 @@
+import pytest
+
+from enrichment import Enrichment
+from rules import RuleResult
+from sentiment_analyzer import provisional_risk
+
+FAILED = {"is_safe": False, "error": "timed out"}
+FLAGGED = {"is_safe": False, "details": []}
+SAFE = {"sentiment": "SAFE", "alert_needed": False, "explanation": "fine", "confidence": 0.9}
+
+
+def test_provisional_risk_levels():
+    assert provisional_risk(Enrichment(url_verdicts={"u": FLAGGED}))["level"] == "HIGH"
+    assert provisional_risk(Enrichment(phone_score=0.0, phone_answered=3, phone_asked=3))["level"] == "HIGH"
+    assert provisional_risk(Enrichment(email_score=0.2))["level"] == "MEDIUM"
+    assert provisional_risk(Enrichment(), RuleResult(None, 1, ["plain_http"]))["level"] == "MEDIUM"
+    assert provisional_risk(Enrichment(phone_score=1.0))["level"] == "LOW"
+
+
+def test_partial_invalid_phone_is_not_high_risk():
+    # Only one of three providers answered, and it said invalid
+    risk = provisional_risk(Enrichment(phone_score=0.0, phone_answered=1, phone_asked=3))
+    assert risk["level"] == "MEDIUM"
+    assert "low phone score" in risk["reason"]
+
+
+def test_failed_url_lookup_is_not_high_risk():
+    risk = provisional_risk(Enrichment(url_verdicts={"u": FAILED}, phone_score=1.0))
+    assert risk["level"] == "LOW"
+    assert "links could not be checked" in risk["reason"]
+
+
+def collect(analyzer, **kwargs):
+    events = []
+    analyzer(["lunch tomorrow?"], detect=SAFE, on_event=lambda stage, data: events.append((stage, data)), **kwargs)
+    return events
+
+
+@pytest.mark.parametrize(
+    "env, tier",
+    [
+        ({}, "large"),
+        ({"GUARDIAN_FAST_MODEL": "fast"}, "fast"),
+        ({"GUARDIAN_MODE": "vote", "VOTE_CANDIDATES": "3"}, "vote"),
+    ],
+)
+def test_every_detector_path_reports_its_verdict(analyzer, monkeypatch, env, tier):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    events = collect(analyzer)
+    stages = [stage for stage, _ in events]
+    assert stages[:2] == ["rules", "enrichment"]
+    detector = [data for stage, data in events if stage == "first_guardian"]
+    assert detector and detector[0]["tier"] == tier
+    assert detector[0]["sentiment"] == "SAFE"
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from API_check.phone_check import PhoneCheck
+from API_check.reputation_cache import MISS, ReputationCache
+from enrichment import Enrichment
+from pipeline_stats import pipeline_stats
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class PhoneProviders:
+    """Async client stand-in: numverify answers invalid, the others fail or answer valid."""
+
+    def __init__(self, others_answer: bool):
+        self.others_answer = others_answer
+
+    async def get(self, url, params=None, headers=None):
+        if "apilayer" in url:
+            return Response({"valid": False})
+        if not self.others_answer:
+            raise ConnectionError("provider down")
+        return Response({"valid": True, "is_valid": True})
+
+
+def cached_ttl(cache, source, key):
+    row = cache._conn.execute(
+        "SELECT expires_at FROM reputation WHERE source = ? AND key = ?", (source, key)
+    ).fetchone()
+    return row[0] - time.time()
+
+
+def test_cache_roundtrip_and_negative_entries(tmp_path):
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    assert cache.get("email", "a@b.com") is MISS
+    cache.set("email", "A@B.com", 0.5)
+    assert cache.get("email", "a@b.com") == 0.5
+    cache.set("email", "c@d.com", None)
+    assert cache.get("email", "c@d.com") is None
+
+
+def test_cache_ttl_override(tmp_path):
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("phone", "1", 1.0, ttl=-1)
+    assert cache.get("phone", "1") is MISS
+
+
+def test_partial_phone_score_is_cached_briefly(tmp_path):
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    checker = PhoneCheck(session=object(), async_client=PhoneProviders(others_answer=False), cache=cache)
+    assert asyncio.run(checker.check_phone_async("15555550100")) == 0.0
+    assert cached_ttl(cache, "phone", "15555550100") <= cache.negative_ttl
+    # The cached partial score still says only one provider answered
+    assert asyncio.run(checker.check_phone_answers_async("15555550100")) == (0.0, 1, 3)
+
+
+def test_full_phone_score_is_cached_for_the_source_ttl(tmp_path):
+    cache = ReputationCache(path=str(tmp_path / "cache.sqlite3"))
+    checker = PhoneCheck(session=object(), async_client=PhoneProviders(others_answer=True), cache=cache)
+    assert asyncio.run(checker.check_phone_async("15555550100")) == 2 / 3
+    assert cached_ttl(cache, "phone", "15555550100") > cache.negative_ttl
+    assert asyncio.run(checker.check_phone_answers_async("15555550100")) == (2 / 3, 3, 3)
+
+
+def test_partial_invalid_phone_does_not_skip_validator(analyzer):
+    confident_scam = {"sentiment": "SCAM", "alert_needed": True, "explanation": "model", "confidence": 0.95}
+    messages = ["Call me back on this number about your parcel"]
+
+    pipeline_stats.reset()
+    partial = Enrichment(phone_score=0.0, phone_answered=1, phone_asked=3)
+    analyzer(messages, partial, detect=confident_scam)
+    counters = pipeline_stats.snapshot()["counters"]
+    assert counters.get("validator_skipped", 0) == 0
+    assert counters["validator_runs"] == 1
+
+    pipeline_stats.reset()
+    invalid = Enrichment(phone_score=0.0, phone_answered=3, phone_asked=3)
+    analyzer(messages, invalid, detect=confident_scam)
+    assert pipeline_stats.snapshot()["counters"]["validator_skipped"] == 1
+
+
+def test_unchecked_url_is_not_called_unsafe_to_the_model(analyzer):
+    prompts = []
+
+    def detect(prompt):
+        prompts.append(prompt)
+        return {"sentiment": "SAFE", "alert_needed": False, "explanation": "ok", "confidence": 0.6}
+
+    failed = {"http://example.com": {"is_safe": False, "error": "timed out"}}
+    analyzer(["see http://example.com"], Enrichment(url_verdicts=failed), detect=detect)
+    assert "could not be checked" in prompts[0]
+    assert "unsafe url" not in prompts[0]
@@ -0,0 +1,54 @@
+import pytest
+
+from rules import SCAM, AhoCorasick, RuleSet
+
+# Real scams without any phrase from the default list; the rules used to call
+# them SAFE and skip the model
+UNLISTED_SCAMS = [
+    "Grandma it's me, I got arrested and need bail money. Please send money today and don't tell mom",
+    "Hi! I made 40% last month with a crypto investment platform my mentor runs, want me to add you?",
+    "This is the IRS. There is a warrant for your arrest over unpaid taxes, call us back immediately",
+    "Your bank account is locked due to unusual activity, log in here to restore access",
+]
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(matcher.find("ushers")) == ["he", "hers", "she"]
+
+
+def test_aho_corasick_reports_every_occurrence():
+    matcher = AhoCorasick(["ab", "b"])
+    assert matcher.find("abab") == ["ab", "b", "ab", "b"]
+    assert matcher.find("xyz") == []
+
+
+def test_known_smishing_template_is_scam():
+    result = RuleSet().classify(
+        "U.S. Post: You have a USPS parcel being cleared, due to the detection of an invalid zip code "
+        "address. https://uspscjdp.top/i (Please reply with a Y, then exit the text message and open it "
+        "again to activate the link)"
+    )
+    assert result.verdict == SCAM
+    assert "reply_y_activation" in result.features
+    assert "tld_top" in result.features
+
+
+def test_feature_counts_once_per_window():
+    rules = RuleSet(phrases={"gift card": ("gift_card", 2)}, scam_score=3)
+    result = rules.classify("gift card, gift card, gift card")
+    assert result.score == 2
+    assert result.verdict is None
+
+
+@pytest.mark.parametrize("text", UNLISTED_SCAMS + ["Are we still on for lunch tomorrow?"])
+def test_rules_never_decide_safe(text):
+    assert RuleSet().classify(text).verdict is None
+
+
+@pytest.mark.parametrize("text", UNLISTED_SCAMS)
+def test_unlisted_scam_reaches_the_model(analyzer, text):
+    verdict = {"sentiment": "SCAM", "alert_needed": True, "explanation": "model", "confidence": 0.9}
+    result = analyzer([text], detect=verdict)
+    assert result.sentiment == "SCAM"
+    assert result.explanation == "model"
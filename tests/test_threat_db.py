@@ -0,0 +1,88 @@
+import pytest
+
+from API_check.threat_db import (
+    SAFE,
+    UNKNOWN,
+    UNSAFE,
+    ThreatListDB,
+    canonicalize,
+    feed_lines_for_urls,
+    full_hash,
+    url_expressions,
+)
+
+PHISH = "https://uspscjdp.top/i"
+
+
+@pytest.mark.parametrize(
+    "url, canonical",
+    [
+        ("http://host/%25%32%35", "http://host/%25"),
+        ("http://www.GOOgle.com/", "http://www.google.com/"),
+        ("http://www.google.com/blah/..", "http://www.google.com/"),
+        ("www.google.com/", "http://www.google.com/"),
+        ("http://www.google.com/foo\tbar\rbaz\n2", "http://www.google.com/foobarbaz2"),
+        ("http://www.google.com/q?", "http://www.google.com/q?"),
+        ("http://www.google.com/#frag", "http://www.google.com/"),
+        ("http://...www.google.com.../", "http://www.google.com/"),
+        ("http://host.com//twoslashes?more//slashes", "http://host.com/twoslashes?more//slashes"),
+    ],
+)
+def test_canonicalize(url, canonical):
+    assert canonicalize(url) == canonical
+
+
+def test_url_expressions():
+    assert url_expressions("http://a.b.c/1/2.html?param=1") == [
+        "a.b.c/1/2.html?param=1", "a.b.c/1/2.html", "a.b.c/", "a.b.c/1/",
+        "b.c/1/2.html?param=1", "b.c/1/2.html", "b.c/", "b.c/1/",
+    ]
+    # At most four suffixes from the last five host components, never the TLD
+    hosts = {expression.split("/")[0] for expression in url_expressions("http://a.b.c.d.e.f.g/1.html")}
+    assert hosts == {"a.b.c.d.e.f.g", "c.d.e.f.g", "d.e.f.g", "e.f.g", "f.g"}
+    assert url_expressions("http://1.2.3.4/1/") == ["1.2.3.4/1/", "1.2.3.4/"]
+
+
+def write_feed(tmp_path, version, lines):
+    path = tmp_path / f"feed{version}.txt"
+    path.write_text("\n".join([f"version {version}", "# comment"] + lines) + "\n")
+    return str(path)
+
+
+def test_prefix_and_full_hash_lookups(tmp_path):
+    db = ThreatListDB(str(tmp_path / "threats.bin"))
+    assert db.check(PHISH) == SAFE
+
+    prefix_only = full_hash(url_expressions("http://maybe.example/")[0])[:4].hex()
+    assert db.apply_update(write_feed(tmp_path, 1, feed_lines_for_urls([PHISH]) + [f"+{prefix_only}"]))
+    assert len(db) == 2
+    assert db.check(PHISH) == UNSAFE
+    # Any expression of the URL counts, e.g. the listed path without a query
+    assert db.check("https://USPSCJDP.top/i?track=1") == UNSAFE
+    assert db.check("http://maybe.example/") == UNKNOWN
+    assert db.check("https://example.com/") == SAFE
+
+
+def test_updates_are_versioned_and_persisted(tmp_path):
+    path = str(tmp_path / "threats.bin")
+    db = ThreatListDB(path)
+    (line,) = feed_lines_for_urls([PHISH])
+    assert db.apply_update(write_feed(tmp_path, 2, [line]))
+    # Not newer: ignored
+    assert not db.apply_update(write_feed(tmp_path, 2, ["-" + line[1:9]]))
+    assert db.check(PHISH) == UNSAFE
+
+    assert db.apply_update(write_feed(tmp_path, 3, ["-" + line[1:9]]))
+    assert db.check(PHISH) == SAFE
+    assert not db.full_hashes
+
+    reloaded = ThreatListDB(path)
+    assert reloaded.version == 3
+    assert len(reloaded) == 0
+
+
+def test_bad_feed_line(tmp_path):
+    db = ThreatListDB(str(tmp_path / "threats.bin"))
+    with pytest.raises(ValueError):
+        db.apply_update(write_feed(tmp_path, 1, ["+abcd"]))
+    assert db.version == 0
@@ -0,0 +1,44 @@
+import sentiment_analyzer
+from verdict_cache import VerdictCache, normalize_window, window_key
+
+
+def test_window_key_ignores_case_and_whitespace():
+    features = {"channel": "phone", "score": 0.5}
+    assert normalize_window("  Hello\n  WORLD ") == "hello world"
+    assert window_key("Hello  world", features, "1") == window_key("hello world", features, "1")
+    assert window_key("hello world", features, "1") != window_key("hello world", {"score": 0.0}, "1")
+    assert window_key("hello world", features, "1") != window_key("hello world", features, "2")
+
+
+def test_memory_tier_is_lru():
+    cache = VerdictCache("1", max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.stats()["hits"] == 2
+
+
+def test_disk_tier_drops_other_versions(tmp_path):
+    path = str(tmp_path / "verdicts.sqlite3")
+    cache = VerdictCache("1", path=path)
+    cache.put("a", {"v": 1})
+    cache.close()
+    assert VerdictCache("1", path=path).get("a") == {"v": 1}
+    assert VerdictCache("2", path=path).get("a") is None
+
+
+def test_cache_hit_skips_campaign_and_knn(analyzer, monkeypatch):
+    monkeypatch.setenv("VERDICT_CACHE", "1")
+    monkeypatch.setenv("CAMPAIGN_DETECTION", "1")
+    message = ["cache-order regression: are we still meeting at the library at four?"]
+    first = analyzer(message)
+
+    def unused(*args, **kwargs):
+        raise AssertionError("a verdict cache hit must not reach this stage")
+
+    monkeypatch.setattr(sentiment_analyzer, "get_campaign_index", unused)
+    monkeypatch.setattr(sentiment_analyzer, "get_index", unused)
+    assert analyzer(message) == first
@@ -0,0 +1,71 @@
+import asyncio
+import itertools
+
+import voting
+from guardian import GuardianResponse
+from pipeline_stats import pipeline_stats
+from voting import run_candidates, tally
+
+
+def candidate(sentiment, confidence=0.5, explanation=None):
+    return {
+        "sentiment": sentiment,
+        "alert_needed": sentiment != "SAFE",
+        "explanation": explanation or sentiment.lower(),
+        "confidence": confidence,
+    }
+
+
+def test_majority_picks_most_confident_representative():
+    vote = tally([candidate("SCAM", 0.6), candidate("SCAM", 0.9, "best"), candidate("SAFE", 0.99)])
+    assert vote.winner["explanation"] == "best"
+    assert vote.confidence == 2 / 3
+    assert vote.weights == {"SCAM": 2.0, "SAFE": 1.0}
+
+
+def test_confidence_weighting_can_overturn_the_majority():
+    candidates = [candidate("SAFE", 0.2), candidate("SAFE", 0.2), candidate("SCAM", 0.9)]
+    assert tally(candidates).winner["sentiment"] == "SAFE"
+    assert tally(candidates, "confidence").winner["sentiment"] == "SCAM"
+
+
+def test_zero_confidence_still_counts():
+    vote = tally([candidate("SAFE", 0.0)], "confidence")
+    assert vote.winner["sentiment"] == "SAFE"
+    assert vote.weights["SAFE"] == 0.05
+
+
+def test_tie_lists_most_severe_first():
+    vote = tally([candidate("SAFE"), candidate("SCAM"), candidate("SUSPICIOUS"), candidate("SCAM"), candidate("SAFE")])
+    assert vote.winner is None
+    assert [tied["sentiment"] for tied in vote.tied] == ["SCAM", "SAFE"]
+    assert vote.confidence == 2 / 5
+
+
+def test_no_candidates():
+    vote = tally([])
+    assert vote.winner is None and not vote.tied
+
+
+def test_slow_candidates_are_cancelled(monkeypatch):
+    async def first_guardian_async(model, prompt, options):
+        if options["seed"] == 2:
+            await asyncio.sleep(5)
+        return GuardianResponse.model_validate(candidate("SCAM"))
+
+    monkeypatch.setattr(voting, "first_guardian_async", first_guardian_async)
+    candidates = asyncio.run(run_candidates("m", "p", n=3, temperature=0.7, timeout=0.1))
+    assert [c["sentiment"] for c in candidates] == ["SCAM", "SCAM"]
+
+
+def test_tie_rejected_by_validator_is_suspicious(analyzer, monkeypatch):
+    monkeypatch.setenv("GUARDIAN_MODE", "vote")
+    monkeypatch.setenv("VOTE_CANDIDATES", "2")
+    answers = itertools.cycle([candidate("SCAM", 0.9), candidate("SAFE", 0.9)])
+    pipeline_stats.reset()
+    result = analyzer(["lunch tomorrow?"], detect=lambda prompt: next(answers), valid=False)
+    assert result.sentiment == "SUSPICIOUS"
+    assert result.confidence == 0.5
+    counters = pipeline_stats.snapshot()["counters"]
+    assert counters["vote_tied"] == 1
+    assert counters["validator_runs"] == 2